@@ -21,3 +21,6 @@ DATABASES = {
         },
     },
 }
+
+# A second connection to the same database, for testing replica routing.
+DATABASES['replica'] = dict(DATABASES['default'], TEST={'MIRROR': 'default'})
@@ -67,6 +67,9 @@ DMOJ_PROBLEM_MIN_PROBLEM_POINTS = 0
 DMOJ_PROBLEM_MIN_USER_POINTS_VOTE = 1  # when voting on problem, minimum point value user can select
 DMOJ_PROBLEM_MAX_USER_POINTS_VOTE = 50  # when voting on problem, maximum point value user can select
 DMOJ_PROBLEM_HOT_PROBLEM_COUNT = 7
+# Full text problem search uses an in-process index instead of MySQL's fulltext index, which can't tokenize CJK.
+# Every web process then keeps an index of all problems in memory.
+DMOJ_PROBLEM_SEARCH_INDEX = False
 
 DMOJ_PROBLEM_STATEMENT_DISALLOWED_CHARACTERS = {'“', '”', '‘', '’', '−', 'ﬀ', 'ﬁ', 'ﬂ', 'ﬃ', 'ﬄ'}
 DMOJ_RATING_COLORS = True
@@ -80,6 +83,16 @@ DMOJ_SUBMISSIONS_REJUDGE_LIMIT = 10
 DMOJ_SUBMISSION_RATELIMIT_TIMEFRAME = datetime.timedelta(days=1)
 DMOJ_SUBMISSION_RATELIMIT = 500
 
+# Whether to pack the test case results of graded submissions into one row each, instead of a row per test case.
+# The test cases of packed submissions are not shown or editable in the submission admin.
+DMOJ_PACKED_TEST_CASES = False
+
+# Optional, path on disk to store large test case output and extended feedback in, instead of the database
+# Blobs no longer used by any test case are deleted by the prune_case_blobs command
+DMOJ_TEST_CASE_BLOB_ROOT = None
+# Test case output and extended feedback longer than this many bytes is stored in DMOJ_TEST_CASE_BLOB_ROOT
+DMOJ_TEST_CASE_BLOB_THRESHOLD = 4096
+
 # Whether to allow users to view source code: 'all' | 'all-solved' | 'only-own'
 DMOJ_SUBMISSION_SOURCE_VISIBILITY = 'all-solved'
 DMOJ_BLOG_NEW_PROBLEM_COUNT = 7
@@ -97,6 +110,11 @@ DMOJ_COMMENT_REPLY_TIMEFRAME = datetime.timedelta(days=365)
 
 DMOJ_CONTEST_PERF_CEILING_INCREMENT = 400
 
+# Number of participations rescored by each celery task when rescoring a contest
+DMOJ_CONTEST_RESCORE_CHUNK_SIZE = 250
+# Whether rescored contest results are swapped in all at once at the end, instead of as each participation is rescored
+DMOJ_CONTEST_RESCORE_STAGED = False
+
 DMOJ_PDF_PDFOID_URL = None
 # Optional but recommended to save resources, path on disk to cache PDFs
 DMOJ_PDF_PROBLEM_CACHE = None
@@ -141,6 +159,11 @@ DMOJ_ENABLE_SOCIAL = True
 MARKDOWN_STYLES = {}
 MARKDOWN_DEFAULT_STYLE = {}
 
+# Number of rendered markdown documents each process keeps in memory
+DMOJ_MARKDOWN_CACHE_SIZE = 256
+# Seconds to also keep rendered markdown in the shared cache, or None to only keep it in memory
+DMOJ_MARKDOWN_SHARED_CACHE_TIMEOUT = None
+
 MATHOID_URL = False
 MATHOID_GZIP = False
 MATHOID_MML_CACHE = None
@@ -149,6 +172,8 @@ MATHOID_DEFAULT_TYPE = 'auto'
 MATHOID_MML_CACHE_TTL = 86400
 MATHOID_CACHE_ROOT = ''
 MATHOID_CACHE_URL = False
+# Maximum number of formulas sent to mathoid at once while rendering a document
+MATHOID_CONCURRENCY = 8
 
 TEXOID_GZIP = False
 TEXOID_META_CACHE = 'default'
@@ -290,6 +315,7 @@ MIDDLEWARE = (
     'judge.middleware.ShortCircuitMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'judge.middleware.ReplicaStickinessMiddleware',
     'django.middleware.locale.LocaleMiddleware',
     'judge.middleware.APIMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -523,6 +549,15 @@ DATABASES = {
     },
 }
 
+DATABASE_ROUTERS = ['judge.replicas.ReplicaRouter']
+
+# Database aliases of read replicas to run the queries of read-only views on, see judge.replicas
+DMOJ_READ_REPLICAS = ()
+# Replicas more than this many seconds behind the primary are not read from
+DMOJ_REPLICA_MAX_LAG = 5
+# How many seconds a client keeps reading from the primary after a request which could have written something
+DMOJ_REPLICA_STICKY_TIME = 10
+
 ENABLE_FTS = False
 
 # Bridged configuration
@@ -601,6 +636,10 @@ SOCIAL_AUTH_SLUGIFY_USERNAMES = True
 SOCIAL_AUTH_SLUGIFY_FUNCTION = 'judge.social_auth.slugify_username'
 
 MOSS_API_KEY = None
+# The MOSS client class; judge.utils.moss.LocalMOSS never contacts the MOSS server
+DMOJ_MOSS_CLIENT = 'moss.MOSS'
+# Number of problem and language pairs sent to MOSS at the same time
+DMOJ_MOSS_MAX_WORKERS = 4
 
 CELERY_WORKER_HIJACK_ROOT_LOGGER = False
 
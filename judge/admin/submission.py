@@ -1,11 +1,12 @@
+import copy
 from functools import partial
 from operator import itemgetter
 
 from django.conf import settings
 from django.contrib import admin, messages
-from django.core.cache import cache
 from django.core.exceptions import PermissionDenied
 from django.db.models import Q
+from django.forms import CharField, ModelForm
 from django.http import HttpResponseRedirect
 from django.shortcuts import get_object_or_404
 from django.urls import path, reverse
@@ -17,6 +18,7 @@ from reversion.admin import VersionAdmin
 
 from judge.models import ContestParticipation, ContestProblem, ContestSubmission, Profile, Submission, \
     SubmissionSource, SubmissionTestCase
+from judge.utils.problems import invalidate_user_problem_ids
 from judge.utils.raw_sql import use_straight_join
 from judge.widgets import AdminAceWidget
 
@@ -105,17 +107,37 @@ class ContestSubmissionInline(admin.StackedInline):
         return field
 
 
+class SubmissionSourceForm(ModelForm):
+    # The source code is stored in a blob, so it isn't a model field.
+    source = CharField(label=_('source code'), max_length=65536, strip=False)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk is not None:
+            self.initial.setdefault('source', self.instance.source)
+
+    def save(self, commit=True):
+        self.instance.source = self.cleaned_data['source']
+        return super().save(commit)
+
+    class Meta:
+        model = SubmissionSource
+        fields = ()
+
+
 class SubmissionSourceInline(admin.StackedInline):
     fields = ('source',)
+    form = SubmissionSourceForm
     model = SubmissionSource
     can_delete = False
     extra = 0
 
     def get_formset(self, request, obj=None, **kwargs):
-        kwargs.setdefault('widgets', {})['source'] = AdminAceWidget(
-            mode=obj and obj.language.ace, theme=request.profile.resolved_ace_theme,
-        )
-        return super().get_formset(request, obj, **kwargs)
+        formset = super().get_formset(request, obj, **kwargs)
+        # Declared fields are shared between form classes, so give this one its own copy to change the widget of.
+        field = formset.form.base_fields['source'] = copy.copy(formset.form.base_fields['source'])
+        field.widget = AdminAceWidget(mode=obj and obj.language.ace, theme=request.profile.resolved_ace_theme)
+        return formset
 
 
 class SubmissionAdmin(VersionAdmin):
@@ -203,8 +225,7 @@ class SubmissionAdmin(VersionAdmin):
 
         for profile in Profile.objects.filter(id__in=queryset.values_list('user_id', flat=True).distinct()):
             profile.calculate_points()
-            cache.delete('user_complete:%d' % profile.id)
-            cache.delete('user_attempted:%d' % profile.id)
+            invalidate_user_problem_ids(profile.id)
 
         for participation in ContestParticipation.objects.filter(
                 id__in=queryset.values_list('contest__participation_id')).prefetch_related('contest'):
@@ -12,8 +12,10 @@ from django.utils import timezone
 
 from judge import event_poster as event
 from judge.bridge.base_handler import ZlibPacketHandler, proxy_list
-from judge.caching import finished_submission
-from judge.models import Judge, Language, LanguageLimit, Problem, RuntimeVersion, Submission, SubmissionTestCase
+from judge.caching import failed_submission_id, finished_submission
+from judge.models import Judge, Language, LanguageLimit, PackedTestCases, Problem, RuntimeVersion, Submission, \
+    SubmissionTestCase
+from judge.utils.blob_store import store_case_text
 
 logger = logging.getLogger('judge.bridge')
 json_log = logging.getLogger('judge.json.bridge')
@@ -93,7 +95,8 @@ class JudgeHandler(ZlibPacketHandler):
 
         json_log.info(self._make_json_log(action='disconnect', info='judge disconnected'))
         if self._working:
-            Submission.objects.filter(id=self._working).update(status='IE', result='IE', error='')
+            if Submission.objects.filter(id=self._working).update(status='IE', result='IE', error=''):
+                failed_submission_id(self._working, 'IE')
             json_log.error(self._make_json_log(sub=self._working, action='close', info='IE due to shutdown on grading'))
 
     def _authenticate(self, id, key):
@@ -275,8 +278,10 @@ class JudgeHandler(ZlibPacketHandler):
 
     def on_submission_wrong_acknowledge(self, packet, expected, got):
         json_log.error(self._make_json_log(packet, action='processing', info='wrong-acknowledge', expected=expected))
-        Submission.objects.filter(id=expected).update(status='IE', result='IE', error=None)
-        Submission.objects.filter(id=got, status='QU').update(status='IE', result='IE', error=None)
+        if Submission.objects.filter(id=expected).update(status='IE', result='IE', error=None):
+            failed_submission_id(expected, 'IE')
+        if Submission.objects.filter(id=got, status='QU').update(status='IE', result='IE', error=None):
+            failed_submission_id(got, 'IE')
 
     def on_submission_acknowledged(self, packet):
         if not packet.get('submission-id', None) == self._working:
@@ -341,6 +346,7 @@ class JudgeHandler(ZlibPacketHandler):
                 status='G', is_pretested=packet['pretested'], current_testcase=1,
                 batch=False, judged_date=timezone.now()):
             SubmissionTestCase.objects.filter(submission_id=packet['submission-id']).delete()
+            PackedTestCases.objects.filter(submission_id=packet['submission-id']).delete()
             event.post('sub_%s' % Submission.get_id_secret(packet['submission-id']), {'type': 'grading-begin'})
             self._post_update_submission(packet['submission-id'], 'grading-begin')
             json_log.info(self._make_json_log(packet, action='grading-begin'))
@@ -368,7 +374,8 @@ class JudgeHandler(ZlibPacketHandler):
         status_codes = ['SC', 'AC', 'WA', 'MLE', 'TLE', 'IR', 'RTE', 'OLE']
         batches = {}  # batch number: (points, total)
 
-        for case in SubmissionTestCase.objects.filter(submission=submission):
+        cases = list(SubmissionTestCase.objects.filter(submission=submission))
+        for case in cases:
             time += case.time
             if not case.batch:
                 points += case.points
@@ -405,6 +412,9 @@ class JudgeHandler(ZlibPacketHandler):
         submission.result = status_codes[status]
         submission.save()
 
+        if settings.DMOJ_PACKED_TEST_CASES:
+            PackedTestCases.pack(submission.id, cases)
+
         json_log.info(self._make_json_log(
             packet, action='grading-end', time=time, memory=memory,
             points=sub_points, total=problem.points, result=submission.result,
@@ -440,6 +450,7 @@ class JudgeHandler(ZlibPacketHandler):
         self._free_self(packet)
 
         if Submission.objects.filter(id=packet['submission-id']).update(status='CE', result='CE', error=packet['log']):
+            failed_submission_id(packet['submission-id'], 'CE')
             event.post('sub_%s' % Submission.get_id_secret(packet['submission-id']), {
                 'type': 'compile-error',
                 'log': packet['log'],
@@ -472,6 +483,7 @@ class JudgeHandler(ZlibPacketHandler):
 
         id = packet['submission-id']
         if Submission.objects.filter(id=id).update(status='IE', result='IE', error=packet['message']):
+            failed_submission_id(id, 'IE')
             event.post('sub_%s' % Submission.get_id_secret(id), {'type': 'internal-error'})
             self._post_update_submission(id, 'internal-error', done=True)
             json_log.info(self._make_json_log(packet, action='internal-error', message=packet['message'],
@@ -486,6 +498,7 @@ class JudgeHandler(ZlibPacketHandler):
         self._free_self(packet)
 
         if Submission.objects.filter(id=packet['submission-id']).update(status='AB', result='AB', points=0):
+            failed_submission_id(packet['submission-id'], 'AB')
             event.post('sub_%s' % Submission.get_id_secret(packet['submission-id']), {'type': 'aborted'})
             self._post_update_submission(packet['submission-id'], 'aborted', done=True)
             json_log.info(self._make_json_log(packet, action='aborted', finish=True, result='AB'))
@@ -547,14 +560,15 @@ class JudgeHandler(ZlibPacketHandler):
             test_case.total = result['total-points']
             test_case.batch = self.batch_id if self.in_batch else None
             test_case.feedback = (result.get('feedback') or '')[:max_feedback]
-            test_case.extended_feedback = result.get('extended-feedback') or ''
-            test_case.output = result['output']
+            extended_feedback = result.get('extended-feedback') or ''
+            test_case.extended_feedback = store_case_text(extended_feedback)
+            test_case.output = store_case_text(result['output'])
             bulk_test_case_updates.append(test_case)
 
             json_log.info(self._make_json_log(
                 packet, action='test-case', case=test_case.case, batch=test_case.batch,
                 time=test_case.time, memory=test_case.memory, feedback=test_case.feedback,
-                extended_feedback=test_case.extended_feedback, output=test_case.output,
+                extended_feedback=extended_feedback, output=result['output'],
                 points=test_case.points, total=test_case.total, status=test_case.status,
                 voluntary_context_switches=result.get('voluntary-context-switches', 0),
                 involuntary_context_switches=result.get('involuntary-context-switches', 0),
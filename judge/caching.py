@@ -1,10 +1,43 @@
 from django.core.cache import cache
 
+from judge.models import Submission, SubmissionResultCount, UserProblemStatus
+from judge.utils.problems import invalidate_user_problem_ids, record_hot_problem_submission, \
+    user_finished_submission
+from judge.utils.ratelimit import submission_finished
 
-def finished_submission(sub):
-    keys = ['user_complete:%d' % sub.user_id, 'user_attempted:%s' % sub.user_id]
+
+def _contest_keys(sub):
     if hasattr(sub, 'contest'):
         participation = sub.contest.participation
-        keys += ['contest_complete:%d' % participation.id]
-        keys += ['contest_attempted:%d' % participation.id]
-    cache.delete_many(keys)
+        return ['contest_complete:%d' % participation.id, 'contest_attempted:%d' % participation.id]
+    return []
+
+
+def finished_submission(sub):
+    SubmissionResultCount.add(sub, sub.result)
+    submission_finished(sub, sub.result)
+    # A rejudge may turn a solved problem unsolved, which can't be done incrementally.
+    if sub.rejudged_date is not None:
+        return invalidate_submission(sub)
+    UserProblemStatus.finished(sub)
+    user_finished_submission(sub)
+    record_hot_problem_submission(sub)
+    cache.delete_many(_contest_keys(sub))
+
+
+def invalidate_submission(sub):
+    UserProblemStatus.recompute(sub.user_id, sub.problem_id)
+    invalidate_user_problem_ids(sub.user_id)
+    cache.delete_many(_contest_keys(sub))
+
+
+def failed_submission(sub, result):
+    # Called when a submission ends without being graded, e.g. with a compile error.
+    SubmissionResultCount.add(sub, result)
+    submission_finished(sub, result)
+
+
+def failed_submission_id(submission_id, result):
+    sub = Submission.objects.filter(id=submission_id).only('problem_id', 'user_id', 'language_id').first()
+    if sub is not None:
+        failed_submission(sub, result)
@@ -95,6 +95,38 @@ class AtCoderContestFormat(DefaultContestFormat):
         participation.format_data = format_data
         participation.save()
 
+    def score_submissions(self, participation, submissions):
+        cumtime = 0
+        penalty = 0
+        points = 0
+        format_data = {}
+
+        for prob, subs in self.group_by_problem(submissions):
+            score = max(sub.points for sub in subs)
+            time = min(sub.date for sub in subs if sub.points == score)
+            dt = (time - participation.start).total_seconds()
+
+            # Compute penalty
+            if self.config['penalty']:
+                # An IE can have a submission result of `None`
+                subs = [sub for sub in subs if sub.result is not None and sub.result not in ('IE', 'CE')]
+                if score:
+                    prev = sum(sub.date <= time for sub in subs) - 1
+                    penalty += prev * self.config['penalty'] * 60
+                else:
+                    # We should always display the penalty, even if the user has a score of 0
+                    prev = len(subs)
+            else:
+                prev = 0
+
+            if score:
+                cumtime = max(cumtime, dt)
+
+            format_data[str(prob)] = {'time': dt, 'points': score, 'penalty': prev}
+            points += score
+
+        return round(points, self.contest.points_precision), cumtime + penalty, 0, format_data
+
     def display_user_problem(self, participation, contest_problem):
         format_data = (participation.format_data or {}).get(str(contest_problem.id))
         if format_data:
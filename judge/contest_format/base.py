@@ -1,4 +1,7 @@
 from abc import ABCMeta, abstractmethod
+from collections import defaultdict, namedtuple
+
+ReplaySubmission = namedtuple('ReplaySubmission', 'id problem_id date points result status problem_points batches')
 
 
 class abstractclassmethod(classmethod):
@@ -10,6 +13,9 @@ class abstractclassmethod(classmethod):
 
 
 class BaseContestFormat(metaclass=ABCMeta):
+    # Whether score_submissions needs the per-batch points of each submission.
+    replay_batches = False
+
     @abstractmethod
     def __init__(self, contest, config):
         self.config = config
@@ -47,6 +53,18 @@ class BaseContestFormat(metaclass=ABCMeta):
         """
         raise NotImplementedError()
 
+    def score_submissions(self, participation, submissions):
+        """
+        Computes a participation's results from a list of its contest submissions, without touching the database.
+        This must agree with update_participation, and is used to replay the scoreboard as of an earlier time.
+
+        :param participation: A ContestParticipation object. It must not be modified.
+        :param submissions: A list of ReplaySubmission objects, sorted by date. If replay_batches is set, the batches
+                            field is a dictionary mapping each batch of the submission to its points.
+        :return: A tuple (score, cumtime, tiebreaker, format_data).
+        """
+        raise NotImplementedError()
+
     @abstractmethod
     def display_user_problem(self, participation, contest_problem):
         """
@@ -100,6 +118,13 @@ class BaseContestFormat(metaclass=ABCMeta):
         """
         raise NotImplementedError()
 
+    @staticmethod
+    def group_by_problem(submissions):
+        problems = defaultdict(list)
+        for submission in submissions:
+            problems[submission.problem_id].append(submission)
+        return problems.items()
+
     @classmethod
     def best_solution_state(cls, points, total):
         if not points:
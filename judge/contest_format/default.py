@@ -45,6 +45,21 @@ class DefaultContestFormat(BaseContestFormat):
         participation.format_data = format_data
         participation.save()
 
+    def score_submissions(self, participation, submissions):
+        cumtime = 0
+        points = 0
+        format_data = {}
+
+        for problem_id, subs in self.group_by_problem(submissions):
+            dt = (max(sub.date for sub in subs) - participation.start).total_seconds()
+            problem_points = max(sub.points for sub in subs)
+            if problem_points:
+                cumtime += dt
+            format_data[str(problem_id)] = {'time': dt, 'points': problem_points}
+            points += problem_points
+
+        return round(points, self.contest.points_precision), max(cumtime, 0), 0, format_data
+
     def display_user_problem(self, participation, contest_problem):
         format_data = (participation.format_data or {}).get(str(contest_problem.id))
         if format_data:
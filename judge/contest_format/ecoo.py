@@ -98,6 +98,39 @@ class ECOOContestFormat(DefaultContestFormat):
         participation.format_data = format_data
         participation.save()
 
+    def score_submissions(self, participation, submissions):
+        cumtime = 0
+        score = 0
+        format_data = {}
+
+        for problem_id, subs in self.group_by_problem(submissions):
+            subs = [sub for sub in subs if sub.result not in ('IE', 'CE')]
+            if not subs:
+                continue
+
+            sub_cnt = len(subs)
+            date = max(sub.date for sub in subs)
+            points = max(sub.points for sub in subs if sub.date == date)
+            dt = (date - participation.start).total_seconds()
+
+            bonus = 0
+            if points > 0:
+                # First AC bonus
+                if sub_cnt == 1 and points == subs[0].problem_points:
+                    bonus += self.config['first_ac_bonus']
+                # Time bonus
+                if self.config['time_bonus']:
+                    bonus += (participation.end_time - date).total_seconds() // 60 // self.config['time_bonus']
+
+            format_data[str(problem_id)] = {'time': dt, 'points': points, 'bonus': bonus}
+
+        for data in format_data.values():
+            if self.config['cumtime']:
+                cumtime += data['time']
+            score += data['points'] + data['bonus']
+
+        return round(score, self.contest.points_precision), cumtime, 0, format_data
+
     def display_user_problem(self, participation, contest_problem):
         format_data = (participation.format_data or {}).get(str(contest_problem.id))
         if format_data:
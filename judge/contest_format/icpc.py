@@ -97,6 +97,40 @@ class ICPCContestFormat(DefaultContestFormat):
         participation.format_data = format_data
         participation.save()
 
+    def score_submissions(self, participation, submissions):
+        cumtime = 0
+        last = 0
+        penalty = 0
+        score = 0
+        format_data = {}
+
+        for prob, subs in self.group_by_problem(submissions):
+            points = max(sub.points for sub in subs)
+            time = min(sub.date for sub in subs if sub.points == points)
+            dt = (time - participation.start).total_seconds()
+
+            # Compute penalty
+            if self.config['penalty']:
+                # An IE can have a submission result of `None`
+                subs = [sub for sub in subs if sub.result is not None and sub.result not in ('IE', 'CE')]
+                if points:
+                    prev = sum(sub.date <= time for sub in subs) - 1
+                    penalty += prev * self.config['penalty'] * 60
+                else:
+                    # We should always display the penalty, even if the user has a score of 0
+                    prev = len(subs)
+            else:
+                prev = 0
+
+            if points:
+                cumtime += dt
+                last = max(last, dt)
+
+            format_data[str(prob)] = {'time': dt, 'points': points, 'penalty': prev}
+            score += points
+
+        return round(score, self.contest.points_precision), cumtime + penalty, last, format_data
+
     def display_user_problem(self, participation, contest_problem):
         format_data = (participation.format_data or {}).get(str(contest_problem.id))
         if format_data:
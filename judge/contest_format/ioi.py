@@ -1,96 +1,76 @@
-from django.db import connection
 from django.utils.translation import gettext as _, gettext_lazy
 
+from judge.contest_format.base import ReplaySubmission
 from judge.contest_format.legacy_ioi import LegacyIOIContestFormat
 from judge.contest_format.registry import register_contest_format
-from judge.timezone import from_database_time
 
 
 @register_contest_format('ioi16')
 class IOIContestFormat(LegacyIOIContestFormat):
     name = gettext_lazy('IOI')
     config_defaults = {'cumtime': False}
+    replay_batches = True
     """
         cumtime: Specify True if time penalties are to be computed. Defaults to False.
     """
 
     def update_participation(self, participation):
+        from judge.models import PackedTestCases
+
+        # Test cases may be packed, so the points of each batch are computed in Python instead of SQL.
+        rows = participation.submissions.values_list(
+            'submission_id', 'problem_id', 'submission__date', 'points', 'submission__result', 'submission__status',
+            'problem__points',
+        )
+        batches = PackedTestCases.batch_points(participation.submissions.values('submission_id'))
+        submissions = sorted((
+            ReplaySubmission(
+                id=submission_id, problem_id=problem_id, date=date, points=points, result=result, status=status,
+                problem_points=problem_points, batches=batches.get(submission_id, {}),
+            )
+            for submission_id, problem_id, date, points, result, status, problem_points in rows
+        ), key=lambda submission: (submission.date, submission.id))
+
+        score, cumtime, tiebreaker, format_data = self.score_submissions(participation, submissions)
+        participation.cumtime = cumtime
+        participation.score = score
+        participation.tiebreaker = tiebreaker
+        participation.format_data = format_data
+        participation.save()
+
+    def score_submissions(self, participation, submissions):
         cumtime = 0
         score = 0
         format_data = {}
 
-        with connection.cursor() as cursor:
-            cursor.execute("""
-                SELECT q.prob,
-                       MIN(q.date) as `date`,
-                       q.batch_points
-                FROM (
-                         SELECT cp.id          as `prob`,
-                                sub.id         as `subid`,
-                                sub.date       as `date`,
-                                tc.points      as `points`,
-                                tc.batch       as `batch`,
-                                MIN(tc.points) as `batch_points`
-                         FROM judge_contestproblem cp
-                                  INNER JOIN
-                              judge_contestsubmission cs
-                              ON (cs.problem_id = cp.id AND cs.participation_id = %s)
-                                  LEFT OUTER JOIN
-                              judge_submission sub
-                              ON (sub.id = cs.submission_id AND sub.status = 'D')
-                                  INNER JOIN judge_submissiontestcase tc
-                              ON sub.id = tc.submission_id
-                         GROUP BY cp.id, tc.batch, sub.id
-                     ) q
-                         INNER JOIN (
-                    SELECT prob, batch, MAX(r.batch_points) as max_batch_points
-                    FROM (
-                             SELECT cp.id          as `prob`,
-                                    tc.batch       as `batch`,
-                                    MIN(tc.points) as `batch_points`
-                             FROM judge_contestproblem cp
-                                      INNER JOIN
-                                  judge_contestsubmission cs
-                                  ON (cs.problem_id = cp.id AND cs.participation_id = %s)
-                                      LEFT OUTER JOIN
-                                  judge_submission sub
-                                  ON (sub.id = cs.submission_id AND sub.status = 'D')
-                                      INNER JOIN judge_submissiontestcase tc
-                                  ON sub.id = tc.submission_id
-                             GROUP BY cp.id, tc.batch, sub.id
-                         ) r
-                    GROUP BY prob, batch
-                ) p
-                ON p.prob = q.prob AND (p.batch = q.batch OR p.batch is NULL AND q.batch is NULL)
-                WHERE p.max_batch_points = q.batch_points
-                GROUP BY q.prob, q.batch
-            """, (participation.id, participation.id))
+        # Maps (problem, batch) to the best points on that batch, and the earliest time they were obtained.
+        best = {}
+        for sub in submissions:
+            if sub.status != 'D':
+                continue
+            for batch, points in sub.batches.items():
+                key = sub.problem_id, batch
+                if key not in best or points > best[key][0] or (points == best[key][0] and sub.date < best[key][1]):
+                    best[key] = points, sub.date
 
-            for problem_id, time, subtask_points in cursor.fetchall():
-                problem_id = str(problem_id)
-                time = from_database_time(time)
-                if self.config['cumtime']:
-                    dt = (time - participation.start).total_seconds()
-                else:
-                    dt = 0
+        for (problem_id, batch), (subtask_points, time) in best.items():
+            problem_id = str(problem_id)
+            if self.config['cumtime']:
+                dt = (time - participation.start).total_seconds()
+            else:
+                dt = 0
 
-                if format_data.get(problem_id) is None:
-                    format_data[problem_id] = {'points': 0, 'time': 0}
-                format_data[problem_id]['points'] += subtask_points
-                format_data[problem_id]['time'] = max(dt, format_data[problem_id]['time'])
+            if format_data.get(problem_id) is None:
+                format_data[problem_id] = {'points': 0, 'time': 0}
+            format_data[problem_id]['points'] += subtask_points
+            format_data[problem_id]['time'] = max(dt, format_data[problem_id]['time'])
 
-            for problem_data in format_data.values():
-                penalty = problem_data['time']
-                points = problem_data['points']
-                if self.config['cumtime'] and points:
-                    cumtime += penalty
-                score += points
+        for problem_data in format_data.values():
+            if self.config['cumtime'] and problem_data['points']:
+                cumtime += problem_data['time']
+            score += problem_data['points']
 
-        participation.cumtime = max(cumtime, 0)
-        participation.score = round(score, self.contest.points_precision)
-        participation.tiebreaker = 0
-        participation.format_data = format_data
-        participation.save()
+        return round(score, self.contest.points_precision), max(cumtime, 0), 0, format_data
 
     def get_short_form_display(self):
         yield _('The maximum score for each problem batch will be used.')
@@ -69,6 +69,26 @@ class LegacyIOIContestFormat(DefaultContestFormat):
         participation.format_data = format_data
         participation.save()
 
+    def score_submissions(self, participation, submissions):
+        cumtime = 0
+        score = 0
+        format_data = {}
+
+        for problem_id, subs in self.group_by_problem(submissions):
+            points = max(sub.points for sub in subs)
+            if self.config['cumtime']:
+                time = min(sub.date for sub in subs if sub.points == points)
+                dt = (time - participation.start).total_seconds()
+                if points:
+                    cumtime += dt
+            else:
+                dt = 0
+
+            format_data[str(problem_id)] = {'points': points, 'time': dt}
+            score += points
+
+        return round(score, self.contest.points_precision), max(cumtime, 0), 0, format_data
+
     def display_user_problem(self, participation, contest_problem):
         format_data = (participation.format_data or {}).get(str(contest_problem.id))
         if format_data:
@@ -1,5 +1,9 @@
+import hashlib
+import json
 import logging
 import re
+import threading
+from collections import OrderedDict
 from html import unescape
 from urllib.parse import urlparse
 
@@ -7,6 +11,7 @@ import mistune
 from bleach.css_sanitizer import CSSSanitizer
 from bleach.sanitizer import Cleaner
 from django.conf import settings
+from django.core.cache import cache
 from lxml import html
 from lxml.etree import ParserError, XMLSyntaxError
 from markupsafe import Markup
@@ -16,6 +21,7 @@ from judge.jinja2.markdown.lazy_load import lazy_load as lazy_load_processor
 from judge.jinja2.markdown.math import MathInlineGrammar, MathInlineLexer, MathRenderer
 from judge.utils.camo import client as camo_client
 from judge.utils.texoid import TEXOID_ENABLED, TexoidRenderer
+from judge.utils.unicode import utf8bytes
 from .bleach_whitelist import all_styles, mathml_attrs, mathml_tags
 from .. import registry
 
@@ -41,8 +47,19 @@ class AwesomeRenderer(MathRenderer, mistune.Renderer):
     def __init__(self, *args, **kwargs):
         self.nofollow = kwargs.pop('nofollow', True)
         self.texoid = TexoidRenderer() if kwargs.pop('texoid', False) else None
+        self.texoid_failed = False
         super(AwesomeRenderer, self).__init__(*args, **kwargs)
 
+    def reset(self):
+        self.texoid_failed = False
+        self.reset_math()
+        if self.mathoid is not None:
+            self.mathoid.failed = False
+
+    @property
+    def cacheable(self):
+        return not self.texoid_failed and not (self.mathoid is not None and self.mathoid.failed)
+
     def _link_rel(self, href):
         if href:
             try:
@@ -85,6 +102,7 @@ class AwesomeRenderer(MathRenderer, mistune.Renderer):
             latex = unescape(latex)
             result = self.texoid.get_result(latex)
             if not result:
+                self.texoid_failed = True
                 return '<pre>%s</pre>' % mistune.escape(latex, smart_amp=False)
             elif 'error' not in result:
                 img = ('''<img src="%(svg)s" onerror="this.src='%(png)s';this.onerror=null"'''
@@ -164,6 +182,57 @@ def fragment_tree_to_str(tree):
     return html.tostring(tree, encoding='unicode')[len('<div>'):-len('</div>')]
 
 
+class RenderCache(object):
+    """
+    A thread-safe LRU cache of rendered markdown, holding at most `size` documents.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            result = self.entries.get(key)
+            if result is not None:
+                self.entries.move_to_end(key)
+            return result
+
+    def set(self, key, result):
+        with self.lock:
+            self.entries[key] = result
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+
+render_cache = RenderCache(settings.DMOJ_MARKDOWN_CACHE_SIZE)
+style_versions = {}
+_local = threading.local()
+
+
+def get_parser(*options):
+    """
+    Returns a markdown parser for the options, built once per thread since parsers hold state while rendering.
+    """
+    parsers = _local.__dict__.setdefault('parsers', {})
+    if options not in parsers:
+        escape, nofollow, texoid, math, math_engine = options
+        renderer = AwesomeRenderer(escape=escape, nofollow=nofollow, texoid=texoid, math=math, math_engine=math_engine)
+        parsers[options] = mistune.Markdown(renderer=renderer, inline=AwesomeInlineLexer,
+                                            parse_block_html=1, parse_inline_html=1)
+    return parsers[options]
+
+
+def get_style_version(style, styles):
+    # Computed before get_cleaner modifies the bleach parameters, so every process agrees on the version.
+    if style not in style_versions:
+        config = json.dumps(styles, sort_keys=True, default=repr)
+        style_versions[style] = hashlib.sha1(utf8bytes(config)).hexdigest()
+    return style_versions[style]
+
+
 @registry.filter
 def markdown(value, style, math_engine=None, lazy_load=False, strip_paragraphs=False):
     styles = settings.MARKDOWN_STYLES.get(style, settings.MARKDOWN_DEFAULT_STYLE)
@@ -179,11 +248,30 @@ def markdown(value, style, math_engine=None, lazy_load=False, strip_paragraphs=F
     if lazy_load:
         post_processors.append(lazy_load_processor)
 
-    renderer = AwesomeRenderer(escape=escape, nofollow=nofollow, texoid=texoid,
-                               math=math and math_engine is not None, math_engine=math_engine)
-    markdown = mistune.Markdown(renderer=renderer, inline=AwesomeInlineLexer,
-                                parse_block_html=1, parse_inline_html=1)
-    result = markdown(value)
+    value = str(value)
+    key = (style, math_engine, lazy_load, strip_paragraphs, hashlib.sha256(utf8bytes(value)).hexdigest())
+    result = render_cache.get(key)
+    if result is not None:
+        return Markup(result)
+
+    shared_key = None
+    if settings.DMOJ_MARKDOWN_SHARED_CACHE_TIMEOUT is not None:
+        version = get_style_version(style, styles)
+        shared_key = 'markdown:%s' % hashlib.sha1(utf8bytes(repr((version,) + key))).hexdigest()
+        result = cache.get(shared_key)
+        if result is not None:
+            render_cache.set(key, result)
+            return Markup(result)
+
+    markdown = get_parser(escape, nofollow, texoid, bool(math) and math_engine is not None, math_engine)
+    renderer = markdown.renderer
+    renderer.reset()
+    try:
+        result = renderer.resolve_math(markdown(value))
+    except Exception:
+        # The parser could be left holding state from the failed document, so build a new one next time.
+        _local.parsers.clear()
+        raise
 
     if post_processors or strip_paragraphs:
         tree = fragments_to_tree(result)
@@ -194,4 +282,9 @@ def markdown(value, style, math_engine=None, lazy_load=False, strip_paragraphs=F
         result = fragment_tree_to_str(tree)
     if bleach_params:
         result = get_cleaner(style, bleach_params).clean(result)
+
+    if renderer.cacheable:
+        render_cache.set(key, result)
+        if shared_key is not None:
+            cache.set(shared_key, result, settings.DMOJ_MARKDOWN_SHARED_CACHE_TIMEOUT)
     return Markup(result)
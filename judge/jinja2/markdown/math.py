@@ -1,4 +1,5 @@
 import re
+import secrets
 
 import mistune
 
@@ -47,19 +48,48 @@ class MathInlineLexer(mistune.InlineLexer):
 
 
 class MathRenderer(mistune.Renderer):
+    """
+    Renders formulas through mathoid. Formulas are replaced by placeholders while rendering, and resolve_math
+    renders all of a document's formulas at once and substitutes them in.
+    """
+
     def __init__(self, *args, **kwargs):
         if kwargs.pop('math', False):
             self.mathoid = MathoidMathParser(kwargs.pop('math_engine', None) or 'svg')
         else:
             self.mathoid = None
+        self.pending_math = []
+        self.math_nonce = ''
         super(MathRenderer, self).__init__(*args, **kwargs)
 
+    def reset_math(self):
+        self.pending_math = []
+        # Unique to each document, so that its text can't contain placeholders.
+        self.math_nonce = secrets.token_hex(8)
+
+    def _math_placeholder(self, formula, fallback):
+        self.pending_math.append((formula, fallback))
+        return '\x02math-%s-%d\x03' % (self.math_nonce, len(self.pending_math) - 1)
+
+    def resolve_math(self, text):
+        if not self.pending_math:
+            return text
+        results = self.mathoid.get_results(formula for formula, fallback in self.pending_math)
+
+        def replace(match):
+            formula, fallback = self.pending_math[int(match.group(1))]
+            return results[formula] or fallback
+
+        text = re.sub(r'\x02math-%s-(\d+)\x03' % self.math_nonce, replace, text)
+        self.pending_math = []
+        return text
+
     def block_math(self, math):
         if self.mathoid is None or not math:
             return r'\[%s\]' % mistune.escape(str(math))
-        return self.mathoid.display_math(math)
+        return self._math_placeholder(*self.mathoid.display_formula(math))
 
     def math(self, math):
         if self.mathoid is None or not math:
             return r'\(%s\)' % mistune.escape(str(math))
-        return self.mathoid.inline_math(math)
+        return self._math_placeholder(*self.mathoid.inline_formula(math))
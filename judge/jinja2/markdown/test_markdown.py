@@ -1,7 +1,11 @@
-from django.test import SimpleTestCase
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
 from lxml import html
 
-from . import fragment_tree_to_str, fragments_to_tree, get_cleaner, markdown
+from . import RenderCache, fragment_tree_to_str, fragments_to_tree, get_cleaner, get_parser, markdown
 
 MATHML_N = """\
 <math xmlns="http://www.w3.org/1998/Math/MathML">
@@ -131,6 +135,67 @@ class TestMarkdown(SimpleTestCase):
                              '<img src="/static/blank.gif" data-src="test.png" class="unveil"></p>')
 
 
+class TestRenderCache(SimpleTestCase):
+    def test_lru(self):
+        render_cache = RenderCache(2)
+        render_cache.set('a', '1')
+        render_cache.set('b', '2')
+        self.assertEqual(render_cache.get('a'), '1')
+        render_cache.set('c', '3')
+        self.assertIsNone(render_cache.get('b'))
+        self.assertEqual(render_cache.get('a'), '1')
+
+    def test_parser_reused(self):
+        self.assertIs(get_parser(True, True, False, False, None), get_parser(True, True, False, False, None))
+
+    def test_render_once(self):
+        with mock.patch('judge.jinja2.markdown.render_cache', RenderCache(10)), \
+                mock.patch('judge.jinja2.markdown.get_parser', wraps=get_parser) as parser:
+            self.assertHTMLEqual(markdown('**cached**', 'problem'), '<p><strong>cached</strong></p>')
+            self.assertHTMLEqual(markdown('**cached**', 'problem'), '<p><strong>cached</strong></p>')
+            self.assertEqual(parser.call_count, 1)
+            markdown('**cached**', 'problem', strip_paragraphs=True)
+            self.assertEqual(parser.call_count, 2)
+
+    @override_settings(DMOJ_MARKDOWN_SHARED_CACHE_TIMEOUT=60)
+    def test_shared_cache(self):
+        cache.clear()
+        with mock.patch('judge.jinja2.markdown.render_cache', RenderCache(10)):
+            markdown('*shared*', 'problem')
+        with mock.patch('judge.jinja2.markdown.render_cache', RenderCache(10)), \
+                mock.patch('judge.jinja2.markdown.get_parser', wraps=get_parser) as parser:
+            self.assertHTMLEqual(markdown('*shared*', 'problem'), '<p><em>shared</em></p>')
+            self.assertEqual(parser.call_count, 0)
+
+
+class TestMath(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(MATHOID_URL='http://mathoid.invalid/', MATHOID_CACHE_ROOT=directory.name,
+                                     MATHOID_CACHE_URL='/mathoid/')
+        settings.enable()
+        self.addCleanup(settings.disable)
+        patcher = mock.patch('judge.jinja2.markdown.render_cache', RenderCache(10))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @mock.patch('judge.utils.mathoid.MathoidMathParser.query_mathoid',
+                side_effect=lambda formula, hash: {'css': 'width: 1ex', 'mml': '<math></math>', 'svg': hash})
+    def test_batched(self, query_mathoid):
+        result = markdown('~a~ and ~a~, ~b~\n\n$$c$$', 'problem-full', math_engine='svg')
+        self.assertEqual(sorted(call.args[0] for call in query_mathoid.call_args_list), [r'\displaystyle c', 'a', 'b'])
+        self.assertEqual(result.count('class="inline-math"'), 3)
+        self.assertEqual(result.count('class="display-math"'), 1)
+        self.assertIn('alt="b"', result)
+
+    @mock.patch('judge.utils.mathoid.MathoidMathParser.query_mathoid', return_value=None)
+    def test_failure(self, query_mathoid):
+        self.assertHTMLEqual(markdown('~a < b~', 'problem-full', math_engine='svg'), r'<p>\(a &lt; b\)</p>')
+        markdown('~a < b~', 'problem-full', math_engine='svg')
+        self.assertEqual(query_mathoid.call_count, 2)
+
+
 class TestFragmentUtils(SimpleTestCase):
     def test_simple(self):
         tree = fragments_to_tree('<p>a</p><p>b</p>')
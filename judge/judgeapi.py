@@ -51,7 +51,8 @@ def judge_request(packet, reply=True):
 
 
 def judge_submission(submission, rejudge=False, batch_rejudge=False, judge_id=None):
-    from .models import ContestSubmission, Submission, SubmissionTestCase
+    from .caching import failed_submission
+    from .models import ContestSubmission, PackedTestCases, Submission, SubmissionResultCount, SubmissionTestCase
 
     updates = {'time': None, 'memory': None, 'points': None, 'result': None, 'case_points': 0, 'case_total': 0,
                'error': None, 'rejudged_date': timezone.now() if rejudge or batch_rejudge else None, 'status': 'QU'}
@@ -73,10 +74,13 @@ def judge_submission(submission, rejudge=False, batch_rejudge=False, judge_id=No
     # as that would prevent people from knowing a submission is being scheduled for rejudging.
     # It is worth noting that this mechanism does not prevent a new rejudge from being scheduled
     # while already queued, but that does not lead to data corruption.
+    old_result = Submission.objects.filter(id=submission.id).values_list('result', flat=True).first()
     if not Submission.objects.filter(id=submission.id).exclude(status__in=('P', 'G')).update(**updates):
         return False
+    SubmissionResultCount.add(submission, old_result, -1)
 
     SubmissionTestCase.objects.filter(submission_id=submission.id).delete()
+    PackedTestCases.objects.filter(submission_id=submission.id).delete()
 
     try:
         response = judge_request({
@@ -91,10 +95,12 @@ def judge_submission(submission, rejudge=False, batch_rejudge=False, judge_id=No
     except BaseException:
         logger.exception('Failed to send request to judge')
         Submission.objects.filter(id=submission.id).update(status='IE', result='IE')
+        failed_submission(submission, 'IE')
         success = False
     else:
         if response['name'] != 'submission-received' or response['submission-id'] != submission.id:
             Submission.objects.filter(id=submission.id).update(status='IE', result='IE')
+            failed_submission(submission, 'IE')
         _post_update_submission(submission)
         success = True
     return success
@@ -109,6 +115,7 @@ def update_disable_judge(judge):
 
 
 def abort_submission(submission):
+    from .caching import failed_submission
     from .models import Submission
     # We only want to try to abort a submission if it's still grading, otherwise this can lead to fully graded
     # submissions marked as aborted.
@@ -118,6 +125,7 @@ def abort_submission(submission):
     # This defaults to true, so that in the case the JudgeList fails to remove the submission from the queue,
     # and returns a bad-request, the submission is not falsely shown as "Aborted" when it will still be judged.
     if not response.get('judge-aborted', True):
-        Submission.objects.filter(id=submission.id).update(status='AB', result='AB', points=0)
+        if Submission.objects.filter(id=submission.id).update(status='AB', result='AB', points=0):
+            failed_submission(submission, 'AB')
         event.post('sub_%s' % Submission.get_id_secret(submission.id), {'type': 'aborted'})
         _post_update_submission(submission, done=True)
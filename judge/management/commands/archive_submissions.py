@@ -0,0 +1,54 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from judge.models import ArchivedSubmission, Submission
+
+
+class Command(BaseCommand):
+    help = 'Moves old submissions which do not affect any scores into the submission archive'
+
+    def add_arguments(self, parser):
+        parser.add_argument('days', type=int, help='archive submissions older than this many days')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='number of submissions to consider at once')
+
+    def handle(self, *args, **options):
+        # Contest submissions are needed to recompute rankings, and unfinished ones are still being judged.
+        candidates = Submission.objects.filter(
+            date__lt=timezone.now() - timedelta(days=options['days']),
+            contest_object__isnull=True, contest__isnull=True, status__in=['D', 'IE', 'CE', 'AB'],
+        ).order_by('id')
+
+        last_id = 0
+        archived = 0
+        while True:
+            chunk = list(candidates.filter(id__gt=last_id).values_list('id', 'user_id', 'problem_id')
+                         [:options['chunk_size']])
+            if not chunk:
+                break
+            kept = self.kept_submission_ids({user_id for id, user_id, problem_id in chunk},
+                                            {problem_id for id, user_id, problem_id in chunk})
+            archived += ArchivedSubmission.archive([id for id, user_id, problem_id in chunk if id not in kept])
+            last_id = chunk[-1][0]
+            self.stdout.write('Archived %d submissions, up to ID %d' % (archived, last_id))
+
+    def kept_submission_ids(self, user_ids, problem_ids):
+        """
+        Returns the IDs of the submissions that users' points and solved problems are computed from: for every user
+        and problem, the submission with the most points and the first fully accepted submission.
+        """
+        best = {}
+        first_ac = {}
+        for id, user_id, problem_id, points, result, case_points, case_total, is_archived in (
+            Submission.objects.filter(user_id__in=user_ids, problem_id__in=problem_ids).order_by('id')
+                              .values_list('id', 'user_id', 'problem_id', 'points', 'result', 'case_points',
+                                           'case_total', 'is_archived')
+        ):
+            key = user_id, problem_id
+            rank = not is_archived, -1 if points is None else points
+            if key not in best or rank > best[key][0]:
+                best[key] = rank, id
+            if not is_archived and result == 'AC' and case_points >= case_total:
+                first_ac.setdefault(key, id)
+        return {id for rank, id in best.values()} | set(first_ac.values())
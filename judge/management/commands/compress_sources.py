@@ -0,0 +1,87 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import Length
+
+from judge.models import SourceBlob, SubmissionSource
+
+
+class Command(BaseCommand):
+    help = 'Moves submission sources into compressed, deduplicated source blobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='number of sources to convert at once')
+        parser.add_argument('--stats', action='store_true', help='only print how much space the blobs save')
+        parser.add_argument('--prune', action='store_true', help='delete blobs no longer used by any submission')
+
+    def handle(self, *args, **options):
+        if options['prune']:
+            self.prune(options['chunk_size'])
+        if not options['stats']:
+            self.convert(options['chunk_size'])
+        self.print_stats()
+
+    def prune(self, chunk_size):
+        last_hash = ''
+        deleted = 0
+        while True:
+            hashes = list(SourceBlob.objects.filter(sources__isnull=True, hash__gt=last_hash).order_by('hash')
+                          .values_list('hash', flat=True)[:chunk_size])
+            if not hashes:
+                break
+
+            with transaction.atomic():
+                # A new submission may have reused a blob since it was found unused, so the blobs are locked and
+                # checked again before deleting them. Submissions lock the blobs they use in the same way.
+                locked = list(SourceBlob.objects.select_for_update().filter(hash__in=hashes)
+                              .values_list('hash', flat=True))
+                unused = list(SourceBlob.objects.filter(hash__in=locked, sources__isnull=True)
+                              .values_list('hash', flat=True))
+                deleted += SourceBlob.objects.filter(hash__in=unused).delete()[0]
+
+            last_hash = hashes[-1]
+        self.stdout.write('Deleted %d unused blobs' % deleted)
+
+    def convert(self, chunk_size):
+        last_id = 0
+        converted = 0
+        while True:
+            sources = list(SubmissionSource.objects.filter(blob__isnull=True, id__gt=last_id).order_by('id')
+                           .only('id', 'raw_source')[:chunk_size])
+            if not sources:
+                break
+
+            blobs = {}
+            for source in sources:
+                hash, data, size = SourceBlob.compress(source.raw_source)
+                blobs.setdefault(hash, SourceBlob(hash=hash, data=data, size=size))
+                source.blob_id = hash
+                source.raw_source = ''
+
+            with transaction.atomic():
+                # Lock the blobs that already exist, so that they can't be pruned before the sources are updated.
+                existing = set(SourceBlob.objects.select_for_update().filter(hash__in=list(blobs))
+                               .values_list('hash', flat=True))
+                SourceBlob.objects.bulk_create([blob for hash, blob in blobs.items() if hash not in existing],
+                                               ignore_conflicts=True)
+                SubmissionSource.objects.bulk_update(sources, ['blob', 'raw_source'])
+
+            last_id = sources[-1].id
+            converted += len(sources)
+            self.stdout.write('Converted %d sources, up to ID %d' % (converted, last_id))
+
+    def print_stats(self):
+        sources = SubmissionSource.objects.count()
+        unconverted = SubmissionSource.objects.filter(blob__isnull=True)
+        source_size = SubmissionSource.objects.aggregate(size=Sum('blob__size'))['size'] or 0
+        blobs = SourceBlob.objects.aggregate(count=Count('hash'), size=Sum('size'), stored=Sum(Length('data')))
+        unconverted_size = unconverted.aggregate(size=Sum(Length('raw_source')))['size'] or 0
+
+        self.stdout.write('Sources: %d, of which %d are not converted' % (sources, unconverted.count()))
+        self.stdout.write('Unique blobs: %d' % (blobs['count'] or 0))
+        self.stdout.write('Size of converted sources: %d bytes' % source_size)
+        self.stdout.write('Size of unique sources: %d bytes' % (blobs['size'] or 0))
+        self.stdout.write('Size of compressed blobs: %d bytes' % (blobs['stored'] or 0))
+        self.stdout.write('Size of unconverted sources: %d characters' % unconverted_size)
+        if source_size:
+            self.stdout.write('Space saved: %.1f%%' % (100 - 100 * (blobs['stored'] or 0) / source_size))
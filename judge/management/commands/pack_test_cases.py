@@ -0,0 +1,35 @@
+from itertools import groupby
+from operator import attrgetter
+
+from django.core.management.base import BaseCommand
+
+from judge.models import PackedTestCases, SubmissionTestCase
+
+
+class Command(BaseCommand):
+    help = 'Packs the test cases of graded submissions into one row per submission'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=100, help='number of submissions to pack at once')
+        parser.add_argument('--start', type=int, default=0, help='submission ID to start from')
+
+    def handle(self, *args, **options):
+        last_id = options['start'] - 1
+        packed = 0
+        while True:
+            # Only completed submissions are packed, since the bridge still adds rows to those being graded.
+            submission_ids = list(
+                SubmissionTestCase.objects.filter(submission_id__gt=last_id, submission__status='D')
+                                          .order_by('submission_id').values_list('submission_id', flat=True)
+                                          .distinct()[:options['chunk_size']],
+            )
+            if not submission_ids:
+                break
+
+            cases = SubmissionTestCase.objects.filter(submission_id__in=submission_ids).order_by('submission_id')
+            for submission_id, submission_cases in groupby(cases, key=attrgetter('submission_id')):
+                PackedTestCases.pack(submission_id, list(submission_cases))
+
+            last_id = submission_ids[-1]
+            packed += len(submission_ids)
+            self.stdout.write('Packed %d submissions, up to ID %d' % (packed, last_id))
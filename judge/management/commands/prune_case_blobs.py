@@ -0,0 +1,58 @@
+import json
+import time
+import zlib
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from judge.models import ArchivedSubmission, PackedTestCases, SubmissionTestCase
+from judge.utils.blob_store import BlobStore, CASE_BLOB_PREFIX, case_blob_hash
+
+
+class Command(BaseCommand):
+    help = 'Deletes test case blobs no longer referenced by any test case'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-hours', type=float, default=24,
+                            help='only delete blobs not stored for this many hours, since the bridge saves the test '
+                                 'cases referring to a blob after storing it')
+        parser.add_argument('--dry-run', action='store_true', help='only print how many blobs would be deleted')
+
+    def handle(self, *args, **options):
+        if not settings.DMOJ_TEST_CASE_BLOB_ROOT:
+            raise CommandError('DMOJ_TEST_CASE_BLOB_ROOT is not set')
+        store = BlobStore(settings.DMOJ_TEST_CASE_BLOB_ROOT)
+
+        # The candidates are listed before the references are collected, so that a blob stored and referenced in
+        # between is too new to be a candidate.
+        cutoff = time.time() - options['grace_hours'] * 3600
+        candidates = {hash for hash, mtime in store.list() if mtime < cutoff}
+        unused = candidates - self.referenced_hashes()
+
+        if not options['dry_run']:
+            for hash in unused:
+                store.delete(hash)
+        self.stdout.write('%s %d of %d blobs' % ('Would delete' if options['dry_run'] else 'Deleted', len(unused),
+                                                 len(candidates)))
+
+    def referenced_hashes(self):
+        hashes = set()
+        cases = SubmissionTestCase.objects.filter(Q(output__startswith=CASE_BLOB_PREFIX) |
+                                                  Q(extended_feedback__startswith=CASE_BLOB_PREFIX))
+        for values in cases.values_list('extended_feedback', 'output').iterator():
+            hashes.update(map(case_blob_hash, values))
+
+        # Packed and archived test cases keep their text in zlib-compressed JSON lists of
+        # (feedback, extended_feedback, output) triples.
+        packed = PackedTestCases.objects.filter(feedback__isnull=False).values_list('feedback', flat=True)
+        archived = ArchivedSubmission.objects.filter(test_case_feedback__isnull=False) \
+                                             .values_list('test_case_feedback', flat=True)
+        for queryset in (packed, archived):
+            for feedback in queryset.iterator():
+                for _, extended_feedback, output in json.loads(zlib.decompress(feedback)):
+                    hashes.add(case_blob_hash(extended_feedback))
+                    hashes.add(case_blob_hash(output))
+
+        hashes.discard(None)
+        return hashes
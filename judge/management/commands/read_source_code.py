@@ -30,11 +30,7 @@ class Command(BaseCommand):
             submission_ids = [int(s.strip()) for s in f.read().strip().splitlines()]
 
         for batch_ids in chunked(submission_ids, BATCH_SIZE):
-            sources_by_id = dict(
-                SubmissionSource.objects
-                .filter(submission_id__in=batch_ids)
-                .values_list('submission_id', 'source'),
-            )
+            sources_by_id = SubmissionSource.get_sources(batch_ids)
 
             for sid in batch_ids:
                 self.stdout.write(json.dumps({'id': sid, 'source': sources_by_id.get(sid)}))
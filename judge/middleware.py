@@ -14,6 +14,7 @@ from django.utils.encoding import force_bytes
 from requests.exceptions import HTTPError
 
 from judge.models import MiscConfig
+from judge.replicas import SAFE_METHODS, STICKY_COOKIE
 
 try:
     import uwsgi
@@ -36,6 +37,18 @@ class ShortCircuitMiddleware:
         return self.get_response(request)
 
 
+class ReplicaStickinessMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if settings.DMOJ_READ_REPLICAS and request.method not in SAFE_METHODS:
+            response.set_cookie(STICKY_COOKIE, '1', max_age=settings.DMOJ_REPLICA_STICKY_TIME,
+                                httponly=True, samesite='Lax')
+        return response
+
+
 class DMOJLoginMiddleware(object):
     def __init__(self, get_response):
         self.get_response = get_response
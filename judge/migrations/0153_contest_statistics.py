@@ -0,0 +1,28 @@
+import django.db.models.deletion
+import jsonfield.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('judge', '0152_deactivate_user_permission'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContestStatistics',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', jsonfield.fields.JSONField(verbose_name='statistics data')),
+                ('generated', models.DateTimeField(auto_now=True, verbose_name='generation time')),
+                ('contest', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE,
+                                                 related_name='statistics', to='judge.contest',
+                                                 verbose_name='contest')),
+            ],
+            options={
+                'verbose_name': 'contest statistics',
+                'verbose_name_plural': 'contest statistics',
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('judge', '0153_contest_statistics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserProblemStatus',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('solved', models.BooleanField(default=False, verbose_name='solved')),
+                ('problem', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE,
+                                              related_name='user_statuses', to='judge.problem',
+                                              verbose_name='problem')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE,
+                                           related_name='problem_statuses', to='judge.profile',
+                                           verbose_name='user')),
+            ],
+            options={
+                'verbose_name': 'user problem status',
+                'verbose_name_plural': 'user problem statuses',
+                'unique_together': {('user', 'problem')},
+            },
+        ),
+        migrations.RunSQL("""
+            INSERT INTO `judge_userproblemstatus` (`user_id`, `problem_id`, `solved`)
+            SELECT `user_id`, `problem_id`,
+                   MAX(`is_archived` = 0 AND `result` = 'AC' AND `case_points` >= `case_total`)
+            FROM `judge_submission`
+            GROUP BY `user_id`, `problem_id`
+        """, migrations.RunSQL.noop, elidable=True),
+    ]
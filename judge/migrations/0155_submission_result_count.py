@@ -0,0 +1,55 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('judge', '0154_user_problem_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubmissionResultCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('P', 'problem'), ('U', 'user'), ('L', 'language')], max_length=1,
+                                          verbose_name='kind')),
+                ('object_id', models.IntegerField(verbose_name='object ID')),
+                ('result', models.CharField(choices=[('AC', 'Accepted'), ('WA', 'Wrong Answer'),
+                                                     ('TLE', 'Time Limit Exceeded'),
+                                                     ('MLE', 'Memory Limit Exceeded'),
+                                                     ('OLE', 'Output Limit Exceeded'), ('IR', 'Invalid Return'),
+                                                     ('RTE', 'Runtime Error'), ('CE', 'Compile Error'),
+                                                     ('IE', 'Internal Error'), ('SC', 'Short Circuited'),
+                                                     ('AB', 'Aborted')],
+                                            max_length=3, verbose_name='result')),
+                ('count', models.IntegerField(default=0, verbose_name='count')),
+            ],
+            options={
+                'verbose_name': 'submission result count',
+                'verbose_name_plural': 'submission result counts',
+                'unique_together': {('kind', 'object_id', 'result')},
+            },
+        ),
+        migrations.RunSQL("""
+            INSERT INTO `judge_submissionresultcount` (`kind`, `object_id`, `result`, `count`)
+            SELECT 'P', `problem_id`, `result`, COUNT(*)
+            FROM `judge_submission`
+            WHERE `result` IS NOT NULL
+            GROUP BY `problem_id`, `result`
+        """, migrations.RunSQL.noop, elidable=True),
+        migrations.RunSQL("""
+            INSERT INTO `judge_submissionresultcount` (`kind`, `object_id`, `result`, `count`)
+            SELECT 'U', `user_id`, `result`, COUNT(*)
+            FROM `judge_submission`
+            WHERE `result` IS NOT NULL
+            GROUP BY `user_id`, `result`
+        """, migrations.RunSQL.noop, elidable=True),
+        migrations.RunSQL("""
+            INSERT INTO `judge_submissionresultcount` (`kind`, `object_id`, `result`, `count`)
+            SELECT 'L', `language_id`, `result`, COUNT(*)
+            FROM `judge_submission`
+            WHERE `result` IS NOT NULL
+            GROUP BY `language_id`, `result`
+        """, migrations.RunSQL.noop, elidable=True),
+    ]
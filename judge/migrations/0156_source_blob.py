@@ -0,0 +1,46 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('judge', '0155_submission_result_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SourceBlob',
+            fields=[
+                ('hash', models.CharField(max_length=64, primary_key=True, serialize=False,
+                                          verbose_name='SHA-256 hash')),
+                ('data', models.BinaryField(verbose_name='compressed source')),
+                ('size', models.IntegerField(verbose_name='size')),
+            ],
+            options={
+                'verbose_name': 'source blob',
+                'verbose_name_plural': 'source blobs',
+            },
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RenameField(
+                    model_name='submissionsource',
+                    old_name='source',
+                    new_name='raw_source',
+                ),
+                migrations.AlterField(
+                    model_name='submissionsource',
+                    name='raw_source',
+                    field=models.TextField(blank=True, db_column='source', max_length=65536,
+                                           verbose_name='source code'),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='submissionsource',
+            name='blob',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='sources',
+                                    to='judge.sourceblob', verbose_name='source blob'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('judge', '0156_source_blob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PackedTestCases',
+            fields=[
+                ('submission', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True,
+                                                    related_name='packed_test_cases', serialize=False,
+                                                    to='judge.submission', verbose_name='associated submission')),
+                ('data', models.BinaryField(verbose_name='packed results')),
+                ('feedback', models.BinaryField(null=True, verbose_name='compressed feedback')),
+            ],
+            options={
+                'verbose_name': 'packed submission test cases',
+                'verbose_name_plural': 'packed submission test cases',
+            },
+        ),
+    ]
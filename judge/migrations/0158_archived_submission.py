@@ -0,0 +1,46 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('judge', '0157_packed_test_cases'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedSubmission',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False, verbose_name='submission ID')),
+                ('date', models.DateTimeField(db_index=True, verbose_name='submission time')),
+                ('data', models.BinaryField(verbose_name='compressed submission')),
+                ('test_cases', models.BinaryField(verbose_name='packed test case results')),
+                ('test_case_feedback', models.BinaryField(null=True, verbose_name='compressed test case feedback')),
+                ('problem', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE,
+                                              related_name='archived_submissions', to='judge.problem',
+                                              verbose_name='problem')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE,
+                                           related_name='archived_submissions', to='judge.profile',
+                                           verbose_name='user')),
+            ],
+            options={
+                'verbose_name': 'archived submission',
+                'verbose_name_plural': 'archived submissions',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedSubmissionStats',
+            fields=[
+                ('problem', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True,
+                                                 related_name='archived_submission_stats', serialize=False,
+                                                 to='judge.problem', verbose_name='problem')),
+                ('submissions', models.IntegerField(default=0, verbose_name='submissions')),
+                ('ac_submissions', models.IntegerField(default=0, verbose_name='accepted submissions')),
+            ],
+            options={
+                'verbose_name': 'archived submission statistics',
+                'verbose_name_plural': 'archived submission statistics',
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('judge', '0158_archived_submission'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='problemdata',
+            name='data_version',
+            field=models.CharField(blank=True, help_text='Hash of the data files, updated whenever init.yml is '
+                                                         'generated.', max_length=64, verbose_name='data version'),
+        ),
+    ]
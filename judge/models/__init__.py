@@ -2,8 +2,8 @@ from reversion import revisions
 
 from judge.models.choices import ACE_THEMES, EFFECTIVE_MATH_ENGINES, MATH_ENGINES_CHOICES, TIMEZONE
 from judge.models.comment import Comment, CommentLock, CommentVote
-from judge.models.contest import Contest, ContestMoss, ContestParticipation, ContestProblem, ContestSubmission, \
-    ContestTag, Rating
+from judge.models.contest import Contest, ContestMoss, ContestParticipation, ContestProblem, ContestStatistics, \
+    ContestSubmission, ContestTag, Rating
 from judge.models.interface import BlogPost, MiscConfig, NavigationBar, validate_regex
 from judge.models.problem import LanguageLimit, License, Problem, ProblemClarification, ProblemGroup, \
     ProblemPointsVote, ProblemTranslation, ProblemType, Solution, SubmissionSourceAccess, \
@@ -12,7 +12,9 @@ from judge.models.problem_data import CHECKERS, ProblemData, ProblemTestCase, pr
     problem_directory_file
 from judge.models.profile import Class, Organization, OrganizationRequest, Profile, WebAuthnCredential
 from judge.models.runtime import Judge, Language, RuntimeVersion
-from judge.models.submission import SUBMISSION_RESULT, Submission, SubmissionSource, SubmissionTestCase
+from judge.models.submission import ArchivedSubmission, ArchivedSubmissionStats, PackedTestCases, \
+    SUBMISSION_RESULT, SourceBlob, Submission, SubmissionResultCount, SubmissionSource, SubmissionTestCase, \
+    UserProblemStatus
 from judge.models.ticket import Ticket, TicketMessage
 
 revisions.register(Profile, exclude=['points', 'last_access', 'ip', 'rating'])
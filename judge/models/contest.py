@@ -1,8 +1,10 @@
 from django.conf import settings
-from django.core.exceptions import ValidationError
+from django.core.cache import cache
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
 from django.core.validators import MaxValueValidator, MinValueValidator, RegexValidator
 from django.db import models, transaction
-from django.db.models import CASCADE, Q
+from django.db.models import CASCADE, Case, Count, FloatField, IntegerField, Q, Value, When
+from django.db.models.expressions import CombinedExpression
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.functional import cached_property
@@ -17,7 +19,8 @@ from judge.models.profile import Class, Organization, Profile
 from judge.models.submission import Submission
 from judge.ratings import rate_contest
 
-__all__ = ['Contest', 'ContestTag', 'ContestParticipation', 'ContestProblem', 'ContestSubmission', 'Rating']
+__all__ = ['Contest', 'ContestTag', 'ContestParticipation', 'ContestProblem', 'ContestSubmission', 'Rating',
+           'ContestStatistics']
 
 
 class MinValueOrNoneValidator(MinValueValidator):
@@ -483,6 +486,22 @@ class Contest(models.Model):
             queryset = queryset.filter(q)
         return queryset.distinct()
 
+    def get_statistics(self):
+        # Statistics of a finished contest are stored, since they only change if the contest is rejudged.
+        # For running contests, they are computed at most once a minute.
+        if not self.ended:
+            key = 'contest_stats:%d' % self.id
+            data = cache.get(key)
+            if data is None:
+                data = ContestStatistics.compute(self)
+                cache.set(key, data, 60)
+            return data
+
+        try:
+            return self.statistics.data
+        except ObjectDoesNotExist:
+            return ContestStatistics.refresh(self).data
+
     def rate(self):
         with transaction.atomic():
             Rating.objects.filter(contest__end_time__range=(self.end_time, self._now)).delete()
@@ -527,6 +546,12 @@ class ContestParticipation(models.Model):
     format_data = JSONField(verbose_name=_('contest format specific data'), null=True, blank=True)
 
     def recompute_results(self):
+        from judge.utils.scoreboard_replay import ScoreboardReplay
+        ScoreboardReplay.invalidate(self.contest_id)
+        # Only finished contests have stored statistics.
+        if self.contest.ended:
+            ContestStatistics.invalidate(self.contest_id)
+
         with transaction.atomic():
             self.contest.format.update_participation(self)
             if self.is_disqualified:
@@ -663,6 +688,52 @@ class Rating(models.Model):
         verbose_name_plural = _('contest ratings')
 
 
+class ContestStatistics(models.Model):
+    contest = models.OneToOneField(Contest, verbose_name=_('contest'), related_name='statistics', on_delete=CASCADE)
+    data = JSONField(verbose_name=_('statistics data'))
+    generated = models.DateTimeField(verbose_name=_('generation time'), auto_now=True)
+
+    @classmethod
+    def compute(cls, contest):
+        queryset = Submission.objects.filter(contest_object=contest)
+
+        ac_count = Count(Case(When(result='AC', then=Value(1)), output_field=IntegerField()))
+        ac_rate = CombinedExpression(ac_count / Count('problem'), '*', Value(100.0), output_field=FloatField())
+
+        return {
+            'problem_status_count': list(
+                queryset.values('problem__code', 'result').annotate(count=Count('result'))
+                        .values_list('problem__code', 'result', 'count'),
+            ),
+            'problem_ac_rate': list(
+                queryset.values('contest__problem__order', 'problem__name').annotate(ac_rate=ac_rate)
+                        .order_by('contest__problem__order').values_list('problem__name', 'ac_rate'),
+            ),
+            'language_count': list(
+                queryset.values('language__name').annotate(count=Count('language__name'))
+                        .filter(count__gt=0).order_by('-count').values_list('language__name', 'count'),
+            ),
+            'language_ac_rate': list(
+                queryset.values('language__name').annotate(ac_rate=ac_rate)
+                        .filter(ac_rate__gt=0).values_list('language__name', 'ac_rate'),
+            ),
+        }
+
+    @classmethod
+    def refresh(cls, contest):
+        statistics, created = cls.objects.update_or_create(contest=contest, defaults={'data': cls.compute(contest)})
+        return statistics
+
+    @classmethod
+    def invalidate(cls, contest_id):
+        # Deleted rather than refreshed, since the statistics are recomputed on the next request for them anyway.
+        cls.objects.filter(contest_id=contest_id).delete()
+
+    class Meta:
+        verbose_name = _('contest statistics')
+        verbose_name_plural = _('contest statistics')
+
+
 class ContestMoss(models.Model):
     LANG_MAPPING = [
         ('C', MOSS_LANG_C),
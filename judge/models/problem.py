@@ -398,8 +398,14 @@ class Problem(models.Model):
         ac_queryset = all_queryset.filter(result='AC', case_points__gte=F('case_total'))
         self.user_count = ac_queryset.values('user').distinct().count()
         submissions = all_queryset.count()
+        ac_submissions = ac_queryset.count()
+        archived_submissions, archived_ac_submissions = Problem.objects.filter(id=self.id).values_list(
+            'archived_submission_stats__submissions', 'archived_submission_stats__ac_submissions',
+        )[0]
+        submissions += archived_submissions or 0
+        ac_submissions += archived_ac_submissions or 0
         if submissions:
-            self.ac_rate = 100.0 * ac_queryset.count() / submissions
+            self.ac_rate = 100.0 * ac_submissions / submissions
         else:
             self.ac_rate = 0
         self.save()
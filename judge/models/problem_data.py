@@ -4,7 +4,7 @@ import os
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
-from judge.utils.problem_data import ProblemDataStorage
+from judge.utils.problem_data import ProblemDataStorage, delete_zip_manifest
 
 __all__ = ['problem_data_storage', 'problem_directory_file', 'ProblemData', 'ProblemTestCase', 'CHECKERS']
 
@@ -46,6 +46,8 @@ class ProblemData(models.Model):
     nobigmath = models.BooleanField(verbose_name=_('disable bigInteger / bigDecimal'), null=True, blank=True)
     checker_args = models.TextField(verbose_name=_('checker arguments'), blank=True,
                                     help_text=_('Checker arguments as a JSON object.'))
+    data_version = models.CharField(max_length=64, verbose_name=_('data version'), blank=True,
+                                    help_text=_('Hash of the data files, updated whenever init.yml is generated.'))
 
     __original_zipfile = None
 
@@ -55,6 +57,8 @@ class ProblemData(models.Model):
 
     def save(self, *args, **kwargs):
         if self.zipfile != self.__original_zipfile:
+            if self.__original_zipfile:
+                delete_zip_manifest(self.__original_zipfile.path)
             self.__original_zipfile.delete(save=False)
         return super(ProblemData, self).save(*args, **kwargs)
 
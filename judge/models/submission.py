@@ -1,9 +1,18 @@
 import hashlib
 import hmac
+import json
+import math
+import struct
+import zlib
+from collections import defaultdict
+from operator import attrgetter
 
 from django.conf import settings
+from django.core import serializers
 from django.core.exceptions import ObjectDoesNotExist
-from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Min
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.functional import cached_property
@@ -14,9 +23,11 @@ from judge.judgeapi import abort_submission, judge_submission
 from judge.models.problem import Problem, SubmissionSourceAccess
 from judge.models.profile import Profile
 from judge.models.runtime import Language
+from judge.utils.blob_store import load_case_text
 from judge.utils.unicode import utf8bytes
 
-__all__ = ['SUBMISSION_RESULT', 'Submission', 'SubmissionSource', 'SubmissionTestCase']
+__all__ = ['ArchivedSubmission', 'ArchivedSubmissionStats', 'PackedTestCases', 'SUBMISSION_RESULT', 'SourceBlob',
+           'Submission', 'SubmissionResultCount', 'SubmissionSource', 'SubmissionTestCase', 'UserProblemStatus']
 
 SUBMISSION_RESULT = (
     ('AC', _('Accepted')),
@@ -33,7 +44,7 @@ SUBMISSION_RESULT = (
 )
 
 
-@revisions.register(follow=['test_cases'])
+@revisions.register(follow=['test_cases', 'packed_test_cases'])
 class Submission(models.Model):
     STATUS = (
         ('QU', _('Queued')),
@@ -117,6 +128,16 @@ class Submission(models.Model):
     def long_status(self):
         return Submission.USER_DISPLAY_CODES.get(self.short_status, '')
 
+    def get_test_cases(self):
+        """
+        Returns the test cases of this submission, whether they are stored in rows or packed.
+        """
+        try:
+            packed = self.packed_test_cases
+        except ObjectDoesNotExist:
+            return list(self.test_cases.all())
+        return packed.unpack()
+
     @cached_property
     def is_locked(self):
         return self.locked_after is not None and self.locked_after < timezone.now()
@@ -266,10 +287,79 @@ class Submission(models.Model):
         ]
 
 
+class SourceBlob(models.Model):
+    """
+    A unique source code body, compressed and addressed by its SHA-256 hash.
+    """
+
+    hash = models.CharField(verbose_name=_('SHA-256 hash'), max_length=64, primary_key=True)
+    data = models.BinaryField(verbose_name=_('compressed source'))
+    size = models.IntegerField(verbose_name=_('size'))
+
+    @staticmethod
+    def compress(source):
+        """
+        Returns the hash, compressed data and size of a source, which are the fields of its blob.
+        """
+        data = utf8bytes(source)
+        return hashlib.sha256(data).hexdigest(), zlib.compress(data, 9), len(data)
+
+    @classmethod
+    def get_or_create_for(cls, source):
+        """
+        Returns the blob of a source, locked until the end of the transaction so that compress_sources --prune can't
+        delete it before the source referring to it is saved.
+        """
+        hash, data, size = cls.compress(source)
+        return cls.objects.select_for_update().get_or_create(hash=hash, defaults={'data': data, 'size': size})[0]
+
+    @cached_property
+    def source(self):
+        return zlib.decompress(self.data).decode('utf-8')
+
+    class Meta:
+        verbose_name = _('source blob')
+        verbose_name_plural = _('source blobs')
+
+
 class SubmissionSource(models.Model):
     submission = models.OneToOneField(Submission, on_delete=models.CASCADE, verbose_name=_('associated submission'),
                                       related_name='source')
-    source = models.TextField(verbose_name=_('source code'), max_length=65536)
+    blob = models.ForeignKey(SourceBlob, verbose_name=_('source blob'), null=True, related_name='sources',
+                             on_delete=models.PROTECT)
+    # Sources which haven't been moved into a blob yet, see the compress_sources command.
+    raw_source = models.TextField(verbose_name=_('source code'), max_length=65536, blank=True, db_column='source')
+
+    @property
+    def source(self):
+        if hasattr(self, '_new_source'):
+            return self._new_source
+        if self.blob_id is None:
+            return self.raw_source
+        return self.blob.source
+
+    @source.setter
+    def source(self, source):
+        # The blob is looked up when saving, so that constructing an instance doesn't touch the database.
+        self._new_source = source
+
+    def save(self, *args, **kwargs):
+        if not hasattr(self, '_new_source'):
+            return super().save(*args, **kwargs)
+        with transaction.atomic():
+            self.blob = SourceBlob.get_or_create_for(self._new_source)
+            self.raw_source = ''
+            del self._new_source
+            super().save(*args, **kwargs)
+
+    @classmethod
+    def get_sources(cls, submission_ids):
+        """
+        Returns a dictionary of submission IDs to their source code.
+        """
+        sources = cls.objects.filter(submission_id__in=submission_ids).select_related('blob') \
+                             .only('submission_id', 'raw_source', 'blob__data')
+        return {source.submission_id: source.source for source in sources}
 
     def __str__(self):
         return _('Source of %(submission)s') % {'submission': self.submission}
@@ -296,6 +386,19 @@ class SubmissionTestCase(models.Model):
     extended_feedback = models.TextField(verbose_name=_('extended judging feedback'), blank=True)
     output = models.TextField(verbose_name=_('program output'), blank=True)
 
+    @cached_property
+    def output_text(self):
+        return load_case_text(self.output)
+
+    @cached_property
+    def extended_feedback_text(self):
+        return load_case_text(self.extended_feedback)
+
+    def output_prefix(self, length):
+        if 'output_text' in self.__dict__:
+            return self.output_text[:length]
+        return load_case_text(self.output, length)
+
     @property
     def long_status(self):
         return Submission.USER_DISPLAY_CODES.get(self.status, '')
@@ -310,3 +413,311 @@ class SubmissionTestCase(models.Model):
         unique_together = ('submission', 'case')
         verbose_name = _('submission test case')
         verbose_name_plural = _('submission test cases')
+
+
+@revisions.register()
+class PackedTestCases(models.Model):
+    """
+    The test case results of a graded submission, packed into one row instead of a SubmissionTestCase per case.
+
+    The numeric results are stored in `data` as little-endian arrays with one element per case: case IDs, status
+    codes, times, memories, points, totals and batches. The text results are stored in `feedback` as zlib-compressed
+    JSON, or are null if every case has empty text results.
+    """
+
+    STATUS_CODES = [code for code, name in SUBMISSION_RESULT]
+
+    submission = models.OneToOneField(Submission, verbose_name=_('associated submission'), primary_key=True,
+                                      related_name='packed_test_cases', on_delete=models.CASCADE)
+    data = models.BinaryField(verbose_name=_('packed results'))
+    feedback = models.BinaryField(verbose_name=_('compressed feedback'), null=True)
+
+    @classmethod
+    def encode(cls, cases):
+        """
+        Returns the packed data and compressed feedback of a list of test cases.
+        """
+        cases = sorted(cases, key=attrgetter('case'))
+        count = len(cases)
+
+        def floats(field):
+            values = (getattr(case, field) for case in cases)
+            return struct.pack('<%dd' % count, *(math.nan if value is None else value for value in values))
+
+        data = b''.join([
+            struct.pack('<I', count),
+            struct.pack('<%di' % count, *(case.case for case in cases)),
+            bytes(cls.STATUS_CODES.index(case.status) for case in cases),
+            floats('time'), floats('memory'), floats('points'), floats('total'),
+            struct.pack('<%di' % count, *(-1 if case.batch is None else case.batch for case in cases)),
+        ])
+        text = [[case.feedback, case.extended_feedback, case.output] for case in cases]
+        feedback = zlib.compress(json.dumps(text).encode('utf-8')) if any(map(any, text)) else None
+        return data, feedback
+
+    @classmethod
+    def pack(cls, submission_id, cases=None):
+        """
+        Packs the test cases of a submission, deleting their SubmissionTestCase rows.
+        """
+        if cases is None:
+            cases = SubmissionTestCase.objects.filter(submission_id=submission_id)
+        data, feedback = cls.encode(cases)
+
+        with transaction.atomic():
+            cls.objects.update_or_create(submission_id=submission_id, defaults={'data': data, 'feedback': feedback})
+            SubmissionTestCase.objects.filter(submission_id=submission_id).delete()
+
+    def unpack_results(self):
+        """
+        Returns a list of (case, status, time, memory, points, total, batch) tuples, ordered by case.
+        """
+        data = bytes(self.data)
+        count, = struct.unpack_from('<I', data)
+        offset = 4
+        fields = []
+        for format, size in (('i', 4), ('B', 1), ('d', 8), ('d', 8), ('d', 8), ('d', 8), ('i', 4)):
+            fields.append(struct.unpack_from('<%d%s' % (count, format), data, offset))
+            offset += count * size
+        cases, statuses, times, memories, points, totals, batches = fields
+
+        def null(value):
+            return None if math.isnan(value) else value
+
+        return [
+            (case, self.STATUS_CODES[status], null(time), null(memory), null(case_points), null(total),
+             None if batch < 0 else batch)
+            for case, status, time, memory, case_points, total, batch in
+            zip(cases, statuses, times, memories, points, totals, batches)
+        ]
+
+    def unpack(self):
+        """
+        Returns the test cases as unsaved SubmissionTestCase objects, whose IDs are their case numbers.
+        """
+        results = self.unpack_results()
+        if self.feedback is None:
+            text = [('', '', '')] * len(results)
+        else:
+            text = json.loads(zlib.decompress(self.feedback))
+        return [
+            SubmissionTestCase(id=case, submission_id=self.submission_id, case=case, status=status, time=time,
+                               memory=memory, points=points, total=total, batch=batch, feedback=feedback,
+                               extended_feedback=extended_feedback, output=output)
+            for (case, status, time, memory, points, total, batch), (feedback, extended_feedback, output) in
+            zip(results, text)
+        ]
+
+    @classmethod
+    def batch_points(cls, submission_ids):
+        """
+        Returns a dictionary mapping submission IDs to dictionaries mapping each of their batches to its points,
+        whichever way their test cases are stored. Cases which aren't in a batch are grouped under None.
+        """
+        result = defaultdict(dict)
+        for submission_id, batch, points in (
+            SubmissionTestCase.objects.filter(submission_id__in=submission_ids).values('submission_id', 'batch')
+                                      .annotate(points=Min('points')).values_list('submission_id', 'batch', 'points')
+        ):
+            result[submission_id][batch] = points
+        for packed in cls.objects.filter(submission_id__in=submission_ids).defer('feedback'):
+            batches = result[packed.submission_id]
+            for case, status, time, memory, points, total, batch in packed.unpack_results():
+                # Like MIN in SQL, this ignores null points.
+                current = batches.get(batch)
+                if batch not in batches or (points is not None and (current is None or points < current)):
+                    batches[batch] = points
+        return result
+
+    class Meta:
+        verbose_name = _('packed submission test cases')
+        verbose_name_plural = _('packed submission test cases')
+
+
+class ArchivedSubmission(models.Model):
+    """
+    A submission moved out of the submission tables by the archive_submissions command.
+
+    The submission and its source are stored in `data` as zlib-compressed JSON, and its test cases are stored the same
+    way as PackedTestCases.
+    """
+
+    id = models.IntegerField(verbose_name=_('submission ID'), primary_key=True)
+    user = models.ForeignKey(Profile, verbose_name=_('user'), related_name='archived_submissions',
+                             on_delete=models.CASCADE)
+    problem = models.ForeignKey(Problem, verbose_name=_('problem'), related_name='archived_submissions',
+                                on_delete=models.CASCADE)
+    date = models.DateTimeField(verbose_name=_('submission time'), db_index=True)
+    data = models.BinaryField(verbose_name=_('compressed submission'))
+    test_cases = models.BinaryField(verbose_name=_('packed test case results'))
+    test_case_feedback = models.BinaryField(verbose_name=_('compressed test case feedback'), null=True)
+
+    @classmethod
+    def archive(cls, submission_ids):
+        """
+        Moves submissions into the archive. Their results stay counted in SubmissionResultCount, and in the
+        statistics of their problems through ArchivedSubmissionStats.
+
+        Nothing else is updated, so the caller must make sure the submissions don't affect scores, e.g. by not
+        archiving contest submissions or the submissions users are awarded points for.
+        """
+        submissions = list(Submission.objects.filter(id__in=submission_ids).select_related('source__blob', 'user'))
+        submission_ids = [submission.id for submission in submissions]
+        cases = defaultdict(list)
+        for case in SubmissionTestCase.objects.filter(submission_id__in=submission_ids):
+            cases[case.submission_id].append(case)
+        packed = {packed.submission_id: packed for packed in
+                  PackedTestCases.objects.filter(submission_id__in=submission_ids)}
+
+        archived = []
+        stats = defaultdict(lambda: [0, 0])
+        for submission in submissions:
+            try:
+                source = submission.source.source
+            except ObjectDoesNotExist:
+                source = ''
+            if submission.id in packed:
+                test_cases, test_case_feedback = packed[submission.id].data, packed[submission.id].feedback
+            else:
+                test_cases, test_case_feedback = PackedTestCases.encode(cases[submission.id])
+            data = json.dumps({
+                'submission': serializers.serialize('python', [submission])[0],
+                'source': source,
+            }, cls=DjangoJSONEncoder)
+            archived.append(cls(id=submission.id, user_id=submission.user_id, problem_id=submission.problem_id,
+                                date=submission.date, data=zlib.compress(data.encode('utf-8')),
+                                test_cases=test_cases, test_case_feedback=test_case_feedback))
+
+            # Keep the same counts as Problem.update_stats.
+            if not submission.user.is_unlisted and not submission.is_archived:
+                stats[submission.problem_id][0] += 1
+                if submission.result == 'AC' and submission.case_points >= submission.case_total:
+                    stats[submission.problem_id][1] += 1
+
+        with transaction.atomic():
+            cls.objects.bulk_create(archived)
+            for problem_id, (count, ac_count) in stats.items():
+                ArchivedSubmissionStats.objects.get_or_create(problem_id=problem_id)
+                ArchivedSubmissionStats.objects.filter(problem_id=problem_id).update(
+                    submissions=F('submissions') + count, ac_submissions=F('ac_submissions') + ac_count,
+                )
+            # Deleting normally would send signals that treat the submissions as gone, e.g. uncounting their results.
+            for model in (SubmissionTestCase, PackedTestCases, SubmissionSource):
+                queryset = model.objects.filter(submission_id__in=submission_ids)
+                queryset._raw_delete(queryset.db)
+            queryset = Submission.objects.filter(id__in=submission_ids)
+            queryset._raw_delete(queryset.db)
+        return len(archived)
+
+    def restore(self):
+        """
+        Returns the archived submission as an unsaved Submission, with its source and test cases attached.
+        """
+        data = json.loads(zlib.decompress(self.data))
+        submission = next(serializers.deserialize('python', [data['submission']])).object
+        # JSON only keeps times to the millisecond.
+        submission.date = self.date
+        submission.source = SubmissionSource(submission=submission, raw_source=data['source'])
+        submission.packed_test_cases = PackedTestCases(submission=submission, data=self.test_cases,
+                                                       feedback=self.test_case_feedback)
+        return submission
+
+    class Meta:
+        verbose_name = _('archived submission')
+        verbose_name_plural = _('archived submissions')
+
+
+class ArchivedSubmissionStats(models.Model):
+    problem = models.OneToOneField(Problem, verbose_name=_('problem'), primary_key=True,
+                                   related_name='archived_submission_stats', on_delete=models.CASCADE)
+    submissions = models.IntegerField(verbose_name=_('submissions'), default=0)
+    ac_submissions = models.IntegerField(verbose_name=_('accepted submissions'), default=0)
+
+    class Meta:
+        verbose_name = _('archived submission statistics')
+        verbose_name_plural = _('archived submission statistics')
+
+
+class UserProblemStatus(models.Model):
+    user = models.ForeignKey(Profile, verbose_name=_('user'), related_name='problem_statuses',
+                             on_delete=models.CASCADE)
+    problem = models.ForeignKey(Problem, verbose_name=_('problem'), related_name='user_statuses',
+                                on_delete=models.CASCADE)
+    solved = models.BooleanField(verbose_name=_('solved'), default=False)
+
+    @classmethod
+    def submitted(cls, submission):
+        cls.objects.get_or_create(user_id=submission.user_id, problem_id=submission.problem_id)
+
+    @classmethod
+    def finished(cls, submission):
+        if not submission.is_archived and submission.result == 'AC' and \
+                submission.case_points >= submission.case_total:
+            cls.objects.update_or_create(user_id=submission.user_id, problem_id=submission.problem_id,
+                                         defaults={'solved': True})
+
+    @classmethod
+    def recompute(cls, user_id, problem_id):
+        submissions = Submission.objects.filter(user_id=user_id, problem_id=problem_id)
+        if not submissions.exists():
+            cls.objects.filter(user_id=user_id, problem_id=problem_id).delete()
+            return
+        solved = submissions.filter(is_archived=False, result='AC', case_points__gte=F('case_total')).exists()
+        cls.objects.update_or_create(user_id=user_id, problem_id=problem_id, defaults={'solved': solved})
+
+    class Meta:
+        unique_together = ('user', 'problem')
+        verbose_name = _('user problem status')
+        verbose_name_plural = _('user problem statuses')
+
+
+class SubmissionResultCount(models.Model):
+    PROBLEM = 'P'
+    USER = 'U'
+    LANGUAGE = 'L'
+    KINDS = (
+        (PROBLEM, _('problem')),
+        (USER, _('user')),
+        (LANGUAGE, _('language')),
+    )
+
+    kind = models.CharField(verbose_name=_('kind'), max_length=1, choices=KINDS)
+    object_id = models.IntegerField(verbose_name=_('object ID'))
+    result = models.CharField(verbose_name=_('result'), max_length=3, choices=SUBMISSION_RESULT)
+    count = models.IntegerField(verbose_name=_('count'), default=0)
+
+    @classmethod
+    def add(cls, submission, result, delta=1):
+        """
+        Counts a submission with the given result towards its problem, user and language.
+        """
+        if result is None:
+            return
+        for kind, object_id in ((cls.PROBLEM, submission.problem_id), (cls.USER, submission.user_id),
+                                (cls.LANGUAGE, submission.language_id)):
+            counter = cls.objects.filter(kind=kind, object_id=object_id, result=result)
+            if counter.update(count=F('count') + delta) or delta < 0:
+                continue
+            try:
+                with transaction.atomic():
+                    cls.objects.create(kind=kind, object_id=object_id, result=result, count=delta)
+            except IntegrityError:
+                counter.update(count=F('count') + delta)
+
+    @classmethod
+    def get_counts(cls, kind, object_ids, results=None):
+        """
+        Returns a dictionary of results to the number of submissions with that result, summed over the objects.
+        """
+        counters = cls.objects.filter(kind=kind, object_id__in=object_ids)
+        if results:
+            counters = counters.filter(result__in=results)
+        counts = defaultdict(int)
+        for result, count in counters.values_list('result', 'count'):
+            counts[result] += count
+        return counts
+
+    class Meta:
+        unique_together = ('kind', 'object_id', 'result')
+        verbose_name = _('submission result count')
+        verbose_name_plural = _('submission result counts')
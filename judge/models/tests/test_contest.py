@@ -2,7 +2,7 @@ from django.core.exceptions import ValidationError
 from django.test import SimpleTestCase, TestCase
 from django.utils import timezone
 
-from judge.models import Contest, ContestParticipation, ContestTag
+from judge.models import Contest, ContestParticipation, ContestStatistics, ContestTag
 from judge.models.contest import MinValueOrNoneValidator
 from judge.models.tests.util import CommonDataMixin, create_contest, create_contest_participation, create_user
 
@@ -1002,6 +1002,19 @@ class ContestTestCase(CommonDataMixin, TestCase):
         self.assertEqual(participation.start, participation.real_start)
         self.assertIsInstance(participation.end_time, timezone.datetime)
 
+    def test_contest_statistics(self):
+        self.assertFalse(self.basic_contest.ended)
+        self.assertEqual(self.basic_contest.get_statistics()['language_count'], [])
+        self.assertFalse(ContestStatistics.objects.filter(contest=self.basic_contest).exists())
+
+        self.assertTrue(self.full_hidden_scoreboard_contest.ended)
+        statistics = self.full_hidden_scoreboard_contest.get_statistics()
+        self.assertEqual(statistics['problem_status_count'], [])
+        self.assertEqual(ContestStatistics.objects.get(contest=self.full_hidden_scoreboard_contest).data, statistics)
+
+        self.full_hidden_scoreboard_contest.save()
+        self.assertFalse(ContestStatistics.objects.filter(contest=self.full_hidden_scoreboard_contest).exists())
+
 
 class ContestTagTestCase(TestCase):
     @classmethod
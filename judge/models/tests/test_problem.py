@@ -1,11 +1,14 @@
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
 from django.utils import timezone
 
 from judge.models import Language, LanguageLimit, Problem, Submission
 from judge.models.problem import VotePermission, disallowed_characters_validator
 from judge.models.tests.util import CommonDataMixin, create_contest, create_contest_participation, \
     create_organization, create_problem, create_problem_type, create_solution, create_user
+from judge.utils.problems import visible_problem_ids
 
 
 class ProblemTestCase(CommonDataMixin, TestCase):
@@ -315,6 +318,13 @@ class ProblemTestCase(CommonDataMixin, TestCase):
                         problem_codes,
                     )
 
+                    problem_ids = visible_problem_ids(user)
+                    if problem_ids is not None:
+                        self.assertCountEqual(
+                            Problem.objects.filter(id__in=list(problem_ids)).values_list('code', flat=True),
+                            problem_codes,
+                        )
+
                 with self.subTest(list='editable problems'):
                     # We only care about consistency between Problem.is_editable_by and Problem.get_editable_problems
                     problem_codes = []
@@ -328,6 +338,21 @@ class ProblemTestCase(CommonDataMixin, TestCase):
                     )
 
 
+class RandomProblemTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_candidates_follow_visibility(self):
+        problem = create_problem(code='random_hidden')
+        self.assertRedirects(self.client.get(reverse('problem_random')), reverse('problem_list'),
+                             fetch_redirect_response=False)
+
+        problem.is_public = True
+        problem.save()
+        self.assertRedirects(self.client.get(reverse('problem_random')), problem.get_absolute_url(),
+                             fetch_redirect_response=False)
+
+
 class SolutionTestCase(CommonDataMixin, TestCase):
     @classmethod
     def setUpTestData(self):
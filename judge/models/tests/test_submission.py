@@ -1,9 +1,20 @@
-from django.test import TestCase
+import json
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import transaction
+from django.test import RequestFactory, TestCase
 from django.utils import timezone
+from reversion import revisions
+from reversion.models import Version
 
-from judge.models import ContestSubmission, Language, Submission, SubmissionSource
+from judge.caching import failed_submission_id, finished_submission
+from judge.models import ArchivedSubmission, Contest, ContestSubmission, Language, PackedTestCases, SourceBlob, \
+    Submission, SubmissionResultCount, SubmissionSource, UserProblemStatus
 from judge.models.tests.util import CommonDataMixin, create_contest, create_contest_participation, \
     create_contest_problem, create_problem, create_user
+from judge.views.submission import ProblemSubmissions
 
 
 class SubmissionTestCase(CommonDataMixin, TestCase):
@@ -188,3 +199,165 @@ class SubmissionTestCase(CommonDataMixin, TestCase):
             },
         }
         self._test_object_methods_with_users(self.ie_submission, data)
+
+    def test_user_problem_status(self):
+        profile = self.users['normal'].profile
+        problem = create_problem(code='status')
+
+        def status():
+            return UserProblemStatus.objects.filter(user=profile, problem=problem) \
+                                            .values_list('solved', flat=True).first()
+
+        self.assertIsNone(status())
+        wrong = Submission.objects.create(user=profile, problem=problem, language=Language.get_python3(),
+                                          result='WA', status='D', case_points=0, case_total=1)
+        finished_submission(wrong)
+        self.assertFalse(status())
+
+        correct = Submission.objects.create(user=profile, problem=problem, language=Language.get_python3(),
+                                            result='AC', status='D', case_points=1, case_total=1)
+        finished_submission(correct)
+        self.assertTrue(status())
+
+        correct.archive()
+        self.assertFalse(status())
+        correct.delete()
+        wrong.delete()
+        self.assertIsNone(status())
+
+    def test_submission_result_count(self):
+        profile = self.users['normal'].profile
+        problem = create_problem(code='result_count')
+
+        def counts(kind, object_id, results=None):
+            return dict(SubmissionResultCount.get_counts(kind, [object_id], results))
+
+        submissions = [
+            Submission.objects.create(user=profile, problem=problem, language=Language.get_python3(),
+                                      result=result, status='D')
+            for result in ('AC', 'WA', 'WA')
+        ]
+        for submission in submissions:
+            finished_submission(submission)
+
+        self.assertEqual(counts(SubmissionResultCount.PROBLEM, problem.id), {'AC': 1, 'WA': 2})
+        self.assertEqual(counts(SubmissionResultCount.PROBLEM, problem.id, ['WA', 'TLE']), {'WA': 2})
+        self.assertEqual(counts(SubmissionResultCount.USER, profile.id)['WA'], 2)
+
+        submissions[1].delete()
+        self.assertEqual(counts(SubmissionResultCount.PROBLEM, problem.id), {'AC': 1, 'WA': 1})
+        failed_submission_id(submissions[2].id, 'CE')
+        self.assertEqual(counts(SubmissionResultCount.PROBLEM, problem.id), {'AC': 1, 'WA': 1, 'CE': 1})
+
+    def test_result_counts_hide_contest_submissions(self):
+        problem = create_problem(code='counted', is_public=True)
+        contest = create_contest(key='counted', scoreboard_visibility=Contest.SCOREBOARD_AFTER_CONTEST)
+        for result, contest_object in (('AC', None), ('WA', contest)):
+            submission = Submission.objects.create(user=self.users['superuser'].profile, problem=problem,
+                                                   language=Language.get_python3(), result=result, status='D',
+                                                   contest_object=contest_object)
+            finished_submission(submission)
+
+        def results(username):
+            request = RequestFactory().get('/', {'results': '1'})
+            request.user = self.users[username]
+            request.profile = request.user.profile
+            request.LANGUAGE_CODE = 'en'
+            response = ProblemSubmissions.as_view()(request, problem=problem.code)
+            return {category['code']: category['count'] for category in json.loads(response.content)['categories']}
+
+        # The hidden contest's submission is counted only for users who can see it in the list.
+        self.assertEqual((results('normal')['AC'], results('normal')['WA']), (1, 0))
+        self.assertEqual((results('superuser')['AC'], results('superuser')['WA']), (1, 1))
+
+    def test_source_blob(self):
+        problem = create_problem(code='source_blob')
+        sources = []
+        for text in ('print(1)', 'print(1)', 'print(2)'):
+            submission = Submission.objects.create(user=self.users['normal'].profile, problem=problem,
+                                                   language=Language.get_python3())
+            sources.append(SubmissionSource.objects.create(submission=submission, source=text))
+
+        self.assertEqual(sources[0].blob_id, sources[1].blob_id)
+        self.assertNotEqual(sources[0].blob_id, sources[2].blob_id)
+        self.assertEqual(SubmissionSource.objects.get(id=sources[1].id).source, 'print(1)')
+        self.assertEqual(SubmissionSource.get_sources([sources[2].submission_id]),
+                         {sources[2].submission_id: 'print(2)'})
+
+        SubmissionSource.objects.filter(id=sources[2].id).update(blob=None, raw_source='print(3)')
+        self.assertEqual(SubmissionSource.objects.get(id=sources[2].id).source, 'print(3)')
+        call_command('compress_sources', '--prune', stdout=StringIO())
+        self.assertFalse(SubmissionSource.objects.filter(blob__isnull=True).exists())
+        self.assertEqual(SubmissionSource.objects.get(id=sources[2].id).source, 'print(3)')
+        self.assertFalse(SourceBlob.objects.filter(hash=SourceBlob.compress('print(2)')[0]).exists())
+
+    def test_source_blob_prune_race(self):
+        problem = create_problem(code='source_blob_race')
+        submission = Submission.objects.create(user=self.users['normal'].profile, problem=problem,
+                                               language=Language.get_python3())
+        SubmissionSource.objects.create(submission=submission, source='print(4)')
+        SubmissionSource.objects.filter(submission=submission).delete()
+
+        def reuse_blob(*args, **kwargs):
+            # A new submission reuses the blob after it was found unused, but before it is deleted.
+            if not SubmissionSource.objects.filter(submission=submission).exists():
+                SubmissionSource.objects.create(submission=submission, source='print(4)')
+            return transaction.atomic(*args, **kwargs)
+
+        with mock.patch('judge.management.commands.compress_sources.transaction') as command_transaction:
+            command_transaction.atomic.side_effect = reuse_blob
+            call_command('compress_sources', '--prune', '--stats', stdout=StringIO())
+        self.assertEqual(SubmissionSource.objects.get(submission=submission).source, 'print(4)')
+
+    def test_packed_test_cases(self):
+        submission = Submission.objects.create(user=self.users['normal'].profile, problem=create_problem(code='packed'),
+                                               language=Language.get_python3(), result='WA', status='D')
+        for case, status, points, batch in ((1, 'AC', 5, None), (2, 'AC', 5, 1), (3, 'WA', 0, 1)):
+            submission.test_cases.create(case=case, status=status, time=0.5, memory=1024, points=points, total=5,
+                                         batch=batch, feedback='ok' if status == 'AC' else '', output='%d\n' % case)
+        cases = [(case.case, case.status, case.time, case.points, case.batch, case.feedback, case.output)
+                 for case in submission.get_test_cases()]
+        batch_points = PackedTestCases.batch_points([submission.id])
+
+        call_command('pack_test_cases', stdout=StringIO())
+        self.assertFalse(submission.test_cases.exists())
+        submission = Submission.objects.get(id=submission.id)
+        self.assertEqual([(case.case, case.status, case.time, case.points, case.batch, case.feedback, case.output)
+                          for case in submission.get_test_cases()], cases)
+        self.assertEqual(PackedTestCases.batch_points([submission.id]), batch_points)
+        self.assertEqual(batch_points[submission.id], {None: 5, 1: 0})
+
+        with revisions.create_revision():
+            revisions.add_to_revision(submission)
+        self.assertTrue(Version.objects.get_for_object(submission.packed_test_cases).exists())
+
+    def test_archive_submissions(self):
+        profile = self.users['normal'].profile
+        problem = create_problem(code='archive', points=10)
+        submissions = []
+        for result, points in (('WA', 0), ('AC', 10), ('AC', 10), ('WA', 5)):
+            submission = Submission.objects.create(user=profile, problem=problem, language=Language.get_python3(),
+                                                   result=result, status='D', points=points, case_points=points,
+                                                   case_total=10)
+            SubmissionSource.objects.create(submission=submission, source='print(%d)' % submission.id)
+            submission.test_cases.create(case=1, status=result, time=0.5, memory=1024, points=points, total=10)
+            finished_submission(submission)
+            submissions.append(submission)
+        problem.update_stats()
+        ac_rate = problem.ac_rate
+
+        call_command('archive_submissions', '0', stdout=StringIO())
+
+        # The first accepted submission is kept for the solved status, and the others are archived.
+        self.assertEqual(list(problem.submission_set.values_list('id', flat=True)), [submissions[1].id])
+        problem.update_stats()
+        self.assertEqual(problem.ac_rate, ac_rate)
+        self.assertEqual(SubmissionResultCount.get_counts(SubmissionResultCount.PROBLEM, [problem.id]),
+                         {'AC': 2, 'WA': 2})
+
+        restored = ArchivedSubmission.objects.get(id=submissions[3].id).restore()
+        self.assertEqual((restored.id, restored.user_id, restored.result, restored.points, restored.date),
+                         (submissions[3].id, profile.id, 'WA', 5, submissions[3].date))
+        self.assertEqual(restored.source.source, 'print(%d)' % submissions[3].id)
+        self.assertEqual([(case.case, case.status, case.points) for case in restored.get_test_cases()],
+                         [(1, 'WA', 5)])
@@ -0,0 +1,134 @@
+import logging
+import random
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connections
+
+__all__ = ['ReplicaReadMixin', 'ReplicaRouter', 'replica_reads', 'use_replicas']
+
+logger = logging.getLogger('judge.replicas')
+
+# Set on responses to requests which could have written something, so that the same client keeps reading from the
+# primary until the replicas have caught up with what it did.
+STICKY_COOKIE = 'replica_pin'
+SAFE_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS'))
+
+# Models in these apps are always read from the primary: a session read from a lagging replica could log users out.
+PRIMARY_ONLY_APPS = frozenset(('sessions',))
+
+LAG_KEY = 'replica_lag:%s'
+LAG_CHECK_INTERVAL = 5
+
+_local = threading.local()
+
+
+class ReplicaRouter:
+    """
+    Sends reads to DMOJ_READ_REPLICAS inside use_replicas(), and everything else to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        replica = getattr(_local, 'replica', None)
+        if replica is not None and model._meta.app_label not in PRIMARY_ONLY_APPS:
+            return replica
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        # Never fall back to the database the instance was read from, as it could be a replica.
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas contain the same data as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DMOJ_READ_REPLICAS:
+            return False
+        return None
+
+
+def _query_lag(alias):
+    if 'mysql' not in settings.DATABASES[alias]['ENGINE']:
+        return 0
+    with connections[alias].cursor() as cursor:
+        try:
+            cursor.execute('SHOW REPLICA STATUS')
+        except DatabaseError:
+            cursor.execute('SHOW SLAVE STATUS')
+        columns = [column[0] for column in cursor.description]
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    status = dict(zip(columns, row))
+    return status.get('Seconds_Behind_Source', status.get('Seconds_Behind_Master'))
+
+
+def replica_lag(alias):
+    """
+    Returns how many seconds the replica is behind the primary, or None if it isn't replicating.
+    """
+    lag = cache.get(LAG_KEY % alias)
+    if lag is None:
+        try:
+            lag = _query_lag(alias)
+        except DatabaseError:
+            logger.exception('Failed to check replication lag of %s', alias)
+            lag = None
+        # Cache failures too, so that a broken replica doesn't cost a query on every request.
+        cache.set(LAG_KEY % alias, -1 if lag is None else lag, LAG_CHECK_INTERVAL)
+    return None if lag == -1 else lag
+
+
+def choose_replica():
+    healthy = []
+    for alias in settings.DMOJ_READ_REPLICAS:
+        lag = replica_lag(alias)
+        if lag is not None and lag <= settings.DMOJ_REPLICA_MAX_LAG:
+            healthy.append(alias)
+    return random.choice(healthy) if healthy else None
+
+
+@contextmanager
+def use_replicas(request=None):
+    """
+    Reads from a replica which is not lagging too far behind, unless the request's client wrote something recently
+    or no such replica exists.
+    """
+    previous = getattr(_local, 'replica', None)
+    if request is not None and (request.method not in SAFE_METHODS or STICKY_COOKIE in request.COOKIES):
+        _local.replica = None
+    else:
+        _local.replica = choose_replica()
+    try:
+        yield _local.replica
+    finally:
+        _local.replica = previous
+
+
+def _render_with_replicas(request, view, *args, **kwargs):
+    with use_replicas(request):
+        response = view(request, *args, **kwargs)
+        # Template responses run most of their queries when rendered, which would otherwise happen after this.
+        if callable(getattr(response, 'render', None)) and not getattr(response, 'is_rendered', True):
+            response.render()
+    return response
+
+
+def replica_reads(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        return _render_with_replicas(request, view, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaReadMixin:
+    """
+    Runs the read-only queries of a view on a replica; see use_replicas.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        return _render_with_replicas(request, super().dispatch, *args, **kwargs)
@@ -5,12 +5,15 @@ from typing import Optional
 from django.conf import settings
 from django.core.cache import cache
 from django.core.cache.utils import make_template_fragment_key
-from django.db.models.signals import post_delete, post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
 
-from .caching import finished_submission
-from .models import BlogPost, Comment, Contest, ContestProblem, ContestSubmission, EFFECTIVE_MATH_ENGINES, Judge, \
-    Language, License, MiscConfig, Organization, Problem, Profile, Submission, WebAuthnCredential
+from .caching import invalidate_submission
+from .models import BlogPost, Comment, Contest, ContestProblem, ContestStatistics, ContestSubmission, \
+    EFFECTIVE_MATH_ENGINES, Judge, Language, License, MiscConfig, Organization, Problem, ProblemTranslation, Profile, \
+    Submission, SubmissionResultCount, UserProblemStatus, WebAuthnCredential
+from .utils.problems import invalidate_problem_submission_restrictions, invalidate_problem_visibility
+from .utils.search import problem_search_changed
 
 
 def get_pdf_path(basename: str) -> Optional[str]:
@@ -49,6 +52,44 @@ def problem_update(sender, instance, **kwargs):
         if cached_pdf_filename is not None:
             unlink_if_exists(cached_pdf_filename)
 
+    problem_search_changed(instance.id)
+    invalidate_problem_visibility()
+
+
+@receiver(post_delete, sender=Problem)
+def problem_delete(sender, instance, **kwargs):
+    problem_search_changed(instance.id)
+    invalidate_problem_visibility()
+
+
+@receiver(m2m_changed, sender=Problem.authors.through)
+@receiver(m2m_changed, sender=Problem.curators.through)
+@receiver(m2m_changed, sender=Problem.testers.through)
+@receiver(m2m_changed, sender=Problem.organizations.through)
+@receiver(m2m_changed, sender=Profile.organizations.through)
+@receiver(m2m_changed, sender=Organization.admins.through)
+def problem_visibility_update(sender, action, **kwargs):
+    if action.startswith('post_'):
+        invalidate_problem_visibility()
+
+
+@receiver(m2m_changed, sender=Problem.allowed_languages.through)
+@receiver(m2m_changed, sender=Problem.banned_users.through)
+def problem_submission_restrictions_update(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action.startswith('post_'):
+            invalidate_problem_submission_restrictions([instance.id])
+    elif action == 'pre_clear':
+        invalidate_problem_submission_restrictions(instance.problem_set.values_list('id', flat=True))
+    elif action.startswith('post_'):
+        invalidate_problem_submission_restrictions(pk_set)
+
+
+@receiver(post_save, sender=ProblemTranslation)
+@receiver(post_delete, sender=ProblemTranslation)
+def problem_translation_update(sender, instance, **kwargs):
+    problem_search_changed(instance.problem_id)
+
 
 @receiver(post_save, sender=Profile)
 def profile_update(sender, instance, **kwargs):
@@ -77,6 +118,8 @@ def contest_update(sender, instance, **kwargs):
     cache.delete_many(['generated-meta-contest:%d' % instance.id] +
                       [make_template_fragment_key('contest_html', (instance.id, engine))
                        for engine in EFFECTIVE_MATH_ENGINES])
+    # A contest whose end time moved later is running again, so its stored statistics would be stale once it ends.
+    ContestStatistics.invalidate(instance.id)
 
 
 @receiver(post_delete, sender=ContestProblem)
@@ -120,7 +163,8 @@ def post_update(sender, instance, **kwargs):
 
 @receiver(post_delete, sender=Submission)
 def submission_delete(sender, instance, **kwargs):
-    finished_submission(instance)
+    invalidate_submission(instance)
+    SubmissionResultCount.add(instance, instance.result, -1)
     instance.user._updating_stats_only = True
     instance.user.calculate_points()
     instance.problem._updating_stats_only = True
@@ -128,9 +172,11 @@ def submission_delete(sender, instance, **kwargs):
 
 
 @receiver(post_save, sender=Submission)
-def submission_update(sender, instance, update_fields, **kwargs):
-    if update_fields and 'is_archived' in update_fields:
-        finished_submission(instance)
+def submission_update(sender, instance, created, update_fields, **kwargs):
+    if created:
+        UserProblemStatus.submitted(instance)
+    elif update_fields and 'is_archived' in update_fields:
+        invalidate_submission(instance)
         instance.user._updating_stats_only = True
         instance.user.calculate_points()
         instance.problem._updating_stats_only = True
@@ -1,28 +1,146 @@
-from celery import shared_task
+import hashlib
+from collections import defaultdict
+
+from celery import chord, shared_task
 from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
 from django.utils.translation import gettext as _
-from moss import MOSS
 
-from judge.models import Contest, ContestMoss, ContestParticipation, Submission
-from judge.utils.celery import Progress
+from judge.models import Contest, ContestMoss, ContestParticipation, ContestStatistics, ContestSubmission
+from judge.utils.celery import Progress, SharedProgress
+from judge.utils.moss import moss_pairs, run_moss_pairs
+
+__all__ = ('rescore_contest', 'rescore_contest_chunk', 'finish_rescore_contest', 'run_moss')
 
-__all__ = ('rescore_contest', 'run_moss')
+STAGED_FIELDS = ('score', 'cumtime', 'tiebreaker', 'format_data')
+APPLY_CHUNK_SIZE = 1000
 
 
 @shared_task(bind=True)
-def rescore_contest(self, contest_key):
+def rescore_contest(self, contest_key, staged=None):
+    if staged is None:
+        staged = settings.DMOJ_CONTEST_RESCORE_STAGED
+
     contest = Contest.objects.get(key=contest_key)
-    participations = contest.users
+    participation_ids = list(contest.users.order_by('id').values_list('id', flat=True))
+    chunk_size = settings.DMOJ_CONTEST_RESCORE_CHUNK_SIZE
+
+    if len(participation_ids) <= chunk_size:
+        with Progress(self, len(participation_ids), stage=_('Recalculating contest scores')) as p:
+            results = _rescore_participations(contest, participation_ids, staged, p)
+        if staged:
+            with Progress(self, len(results), stage=_('Applying contest scores')):
+                _apply_staged_results(contest, results)
+        _refresh_statistics(contest)
+        return len(participation_ids)
+
+    Progress(self, len(participation_ids), stage=_('Recalculating contest scores')).done = 0
+    SharedProgress.clear(self.request.id)
+    return self.replace(chord(
+        (rescore_contest_chunk.si(contest.id, participation_ids[i:i + chunk_size], self.request.id,
+                                  len(participation_ids), staged)
+         for i in range(0, len(participation_ids), chunk_size)),
+        finish_rescore_contest.s(contest.id, self.request.id, staged),
+    ))
+
+
+@shared_task(bind=True)
+def rescore_contest_chunk(self, contest_id, participation_ids, parent_id, total, staged):
+    contest = Contest.objects.get(id=contest_id)
+    with SharedProgress(self, parent_id, total, stage=_('Recalculating contest scores')) as p:
+        return _rescore_participations(contest, participation_ids, staged, p)
+
+
+@shared_task(bind=True)
+def finish_rescore_contest(self, chunk_results, contest_id, parent_id, staged):
+    SharedProgress.clear(parent_id)
+    contest = Contest.objects.get(id=contest_id)
+    if staged:
+        results = [result for chunk in chunk_results for result in chunk]
+        with Progress(self, len(results), stage=_('Applying contest scores'), task_id=parent_id):
+            _apply_staged_results(contest, results)
+        rescored = len(results)
+    else:
+        rescored = sum(chunk_results)
+    _refresh_statistics(contest)
+    return rescored
+
 
+def _submission_fingerprints(participation_ids):
+    """
+    Returns a hash of the grading state of each participation's submissions, which changes whenever one of them is
+    submitted, graded or rejudged.
+    """
+    rows = defaultdict(list)
+    for row in (ContestSubmission.objects.filter(participation_id__in=participation_ids).order_by('id')
+                .values_list('participation_id', 'id', 'points', 'submission__status', 'submission__result',
+                             'submission__points', 'submission__judged_date')):
+        rows[row[0]].append(row[1:])
+    return {id: hashlib.sha1(repr(rows[id]).encode()).hexdigest() for id in participation_ids}
+
+
+def _rescore_participations(contest, participation_ids, staged, progress):
+    """
+    Recomputes the results of the given participations.
+
+    If staged, the new results are computed inside a transaction that is rolled back, so that the scoreboard is not
+    modified, and a list of the new field values is returned instead. Otherwise, returns the number of participations
+    rescored.
+    """
+    results = []
     rescored = 0
-    with Progress(self, participations.count(), stage=_('Recalculating contest scores')) as p:
-        for participation in participations.iterator():
+    # Taken before recomputing, so that anything graded while staging makes the result stale rather than lost.
+    fingerprints = _submission_fingerprints(participation_ids) if staged else None
+    for participation in ContestParticipation.objects.filter(id__in=participation_ids).iterator():
+        # Avoid a query per participation to fetch the contest and its format.
+        participation.contest = contest
+        if staged:
+            with transaction.atomic():
+                participation.recompute_results()
+                results.append([participation.id, fingerprints[participation.id]] +
+                               [getattr(participation, field) for field in STAGED_FIELDS])
+                transaction.set_rollback(True)
+        else:
+            participation.recompute_results()
+        rescored += 1
+        if rescored % 10 == 0:
+            progress.did(10)
+    progress.did(rescored % 10)
+    return results if staged else rescored
+
+
+def _refresh_statistics(contest):
+    # Stored statistics are only created once the contest ends, so only those need to be brought up to date.
+    if contest.ended:
+        ContestStatistics.refresh(contest)
+
+
+def _apply_staged_results(contest, results):
+    """
+    Saves staged results, all in one transaction so that the scoreboard never shows a partially applied rescore.
+    Participations whose submissions changed since they were staged are recomputed instead, so that nothing graded in
+    the meantime is overwritten by a stale score.
+    """
+    ids = [result[0] for result in results]
+    with transaction.atomic():
+        # Locking the participations makes gradings which finish now wait, and then recompute on top of this.
+        fingerprints = {}
+        for i in range(0, len(ids), APPLY_CHUNK_SIZE):
+            chunk = ids[i:i + APPLY_CHUNK_SIZE]
+            list(ContestParticipation.objects.select_for_update().filter(id__in=chunk).values_list('id', flat=True))
+            fingerprints.update(_submission_fingerprints(chunk))
+
+        participations = [
+            ContestParticipation(id=result[0], **dict(zip(STAGED_FIELDS, result[2:])))
+            for result in results if fingerprints[result[0]] == result[1]
+        ]
+        ContestParticipation.objects.bulk_update(participations, STAGED_FIELDS, batch_size=APPLY_CHUNK_SIZE)
+
+        stale = set(ids) - {participation.id for participation in participations}
+        for participation in ContestParticipation.objects.filter(id__in=stale):
+            participation.contest = contest
             participation.recompute_results()
-            rescored += 1
-            if rescored % 10 == 0:
-                p.done = rescored
-    return rescored
 
 
 @shared_task(bind=True)
@@ -34,39 +152,12 @@ def run_moss(self, contest_key):
     contest = Contest.objects.get(key=contest_key)
     ContestMoss.objects.filter(contest=contest).delete()
 
-    length = len(ContestMoss.LANG_MAPPING) * contest.problems.count()
-    moss_results = []
-
-    with Progress(self, length, stage=_('Running MOSS')) as p:
-        for problem in contest.problems.all():
-            for dmoj_lang, moss_lang in ContestMoss.LANG_MAPPING:
-                result = ContestMoss(contest=contest, problem=problem, language=dmoj_lang)
-
-                subs = Submission.objects.filter(
-                    contest__participation__virtual__in=(ContestParticipation.LIVE, ContestParticipation.SPECTATE),
-                    contest_object=contest,
-                    problem=problem,
-                    language__common_name=dmoj_lang,
-                ).order_by('-points').values_list('user__user__username', 'source__source')
-
-                if subs.exists():
-                    moss_call = MOSS(moss_api_key, language=moss_lang, matching_file_limit=100,
-                                     comment='%s - %s' % (contest.key, problem.code))
-
-                    users = set()
-
-                    for username, source in subs:
-                        if username in users:
-                            continue
-                        users.add(username)
-                        moss_call.add_file_from_memory(username, source.encode('utf-8'))
-
-                    result.url = moss_call.process()
-                    result.submission_count = len(users)
-
-                moss_results.append(result)
-                p.did(1)
-
-    ContestMoss.objects.bulk_create(moss_results)
+    pairs = list(moss_pairs(contest))
+    with Progress(self, len(pairs), stage=_('Running MOSS')) as p:
+        # Results are saved as soon as each pair finishes, so that they are kept even if a later pair fails.
+        for problem, language, url, submission_count in run_moss_pairs(contest, pairs):
+            ContestMoss.objects.create(contest=contest, problem=problem, language=language, url=url,
+                                       submission_count=submission_count)
+            p.did(1)
 
-    return len(moss_results)
+    return len(pairs)
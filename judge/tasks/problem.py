@@ -0,0 +1,24 @@
+from celery import shared_task
+from django.core.cache import cache
+
+from judge.models import ProblemData
+from judge.utils.problem_data import get_data_manifest
+
+__all__ = ('request_data_version', 'update_data_version')
+
+
+@shared_task
+def update_data_version(problem_id):
+    data = ProblemData.objects.select_related('problem').filter(problem_id=problem_id).first()
+    if data is None:
+        return None
+    version = get_data_manifest(data.problem.code, data.zipfile.name)[0]
+    ProblemData.objects.filter(id=data.id).update(data_version=version)
+    cache.delete('data_version_pending:%d' % problem_id)
+    return version
+
+
+def request_data_version(problem_id):
+    # Only one update is queued at a time for each problem, however often its manifest is requested meanwhile.
+    if cache.add('data_version_pending:%d' % problem_id, True, 600):
+        update_data_version.delay(problem_id)
@@ -1,11 +1,11 @@
 from celery import shared_task
 from django.contrib.auth.models import User
-from django.core.cache import cache
 from django.utils import timezone
 from django.utils.translation import gettext as _
 
 from judge.models import Problem, Profile, Submission
 from judge.utils.celery import Progress
+from judge.utils.problems import invalidate_user_problem_ids
 
 __all__ = ('apply_submission_filter', 'rejudge_problem_filter', 'rescore_problem')
 
@@ -68,8 +68,7 @@ def rescore_problem(self, problem_id):
         for profile in profiles.iterator():
             profile._updating_stats_only = True
             profile.calculate_points()
-            cache.delete('user_complete:%d' % profile.id)
-            cache.delete('user_attempted:%d' % profile.id)
+            invalidate_user_problem_ids(profile.id)
             users += 1
             if users % 10 == 0:
                 p.done = users
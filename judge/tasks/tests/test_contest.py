@@ -0,0 +1,74 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from judge.models import ContestParticipation, ContestSubmission, Language, Submission
+from judge.models.tests.util import create_contest, create_contest_participation, create_contest_problem, \
+    create_problem, create_user
+from judge.tasks.contest import _apply_staged_results, _rescore_participations, rescore_contest
+
+
+class RescoreContestTestCase(TestCase):
+    fixtures = ['language_all.json']
+
+    @classmethod
+    def setUpTestData(self):
+        self.contest = create_contest(key='rescore')
+        self.problems = [
+            create_contest_problem(contest=self.contest, problem=create_problem(code='rescore%d' % i), order=i)
+            for i in range(2)
+        ]
+        self.participations = [
+            create_contest_participation(contest=self.contest, user=create_user(username='rescore%d' % i).profile)
+            for i in range(5)
+        ]
+        for index, participation in enumerate(self.participations):
+            for problem, points in zip(self.problems, (10 * index, 30)):
+                submission = Submission.objects.create(
+                    user=participation.user, problem=problem.problem, language=Language.get_python3(),
+                    result='AC', status='D', points=points, case_points=points, case_total=100,
+                    contest_object=self.contest,
+                )
+                ContestSubmission.objects.create(submission=submission, problem=problem,
+                                                 participation=participation, points=points)
+
+    def setUp(self):
+        ContestParticipation.objects.filter(contest=self.contest).update(score=0)
+
+    def scores(self):
+        return list(ContestParticipation.objects.filter(contest=self.contest).order_by('id')
+                    .values_list('score', flat=True))
+
+    def test_rescore_in_chunks(self):
+        for staged in (False, True):
+            with self.subTest(staged=staged), override_settings(DMOJ_CONTEST_RESCORE_CHUNK_SIZE=2), \
+                    mock.patch('judge.tasks.contest.APPLY_CHUNK_SIZE', 2):
+                ContestParticipation.objects.filter(contest=self.contest).update(score=0)
+                result = rescore_contest.apply(args=(self.contest.key,), kwargs={'staged': staged})
+                self.assertEqual(result.get(), 5)
+                self.assertEqual(self.scores(), [30, 40, 50, 60, 70])
+                # The chunks' shared progress counter is removed once they're done.
+                self.assertIsNone(cache.get('task_progress:%s' % result.id))
+
+    def test_staged_rescore_keeps_later_gradings(self):
+        ids = [participation.id for participation in self.participations[:2]]
+        results = _rescore_participations(self.contest, ids, True, mock.Mock())
+        self.assertEqual(self.scores(), [0] * 5)
+
+        # A submission of the first participation is graded again after it was staged.
+        ContestSubmission.objects.filter(participation=self.participations[0], points=30).update(points=60)
+        _apply_staged_results(self.contest, results)
+        self.assertEqual(self.scores()[:2], [60, 40])
+
+    def test_staged_results_applied_atomically(self):
+        ids = [participation.id for participation in self.participations]
+        results = _rescore_participations(self.contest, ids, True, mock.Mock())
+        ContestSubmission.objects.filter(participation=self.participations[-1], points=30).update(points=60)
+
+        # Nothing is applied if recomputing a stale participation fails after the others were saved.
+        with mock.patch('judge.tasks.contest.APPLY_CHUNK_SIZE', 2), \
+                mock.patch.object(ContestParticipation, 'recompute_results', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                _apply_staged_results(self.contest, results)
+        self.assertEqual(self.scores(), [0] * 5)
@@ -2,6 +2,7 @@ import pytz
 from django.conf import settings
 from django.db import connection
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.utils.timezone import make_aware
 
 
@@ -21,6 +22,9 @@ class TimezoneMiddleware(object):
 
 
 def from_database_time(datetime):
+    # Backends without a native datetime type, such as SQLite, return raw SQL results as strings.
+    if isinstance(datetime, str):
+        datetime = parse_datetime(datetime)
     tz = connection.timezone
     if tz is None:
         return datetime
@@ -0,0 +1,99 @@
+__all__ = ['IDBitmap']
+
+
+class IDBitmap:
+    """
+    A set of non-negative integer IDs, stored as one bit per possible ID.
+
+    Database IDs are dense, so this is far more compact to pickle into the cache than a set of ints, membership tests
+    only look at a single byte, and set operations are done on whole integers at once.
+    """
+
+    __slots__ = ('_data',)
+
+    def __init__(self, ids=()):
+        ids = list(ids)
+        self._data = bytearray(max(ids) // 8 + 1 if ids else 0)
+        for id in ids:
+            self._data[id >> 3] |= 1 << (id & 7)
+
+    @classmethod
+    def _from_int(cls, bits):
+        bitmap = cls()
+        bitmap._data = bytearray(bits.to_bytes((bits.bit_length() + 7) // 8, 'little'))
+        return bitmap
+
+    def _to_int(self):
+        return int.from_bytes(self._data, 'little')
+
+    def add(self, id):
+        index = id >> 3
+        if index >= len(self._data):
+            self._data.extend(bytes(index + 1 - len(self._data)))
+        self._data[index] |= 1 << (id & 7)
+
+    def discard(self, id):
+        index = id >> 3
+        if 0 <= index < len(self._data):
+            self._data[index] &= ~(1 << (id & 7)) & 0xFF
+
+    def __contains__(self, id):
+        if not isinstance(id, int) or id < 0:
+            return False
+        index = id >> 3
+        return index < len(self._data) and bool(self._data[index] >> (id & 7) & 1)
+
+    def __iter__(self):
+        for index, byte in enumerate(self._data):
+            while byte:
+                lowest = byte & -byte
+                yield index * 8 + lowest.bit_length() - 1
+                byte ^= lowest
+
+    def __len__(self):
+        return self._to_int().bit_count()
+
+    def __bool__(self):
+        return any(self._data)
+
+    def _coerce(self, other):
+        if isinstance(other, IDBitmap):
+            return other._to_int()
+        return IDBitmap(other)._to_int()
+
+    def __or__(self, other):
+        return self._from_int(self._to_int() | self._coerce(other))
+
+    def __and__(self, other):
+        return self._from_int(self._to_int() & self._coerce(other))
+
+    def __sub__(self, other):
+        return self._from_int(self._to_int() & ~self._coerce(other))
+
+    def __xor__(self, other):
+        return self._from_int(self._to_int() ^ self._coerce(other))
+
+    __ror__ = __or__
+    __rand__ = __and__
+    __rxor__ = __xor__
+
+    def __eq__(self, other):
+        if isinstance(other, IDBitmap):
+            return self._to_int() == other._to_int()
+        if isinstance(other, (set, frozenset)):
+            return set(self) == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __reduce__(self):
+        return self._from_bytes, (bytes(self._data).rstrip(b'\0'),)
+
+    @classmethod
+    def _from_bytes(cls, data):
+        bitmap = cls()
+        bitmap._data = bytearray(data)
+        return bitmap
+
+    def __repr__(self):
+        return 'IDBitmap(%r)' % sorted(self)
@@ -0,0 +1,130 @@
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import zlib
+
+from django.conf import settings
+
+from judge.utils.unicode import utf8bytes, utf8text
+
+__all__ = ['BlobStore', 'case_blob_hash', 'is_case_blob', 'load_case_text', 'store_case_text']
+
+logger = logging.getLogger('judge.blob_store')
+
+# Test case output and feedback stored in the blob store is replaced in its row by this prefix followed by the hash.
+# Text which itself starts with the prefix is always stored as a blob, so that it can't be mistaken for a reference.
+CASE_BLOB_PREFIX = '\0blob:'
+CASE_BLOB_RE = re.compile(re.escape(CASE_BLOB_PREFIX) + r'([0-9a-f]{64})')
+BLOB_NAME_RE = re.compile(r'[0-9a-f]{64}')
+
+# Blobs are read in chunks of this size when only a prefix of them is needed.
+READ_CHUNK_SIZE = 65536
+
+
+class BlobStore(object):
+    """
+    A content-addressed directory of zlib-compressed blobs, named after the SHA-256 hash of their contents.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def get_path(self, hash):
+        return os.path.join(self.root, hash[:2], hash[2:4], hash)
+
+    def put(self, data):
+        hash = hashlib.sha256(data).hexdigest()
+        path = self.get_path(hash)
+        try:
+            # Storing an existing blob again marks it as recently used, so that it isn't pruned before the reference
+            # to it is saved.
+            os.utime(path)
+        except FileNotFoundError:
+            directory = os.path.dirname(path)
+            os.makedirs(directory, exist_ok=True)
+            # Write to a temporary file first so concurrent readers never see a partially written blob.
+            with tempfile.NamedTemporaryFile(dir=directory, delete=False) as f:
+                f.write(zlib.compress(data))
+            os.replace(f.name, path)
+        return hash
+
+    def get(self, hash, limit=None):
+        """
+        Returns the contents of a blob, or only their first limit bytes, decompressing no more than needed.
+        """
+        with open(self.get_path(hash), 'rb') as f:
+            if limit is None:
+                return zlib.decompress(f.read())
+            decompressor = zlib.decompressobj()
+            result = []
+            remaining = limit
+            while remaining > 0:
+                data = decompressor.unconsumed_tail or f.read(READ_CHUNK_SIZE)
+                if not data:
+                    break
+                chunk = decompressor.decompress(data, remaining)
+                result.append(chunk)
+                remaining -= len(chunk)
+            return b''.join(result)
+
+    def list(self):
+        """
+        Yields the hash and modification time of every blob.
+        """
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                if BLOB_NAME_RE.fullmatch(name):
+                    try:
+                        yield name, os.stat(os.path.join(directory, name)).st_mtime
+                    except FileNotFoundError:
+                        pass
+
+    def delete(self, hash):
+        try:
+            os.unlink(self.get_path(hash))
+        except FileNotFoundError:
+            pass
+
+
+def is_case_blob(value):
+    return CASE_BLOB_RE.fullmatch(value) is not None
+
+
+def case_blob_hash(value):
+    """
+    Returns the hash of the blob a test case's output or extended feedback refers to, or None if it's stored inline.
+    """
+    match = CASE_BLOB_RE.fullmatch(value) if value else None
+    return match and match.group(1)
+
+
+def store_case_text(text):
+    """
+    Returns what to store in the row for a test case's output or extended feedback: the text itself, or a reference
+    to a blob if it's longer than DMOJ_TEST_CASE_BLOB_THRESHOLD bytes and a blob store is configured.
+    """
+    if not settings.DMOJ_TEST_CASE_BLOB_ROOT:
+        return text
+    data = utf8bytes(text)
+    if len(data) <= settings.DMOJ_TEST_CASE_BLOB_THRESHOLD and not text.startswith(CASE_BLOB_PREFIX):
+        return text
+    return CASE_BLOB_PREFIX + BlobStore(settings.DMOJ_TEST_CASE_BLOB_ROOT).put(data)
+
+
+def load_case_text(value, length=None):
+    """
+    Returns the text stored by store_case_text, or only its first length characters.
+    """
+    if not settings.DMOJ_TEST_CASE_BLOB_ROOT or not is_case_blob(value):
+        return value if length is None else value[:length]
+    hash = value[len(CASE_BLOB_PREFIX):]
+    try:
+        # A character takes at most 4 bytes in UTF-8.
+        data = BlobStore(settings.DMOJ_TEST_CASE_BLOB_ROOT).get(hash, None if length is None else length * 4)
+    except (OSError, zlib.error):
+        logger.exception('Failed to load test case blob %s', hash)
+        return ''
+    text = utf8text(data, errors='replace')
+    return text if length is None else text[:length]
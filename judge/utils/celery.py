@@ -1,18 +1,21 @@
 from celery.result import AsyncResult
+from django.core.cache import cache
 from django.http import HttpResponseRedirect
 from django.urls import reverse
 from django.utils.http import urlencode
 
 
 class Progress:
-    def __init__(self, task, total, stage=None):
+    def __init__(self, task, total, stage=None, task_id=None):
         self.task = task
+        self.task_id = task_id
         self._total = total
         self._done = 0
         self._stage = stage
 
     def _update_state(self):
         self.task.update_state(
+            task_id=self.task_id,
             state='PROGRESS',
             meta={
                 'done': self._done,
@@ -52,6 +55,34 @@ class Progress:
             self.done = self._total
 
 
+class SharedProgress(Progress):
+    """
+    Progress of work split across several tasks, reported as the progress of a single task.
+
+    Every participating task adds to a counter in the cache, so the reported count is the sum over all of them.
+    """
+
+    def __init__(self, task, task_id, total, stage=None):
+        super().__init__(task, total, stage, task_id=task_id)
+        self._key = 'task_progress:%s' % task_id
+        cache.add(self._key, 0, 86400)
+
+    def did(self, delta):
+        try:
+            self._done = cache.incr(self._key, delta)
+        except ValueError:
+            # The counter has expired, so the best we can do is to count our own work.
+            self._done += delta
+        self._update_state()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    @classmethod
+    def clear(cls, task_id):
+        cache.delete('task_progress:%s' % task_id)
+
+
 def task_status_url_by_id(result_id, message=None, redirect=None):
     args = {}
     if message:
@@ -1,3 +1,4 @@
+import base64
 import collections.abc
 import inspect
 from math import ceil
@@ -9,7 +10,7 @@ from django.utils.inspect import method_has_no_args
 
 
 class InfinitePage(collections.abc.Sequence):
-    def __init__(self, object_list, number, unfiltered_queryset, page_size, pad_pages, paginator):
+    def __init__(self, object_list, number, unfiltered_queryset, page_size, pad_pages, paginator, keyset_field=None):
         self.object_list = list(object_list)
         self.number = number
         self.unfiltered_queryset = unfiltered_queryset
@@ -17,6 +18,7 @@ class InfinitePage(collections.abc.Sequence):
         self.pad_pages = pad_pages
         self.num_pages = 1e3000
         self.paginator = paginator
+        self.keyset_field = keyset_field
 
     def __repr__(self):
         return '<Page %s of many>' % self.number
@@ -46,6 +48,18 @@ class InfinitePage(collections.abc.Sequence):
     def has_other_pages(self):
         return self.has_previous() or self.has_next()
 
+    @property
+    def next_cursor(self):
+        if self.keyset_field is None or not self.has_next():
+            return None
+        return encode_cursor(NEXT, getattr(self.object_list[-1], self.keyset_field))
+
+    @property
+    def previous_cursor(self):
+        if self.keyset_field is None or not self.has_previous() or not self.object_list:
+            return None
+        return encode_cursor(PREVIOUS, getattr(self.object_list[0], self.keyset_field))
+
     def next_page_number(self):
         if not self.has_next():
             raise EmptyPage()
@@ -93,6 +107,93 @@ class InfinitePage(collections.abc.Sequence):
         return result
 
 
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+def encode_cursor(direction, key):
+    return base64.urlsafe_b64encode(('%s%d' % (direction, key)).encode('ascii')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        cursor = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('ascii')
+        direction, key = cursor[0], int(cursor[1:])
+    except (ValueError, IndexError):
+        raise InvalidPage('Invalid cursor.')
+    if direction not in (NEXT, PREVIOUS):
+        raise InvalidPage('Invalid cursor.')
+    return direction, key
+
+
+class CursorPage(collections.abc.Sequence):
+    """
+    A page of a queryset ordered by a unique field, starting right after or ending right before a cursor.
+
+    Unlike pages found by number, it doesn't have to skip over every object before it, and whether there are more
+    objects in the direction of travel is found by fetching one more object than needed.
+    """
+
+    number = None
+    num_pages = 1e3000
+    page_range = ()
+
+    def __init__(self, object_list, has_next, has_previous, page_size, paginator, keyset_field):
+        self.object_list = object_list
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self.page_size = page_size
+        self.paginator = paginator
+        self.keyset_field = keyset_field
+
+    def __repr__(self):
+        return '<Page after cursor of many>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self.has_previous() or self.has_next()
+
+    @property
+    def next_cursor(self):
+        if not self.has_next() or not self.object_list:
+            return None
+        return encode_cursor(NEXT, getattr(self.object_list[-1], self.keyset_field))
+
+    @property
+    def previous_cursor(self):
+        if not self.has_previous() or not self.object_list:
+            return None
+        return encode_cursor(PREVIOUS, getattr(self.object_list[0], self.keyset_field))
+
+
+def keyset_paginate(queryset, cursor, page_size, keyset_field, descending, paginator=None):
+    direction, key = decode_cursor(cursor)
+    if (direction == NEXT) == descending:
+        queryset = queryset.filter(**{keyset_field + '__lt': key})
+    else:
+        queryset = queryset.filter(**{keyset_field + '__gt': key})
+
+    if direction == NEXT:
+        object_list = list(queryset[:page_size + 1])
+        has_more = len(object_list) > page_size
+        return CursorPage(object_list[:page_size], has_more, True, page_size, paginator, keyset_field)
+
+    object_list = list(queryset.reverse()[:page_size + 1])
+    has_more = len(object_list) > page_size
+    return CursorPage(object_list[:page_size][::-1], True, has_more, page_size, paginator, keyset_field)
+
+
 class DummyPaginator:
     is_infinite = True
 
@@ -100,28 +201,55 @@ class DummyPaginator:
         self.per_page = per_page
 
 
-def infinite_paginate(queryset, page, page_size, pad_pages, paginator=None):
+def infinite_paginate(queryset, page, page_size, pad_pages, paginator=None, keyset_field=None):
     if page < 1:
         raise EmptyPage()
     sliced = queryset[(page - 1) * page_size:page * page_size]
     if page > 1 and not sliced:
         raise EmptyPage()
-    return InfinitePage(sliced, page, queryset, page_size, pad_pages, paginator)
+    return InfinitePage(sliced, page, queryset, page_size, pad_pages, paginator, keyset_field)
 
 
 class InfinitePaginationMixin:
     pad_pages = 2
+    cursor_kwarg = 'cursor'
+    # A unique field which, when the queryset is ordered by it alone, allows paging with cursors.
+    keyset_field = None
 
     @property
     def use_infinite_pagination(self):
         return True
 
+    def get_keyset_ordering(self, queryset):
+        """
+        Returns whether the queryset is ordered by descending keyset field, or None if it isn't ordered by it alone.
+        """
+        if self.keyset_field is None:
+            return None
+        order_by = tuple(queryset.query.order_by)
+        if order_by == (self.keyset_field,):
+            return False
+        if order_by == ('-' + self.keyset_field,):
+            return True
+        return None
+
     def paginate_queryset(self, queryset, page_size):
         if not self.use_infinite_pagination:
             paginator, page, object_list, has_other = super().paginate_queryset(queryset, page_size)
             paginator.is_infinite = False
             return paginator, page, object_list, has_other
 
+        descending = self.get_keyset_ordering(queryset)
+        keyset_field = None if descending is None else self.keyset_field
+        cursor = self.request.GET.get(self.cursor_kwarg)
+        if cursor and keyset_field is not None:
+            try:
+                paginator = DummyPaginator(page_size)
+                page = keyset_paginate(queryset, cursor, page_size, keyset_field, descending, paginator)
+                return paginator, page, page.object_list, page.has_other_pages()
+            except InvalidPage as e:
+                raise Http404('Invalid cursor: %s' % e)
+
         page_kwarg = self.page_kwarg
         page = self.kwargs.get(page_kwarg) or self.request.GET.get(page_kwarg) or 1
         try:
@@ -130,7 +258,7 @@ class InfinitePaginationMixin:
             raise Http404('Page cannot be converted to an int.')
         try:
             paginator = DummyPaginator(page_size)
-            page = infinite_paginate(queryset, page_number, page_size, self.pad_pages, paginator)
+            page = infinite_paginate(queryset, page_number, page_size, self.pad_pages, paginator, keyset_field)
             return paginator, page, page.object_list, page.has_other_pages()
         except InvalidPage as e:
             raise Http404('Invalid page (%(page_number)s): %(message)s' % {
@@ -1,12 +1,15 @@
 import hashlib
 import logging
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
 from django.conf import settings
 from django.core.cache import caches
 from django.utils.html import format_html
 from mistune import escape
+from requests.adapters import HTTPAdapter
 
 from judge.utils.file_cache import HashFileCache
 from judge.utils.unicode import utf8bytes, utf8text
@@ -39,6 +42,22 @@ def format_math(math):
     return math
 
 
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    # One pooled session is shared so that connections to mathoid are reused across formulas and requests.
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.MATHOID_CONCURRENCY)
+            _session.mount('http://', adapter)
+            _session.mount('https://', adapter)
+        return _session
+
+
 class MathoidMathParser(object):
     types = ('svg', 'mml', 'tex', 'jax')
 
@@ -55,12 +74,14 @@ class MathoidMathParser(object):
         self.css_cache = caches[settings.MATHOID_CSS_CACHE]
 
         self.mml_cache_ttl = settings.MATHOID_MML_CACHE_TTL
+        # Set when a formula fails to render, so that the document isn't cached with the fallback.
+        self.failed = False
 
     def query_mathoid(self, formula, hash):
         self.cache.create(hash)
 
         try:
-            response = requests.post(self.mathoid_url, data={
+            response = get_session().post(self.mathoid_url, data={
                 'q': reescape.sub(lambda m: '\\' + m.group(0), formula).encode('utf-8'),
                 'type': 'tex' if formula.startswith(r'\displaystyle') else 'inline-tex',
             })
@@ -95,46 +116,90 @@ class MathoidMathParser(object):
         self.cache.cache_data(hash, 'css', css.encode('utf-8'), url=False, gzip=False)
         return result
 
-    def query_cache(self, hash):
-        result = {'svg': self.cache.get_url(hash, 'svg')}
-
-        key = 'mathoid:css:' + hash
-        css = result['css'] = self.css_cache.get(key)
-        if css is None:
-            css = result['css'] = self.cache.read_data(hash, 'css').decode('utf-8')
-            self.css_cache.set(key, css, self.mml_cache_ttl)
-
-        mml = None
-        if self.mml_cache:
-            mml = result['mml'] = self.mml_cache.get('mathoid:mml:' + hash)
-        if mml is None:
-            mml = result['mml'] = self.cache.read_data(hash, 'mml').decode('utf-8')
-            if self.mml_cache:
-                self.mml_cache.set('mathoid:mml:' + hash, mml, self.mml_cache_ttl)
-        return result
-
-    def get_result(self, formula):
+    def query_cache(self, hashes):
+        """
+        Returns a dict mapping each of the hashes that has been rendered before to its cached output.
+
+        The styles and MathML of every formula are fetched in one request to each cache, and only those missing from
+        them are read from the file cache.
+        """
+        css_cache = self.css_cache.get_many(['mathoid:css:' + hash for hash in hashes])
+        mml_cache = self.mml_cache.get_many(['mathoid:mml:' + hash for hash in hashes]) if self.mml_cache else {}
+
+        results = {}
+        css_misses = {}
+        mml_misses = {}
+        for hash in hashes:
+            css_key = 'mathoid:css:' + hash
+            mml_key = 'mathoid:mml:' + hash
+            css = css_cache.get(css_key)
+            if css is None:
+                if not self.cache.has_file(hash, 'css'):
+                    continue
+                css = css_misses[css_key] = self.cache.read_data(hash, 'css').decode('utf-8')
+
+            mml = mml_cache.get(mml_key)
+            if mml is None:
+                if not self.cache.has_file(hash, 'mml'):
+                    continue
+                mml = mml_misses[mml_key] = self.cache.read_data(hash, 'mml').decode('utf-8')
+
+            results[hash] = {'svg': self.cache.get_url(hash, 'svg'), 'css': css, 'mml': mml}
+
+        if css_misses:
+            self.css_cache.set_many(css_misses, self.mml_cache_ttl)
+        if mml_misses and self.mml_cache:
+            self.mml_cache.set_many(mml_misses, self.mml_cache_ttl)
+        return results
+
+    def get_results(self, formulas):
+        """
+        Returns a dict mapping each formula to its rendered output, or None if it failed to render.
+
+        Cached formulas are read first, and the rest are sent to mathoid concurrently, with at most
+        MATHOID_CONCURRENCY requests in flight.
+        """
+        formulas = set(map(utf8text, formulas))
         if self.type == 'tex':
-            return
-
-        hash = hashlib.sha1(utf8bytes(formula)).hexdigest()
-        formula = utf8text(formula)
-        if self.cache.has_file(hash, 'css'):
-            result = self.query_cache(hash)
-        else:
-            result = self.query_mathoid(formula, hash)
-
-        if not result:
-            return None
-
-        result['tex'] = formula
-        result['display'] = formula.startswith(r'\displaystyle')
-        return {
+            return dict.fromkeys(formulas)
+
+        hashes = {formula: hashlib.sha1(utf8bytes(formula)).hexdigest() for formula in formulas}
+        cached = self.query_cache(list(hashes.values()))
+        results = {}
+        misses = []
+        for formula, hash in hashes.items():
+            if hash in cached:
+                results[formula] = cached[hash]
+            else:
+                misses.append((formula, hash))
+
+        if len(misses) == 1:
+            formula, hash = misses[0]
+            results[formula] = self.query_mathoid(formula, hash)
+        elif misses:
+            with ThreadPoolExecutor(max_workers=min(len(misses), settings.MATHOID_CONCURRENCY)) as executor:
+                for (formula, hash), result in zip(misses, executor.map(lambda miss: self.query_mathoid(*miss),
+                                                                        misses)):
+                    results[formula] = result
+
+        output = {
             'mml': self.output_mml,
             'jax': self.output_jax,
             'svg': self.output_svg,
             'raw': lambda x: x,
-        }[self.type](result)
+        }[self.type]
+        for formula, result in results.items():
+            if not result:
+                self.failed = True
+                results[formula] = None
+                continue
+            result['tex'] = formula
+            result['display'] = formula.startswith(r'\displaystyle')
+            results[formula] = output(result)
+        return results
+
+    def get_result(self, formula):
+        return self.get_results([formula])[utf8text(formula)]
 
     def output_mml(self, result):
         return result['mml']
@@ -152,10 +217,23 @@ class MathoidMathParser(object):
                            result['svg'], result['css'], result['tex'],
                            ['inline-math', 'display-math'][result['display']])
 
-    def display_math(self, math):
+    @staticmethod
+    def display_formula(math):
+        """
+        Returns the formula to render for display math, and the output to use if it fails to render.
+        """
         math = format_math(math)
-        return self.get_result(r'\displaystyle ' + math) or r'\[%s\]' % escape(math)
+        return r'\displaystyle ' + math, r'\[%s\]' % escape(math)
 
-    def inline_math(self, math):
+    @staticmethod
+    def inline_formula(math):
         math = format_math(math)
-        return self.get_result(math) or r'\(%s\)' % escape(math)
+        return math, r'\(%s\)' % escape(math)
+
+    def display_math(self, math):
+        formula, fallback = self.display_formula(math)
+        return self.get_result(formula) or fallback
+
+    def inline_math(self, math):
+        formula, fallback = self.inline_formula(math)
+        return self.get_result(formula) or fallback
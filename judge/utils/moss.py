@@ -0,0 +1,120 @@
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.db import connections
+from django.utils.module_loading import import_string
+
+from judge.models import ContestMoss, ContestParticipation, Submission, SubmissionSource
+from judge.utils.iterator import chunk
+
+__all__ = ['LocalMOSS', 'get_moss_client', 'moss_pairs', 'run_moss_pairs']
+
+SOURCE_CHUNK_SIZE = 100
+
+
+class LocalMOSS:
+    """
+    A stand-in for the MOSS client which never contacts the MOSS server, so that the pipeline can be run offline.
+
+    It accepts files exactly like the real client, and processing returns a URL that only depends on the files added.
+    """
+
+    def __init__(self, user_id, language, comment='', matching_file_limit=250, **kwargs):
+        self.user_id = user_id
+        self.language = language
+        self.comment = comment
+        self.matching_file_limit = matching_file_limit
+        self.staged_files = [[], []]
+
+    def add_file_from_memory(self, virtual_path, content, base=False, display_name=None):
+        if display_name is None:
+            display_name = virtual_path.replace(' ', '_')
+        self.staged_files[base].append((virtual_path, content, display_name))
+
+    def process(self):
+        digest = hashlib.sha256(self.language.encode('utf-8'))
+        for path, content, name in self.staged_files[1] + self.staged_files[0]:
+            digest.update(b'%s\0%s\0' % (name.encode('utf-8'), content))
+        return 'http://localhost/moss/results/%s' % digest.hexdigest()[:16]
+
+
+def get_moss_client():
+    return import_string(settings.DMOJ_MOSS_CLIENT)
+
+
+def moss_pairs(contest):
+    for problem in contest.problems.order_by('code'):
+        for dmoj_lang, moss_lang in ContestMoss.LANG_MAPPING:
+            yield problem, dmoj_lang, moss_lang
+
+
+def _best_submissions(contest, problem, language, accepted_only):
+    queryset = Submission.objects.filter(
+        contest__participation__virtual__in=(ContestParticipation.LIVE, ContestParticipation.SPECTATE),
+        contest_object=contest,
+        problem=problem,
+        language__common_name=language,
+    )
+    if accepted_only:
+        queryset = queryset.filter(result='AC')
+
+    # Only the best submission of each user is checked, so there is no need to load the source of the others.
+    best = {}
+    for submission_id, username in queryset.order_by('-points', 'id').values_list('id', 'user__user__username'):
+        best.setdefault(username, submission_id)
+    return best
+
+
+def _iter_sources(best):
+    usernames = {submission_id: username for username, submission_id in best.items()}
+    for submission_ids in chunk(list(usernames), SOURCE_CHUNK_SIZE):
+        for submission_id, source in SubmissionSource.get_sources(submission_ids).items():
+            yield usernames[submission_id], source
+
+
+def run_moss_pair(contest, problem, dmoj_lang, moss_lang, accepted_only=False):
+    """
+    Runs MOSS on the best submission of every user for one problem and language.
+
+    :return: A tuple of the MOSS result URL, or None if there were no submissions, and the number of users checked.
+    """
+    best = _best_submissions(contest, problem, dmoj_lang, accepted_only)
+    if not best:
+        return None, 0
+
+    moss_call = get_moss_client()(settings.MOSS_API_KEY, language=moss_lang, matching_file_limit=100,
+                                  comment='%s - %s' % (contest.key, problem.code))
+    for username, source in _iter_sources(best):
+        moss_call.add_file_from_memory(username, source.encode('utf-8'))
+    return moss_call.process(), len(best)
+
+
+def _run_moss_pair_in_thread(*args, **kwargs):
+    try:
+        return run_moss_pair(*args, **kwargs)
+    finally:
+        connections.close_all()
+
+
+def run_moss_pairs(contest, pairs, accepted_only=False):
+    """
+    Runs MOSS on every (problem, dmoj_lang, moss_lang) pair given, up to DMOJ_MOSS_MAX_WORKERS at a time, since most
+    of the time is spent waiting on the MOSS server.
+
+    Yields (problem, dmoj_lang, url, submission_count) as each pair finishes, which may not be the order given.
+    """
+    max_workers = settings.DMOJ_MOSS_MAX_WORKERS
+    if max_workers <= 1:
+        for problem, dmoj_lang, moss_lang in pairs:
+            yield (problem, dmoj_lang) + run_moss_pair(contest, problem, dmoj_lang, moss_lang, accepted_only)
+        return
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(_run_moss_pair_in_thread, contest, problem, dmoj_lang, moss_lang, accepted_only):
+                (problem, dmoj_lang)
+            for problem, dmoj_lang, moss_lang in pairs
+        }
+        for future in as_completed(futures):
+            yield futures[future] + future.result()
@@ -1,11 +1,15 @@
+import hashlib
 import json
 import os
 import re
+import tempfile
+from zipfile import ZipFile
 
 import yaml
 from django.conf import settings
 from django.core.files.base import ContentFile
 from django.core.files.storage import FileSystemStorage
+from django.db import transaction
 from django.urls import reverse
 from django.utils.translation import gettext as _
 
@@ -39,29 +43,150 @@ class ProblemDataStorage(FileSystemStorage):
         return os.rename(self.path(old), self.path(new))
 
 
+def _zip_manifest_path(zip_path):
+    return zip_path + '.manifest.json'
+
+
+def get_zip_manifest(zip_path):
+    """
+    Returns a list of (name, size, CRC) for each member of a data zip.
+
+    The list is kept in a file beside the zip, and is only recomputed when the zip's size or modification time changes,
+    so the zip's central directory doesn't need to be read every time. Raises BadZipfile if the zip is invalid.
+    """
+    stat = os.stat(zip_path)
+    manifest_path = _zip_manifest_path(zip_path)
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest['size'] == stat.st_size and manifest['mtime'] == stat.st_mtime_ns:
+            return [tuple(member) for member in manifest['files']]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    with ZipFile(zip_path) as zip:
+        files = [(info.filename, info.file_size, info.CRC) for info in zip.infolist()]
+
+    try:
+        with tempfile.NamedTemporaryFile('w', dir=os.path.dirname(manifest_path), delete=False) as f:
+            json.dump({'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'files': files}, f)
+        os.replace(f.name, manifest_path)
+    except OSError:
+        pass
+    return files
+
+
+def delete_zip_manifest(zip_path):
+    try:
+        os.unlink(_zip_manifest_path(zip_path))
+    except FileNotFoundError:
+        pass
+
+
+DATA_MANIFEST = '.manifest.json'
+
+
+def _hash_file(path):
+    hash = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            hash.update(chunk)
+    return hash.hexdigest()
+
+
+def get_data_manifest(problem_code, zip_name=None, compute=True):
+    """
+    Returns the data version of a problem, and a dict mapping the path of every file in its data directory to its size
+    and SHA-256 hash, so that judges can fetch only the files which changed. zip_name is the storage name of the
+    problem's data zip, whose manifest isn't part of the data.
+
+    Hashes are kept in a manifest file in the directory, and a file is only hashed again when its size or modification
+    time changes. The version is a hash of the whole manifest. If compute is not set, returns None instead of hashing
+    anything.
+    """
+    from judge.models import problem_data_storage
+
+    root = problem_data_storage.path(problem_code)
+    excluded = {DATA_MANIFEST}
+    if zip_name:
+        excluded.add(os.path.relpath(problem_data_storage.path(zip_name), root).replace(os.sep, '/') + '.manifest.json')
+    manifest_path = os.path.join(root, DATA_MANIFEST)
+    try:
+        with open(manifest_path) as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        cached = {}
+
+    entries = {}
+    for directory, _dirs, names in os.walk(root):
+        for name in names:
+            path = os.path.join(directory, name)
+            relative = os.path.relpath(path, root).replace(os.sep, '/')
+            if relative in excluded:
+                continue
+            stat = os.stat(path)
+            entry = cached.get(relative)
+            if not isinstance(entry, list) or entry[:2] != [stat.st_size, stat.st_mtime_ns]:
+                if not compute:
+                    return None
+                entry = [stat.st_size, stat.st_mtime_ns, _hash_file(path)]
+            entries[relative] = entry
+
+    if entries != cached and not compute:
+        return None
+    if entries != cached and os.path.isdir(root):
+        try:
+            with tempfile.NamedTemporaryFile('w', dir=root, delete=False) as f:
+                json.dump(entries, f)
+            os.replace(f.name, manifest_path)
+        except OSError:
+            pass
+
+    files = {path: {'size': size, 'sha256': hash} for path, (size, mtime, hash) in sorted(entries.items())}
+    version = hashlib.sha256(json.dumps(files, sort_keys=True).encode()).hexdigest()
+    return version, files
+
+
 class ProblemDataError(Exception):
     def __init__(self, message):
         super(ProblemDataError, self).__init__(message)
         self.message = message
 
+    @classmethod
+    def from_errors(cls, errors):
+        self = cls('\n'.join(errors))
+        self.errors = errors
+        return self
+
+
+# The fields of ProblemTestCase which ProblemDataCompiler.make_init normalizes.
+CASE_UPDATE_FIELDS = ('is_pretest', 'input_file', 'output_file', 'generator_args', 'checker', 'checker_args')
+
 
 class ProblemDataCompiler(object):
     def __init__(self, problem, data, cases, files):
         self.problem = problem
         self.data = data
         self.cases = cases
-        self.files = files
+        self.files = set(files)
 
         self.generator = data.generator
+        self.case_updates = []
 
     def make_init(self):
+        """
+        Builds init.yml without writing anything. The changes it makes to cases are collected in case_updates, and
+        every problem with the cases is reported at once in the raised ProblemDataError.
+        """
         cases = []
         batch = None
         batch_count = 0
+        errors = []
+        self.case_updates = []
 
         def end_batch():
             if not batch['batched']:
-                raise ProblemDataError(_('Empty batches not allowed.'))
+                errors.append(_('Empty batches not allowed.'))
             cases.append(batch)
 
         def make_checker(case):
@@ -80,16 +205,14 @@ class ProblemDataCompiler(object):
                     case.is_pretest = batch['is_pretest']
                 else:
                     if case.points is None:
-                        raise ProblemDataError(_('Points must be defined for non-batch case #%d.') % i)
+                        errors.append(_('Points must be defined for non-batch case #%d.') % i)
                     data['is_pretest'] = case.is_pretest
 
                 if not self.generator:
                     if case.input_file not in self.files:
-                        raise ProblemDataError(_('Input file for case %d does not exist: %s') %
-                                               (i, case.input_file))
+                        errors.append(_('Input file for case %d does not exist: %s') % (i, case.input_file))
                     if case.output_file not in self.files:
-                        raise ProblemDataError(_('Output file for case %d does not exist: %s') %
-                                               (i, case.output_file))
+                        errors.append(_('Output file for case %d does not exist: %s') % (i, case.output_file))
 
                 if case.input_file:
                     data['in'] = case.input_file
@@ -107,29 +230,31 @@ class ProblemDataCompiler(object):
                     data['checker'] = make_checker(case)
                 else:
                     case.checker_args = ''
-                case.save(update_fields=('checker_args', 'is_pretest'))
+                self.case_updates.append(case)
                 (batch['batched'] if batch else cases).append(data)
             elif case.type == 'S':
                 batch_count += 1
                 if batch:
                     end_batch()
                 if case.points is None:
-                    raise ProblemDataError(_('Batch start case #%d requires points.') % i)
+                    errors.append(_('Batch start case #%d requires points.') % i)
                 dependencies = []
                 if case.batch_dependencies.strip():
                     try:
                         dependencies = list(map(int, case.batch_dependencies.split(',')))
                     except ValueError:
-                        raise ProblemDataError(
+                        errors.append(
                             _('Dependencies must be a comma-separated list of integers for batch start case #%d.') % i,
                         )
                     for batch_number in dependencies:
                         if batch_number >= batch_count:
-                            raise ProblemDataError(
+                            errors.append(
                                 _('Dependencies must depend on previous batches for batch start case #%d.') % i,
                             )
+                            break
                         elif batch_number < 1:
-                            raise ProblemDataError(_('Dependencies must be positive for batch start case #%d.') % i)
+                            errors.append(_('Dependencies must be positive for batch start case #%d.') % i)
+                            break
                 batch = {
                     'points': case.points,
                     'batched': [],
@@ -148,17 +273,18 @@ class ProblemDataCompiler(object):
                     case.checker_args = ''
                 case.input_file = ''
                 case.output_file = ''
-                case.save(update_fields=('checker_args', 'input_file', 'output_file'))
+                self.case_updates.append(case)
             elif case.type == 'E':
                 if not batch:
-                    raise ProblemDataError(_('Attempt to end batch outside of one in case #%d.') % i)
+                    errors.append(_('Attempt to end batch outside of one in case #%d.') % i)
+                    continue
                 case.is_pretest = batch['is_pretest']
                 case.input_file = ''
                 case.output_file = ''
                 case.generator_args = ''
                 case.checker = ''
                 case.checker_args = ''
-                case.save()
+                self.case_updates.append(case)
                 end_batch()
                 batch = None
         if batch:
@@ -169,14 +295,16 @@ class ProblemDataCompiler(object):
         if self.data.zipfile:
             zippath = split_path_first(self.data.zipfile.name)
             if len(zippath) != 2:
-                raise ProblemDataError(_('How did you corrupt the zip path?'))
-            init['archive'] = zippath[1]
+                errors.append(_('How did you corrupt the zip path?'))
+            else:
+                init['archive'] = zippath[1]
 
         if self.generator:
             generator_path = split_path_first(self.generator.name)
             if len(generator_path) != 2:
-                raise ProblemDataError(_('How did you corrupt the generator path?'))
-            init['generator'] = generator_path[1]
+                errors.append(_('How did you corrupt the generator path?'))
+            else:
+                init['generator'] = generator_path[1]
 
         pretest_test_cases = []
         test_cases = []
@@ -210,10 +338,19 @@ class ProblemDataCompiler(object):
         if hints:
             init['hints'] = hints
 
+        if errors:
+            raise ProblemDataError.from_errors(errors)
         return init
 
+    def save_case_updates(self):
+        from judge.models import ProblemTestCase
+
+        # Points are cleared for cases in batches only when building init.yml, and aren't saved.
+        ProblemTestCase.objects.bulk_update(self.case_updates, CASE_UPDATE_FIELDS, batch_size=500)
+
     def compile(self):
         from judge.models import problem_data_storage
+        from judge.tasks import update_data_version
 
         yml_file = '%s/init.yml' % self.problem.code
         try:
@@ -221,10 +358,12 @@ class ProblemDataCompiler(object):
             if init:
                 init = yaml.safe_dump(init)
         except ProblemDataError as e:
+            self.save_case_updates()
             self.data.feedback = e.message
             self.data.save()
             problem_data_storage.delete(yml_file)
         else:
+            self.save_case_updates()
             self.data.feedback = ''
             self.data.save()
             if init:
@@ -235,6 +374,9 @@ class ProblemDataCompiler(object):
                 # but will do so if there is no init.yml, so we delete the init.yml
                 problem_data_storage.delete(yml_file)
 
+        # Hashing the data can take a while, so the version is updated in the background.
+        transaction.on_commit(update_data_version.s(self.problem.id).delay)
+
     @classmethod
     def generate(cls, *args, **kwargs):
         self = cls(*args, **kwargs)
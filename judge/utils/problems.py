@@ -1,15 +1,21 @@
+import threading
+import uuid
 from collections import defaultdict
-from math import e
+from datetime import timedelta
+from math import ceil, e
 
 from django.core.cache import cache
-from django.db.models import Case, Count, ExpressionWrapper, F, When
-from django.db.models.fields import FloatField
+from django.db.models import Count, F, Q
 from django.utils import timezone
 from django.utils.translation import gettext_noop
 
 from judge.models import Problem, Submission
+from judge.utils.bitmap import IDBitmap
 
-__all__ = ['contest_completed_ids', 'get_result_data', 'user_completed_ids', 'user_editable_ids', 'user_tester_ids']
+__all__ = ['contest_completed_ids', 'get_result_data', 'hot_problems', 'invalidate_problem_submission_restrictions',
+           'invalidate_problem_visibility', 'invalidate_user_problem_ids', 'problem_submission_restrictions',
+           'problem_visibility_version', 'record_hot_problem_submission', 'user_completed_ids', 'user_editable_ids',
+           'user_finished_submission', 'user_tester_ids', 'visible_problem_ids']
 
 
 def user_tester_ids(profile):
@@ -20,43 +26,195 @@ def user_editable_ids(profile):
     return set(Problem.get_editable_problems(profile.user).values_list('id', flat=True))
 
 
+# Every cached visibility set includes this version in its key, which is changed whenever problem visibility or
+# organization membership changes, instead of working out which of the cached sets are affected.
+PROBLEM_VISIBILITY_VERSION_KEY = 'problem_visibility:version'
+
+
+def problem_visibility_version():
+    version = cache.get(PROBLEM_VISIBILITY_VERSION_KEY)
+    if version is None:
+        cache.add(PROBLEM_VISIBILITY_VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(PROBLEM_VISIBILITY_VERSION_KEY)
+    return version
+
+
+def invalidate_problem_visibility():
+    cache.set(PROBLEM_VISIBILITY_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+# Cached sets are always built from the primary, even inside use_replicas(), since a set built from a lagging replica
+# would stay stale for as long as it's cached.
+def _cached_problem_ids(key, queryset):
+    result = cache.get(key)
+    if result is None:
+        result = IDBitmap(queryset.using('default').values_list('id', flat=True).distinct())
+        cache.set(key, result, 86400)
+    return result
+
+
+def _organization_problem_ids(version, organization_ids, public_only):
+    result = IDBitmap()
+    for organization_id in organization_ids:
+        queryset = Problem.objects.filter(is_organization_private=True, organizations=organization_id)
+        if public_only:
+            queryset = queryset.filter(is_public=True)
+        key = 'problem_visibility:%s:%s:%d' % (version, 'org_public' if public_only else 'org', organization_id)
+        result |= _cached_problem_ids(key, queryset)
+    return result
+
+
+def visible_problem_ids(user):
+    """
+    Returns the IDs of the problems in Problem.get_visible_problems(user) as an IDBitmap, or None if the user can see
+    every problem.
+
+    The set is put together from cached sets shared by every user: public problems, and the problems of each
+    organization, along with the problems the user is an author, curator or tester of.
+    """
+    version = problem_visibility_version()
+    if not user.is_authenticated:
+        return _cached_problem_ids('problem_visibility:%s:public' % version, Problem.get_public_problems())
+
+    edit_own_problem = user.has_perm('judge.edit_own_problem')
+    edit_public_problem = edit_own_problem and user.has_perm('judge.edit_public_problem')
+    edit_all_problem = edit_own_problem and user.has_perm('judge.edit_all_problem')
+    if user.has_perm('judge.see_private_problem') or edit_all_problem:
+        return None
+
+    profile = user.profile
+    key = 'problem_visibility:%s:user:%d' % (version, profile.id)
+    user_data = cache.get(key)
+    if user_data is None:
+        user_data = (
+            list(profile.organizations.using('default').values_list('id', flat=True)),
+            list(profile.admin_of.using('default').values_list('id', flat=True)),
+            IDBitmap(Problem.objects.using('default')
+                     .filter(Q(authors=profile) | Q(curators=profile) | Q(testers=profile))
+                     .values_list('id', flat=True).distinct()),
+        )
+        cache.set(key, user_data, 86400)
+    organization_ids, admin_organization_ids, result = user_data
+
+    if user.has_perm('judge.see_organization_problem') or edit_public_problem:
+        result = result | _cached_problem_ids('problem_visibility:%s:all_public' % version,
+                                              Problem.objects.filter(is_public=True))
+    else:
+        result = result | _cached_problem_ids('problem_visibility:%s:public' % version, Problem.get_public_problems())
+        result |= _organization_problem_ids(version, organization_ids, public_only=True)
+    if edit_own_problem:
+        result |= _organization_problem_ids(version, admin_organization_ids, public_only=False)
+    return result
+
+
+def problem_submission_restrictions(problem_id):
+    """
+    Returns the IDs of the languages allowed on a problem, and the IDs of the users banned from submitting to it.
+    """
+    key = 'problem_submission_restrictions:%d' % problem_id
+    result = cache.get(key)
+    if result is None:
+        result = (
+            frozenset(Problem.allowed_languages.through.objects.using('default').filter(problem_id=problem_id)
+                      .values_list('language_id', flat=True)),
+            frozenset(Problem.banned_users.through.objects.using('default').filter(problem_id=problem_id)
+                      .values_list('profile_id', flat=True)),
+        )
+        cache.set(key, result, 86400)
+    return result
+
+
+def invalidate_problem_submission_restrictions(problem_ids):
+    cache.delete_many(['problem_submission_restrictions:%d' % problem_id for problem_id in problem_ids])
+
+
 def contest_completed_ids(participation):
     key = 'contest_complete:%d' % participation.id
     result = cache.get(key)
     if result is None:
-        result = set(participation.submissions.filter(submission__result='AC', points__gte=F('problem__points'))
+        result = set(participation.submissions.using('default')
+                     .filter(submission__result='AC', points__gte=F('problem__points'))
                      .values_list('problem__problem_id', flat=True).distinct())
         cache.set(key, result, 86400)
     return result
 
 
-def user_completed_ids(profile):
-    key = 'user_complete:%d' % profile.id
+# The solved and attempted problems of each user are cached under a version, which is changed to invalidate them, so
+# that an update in place racing with an invalidation only writes to a key that is no longer read. Updates in place
+# hold a short lock, and invalidate instead if someone else holds it, so concurrent updates never lose a problem.
+USER_PROBLEM_IDS_KINDS = ('user_complete', 'user_attempted')
+
+
+def _user_problem_ids_key(kind, profile_id):
+    version_key = '%s_version:%d' % (kind, profile_id)
+    version = cache.get(version_key)
+    if version is None:
+        cache.add(version_key, uuid.uuid4().hex, None)
+        version = cache.get(version_key)
+    return '%s:%d:%s' % (kind, profile_id, version)
+
+
+def invalidate_user_problem_ids(profile_id):
+    cache.set_many({'%s_version:%d' % (kind, profile_id): uuid.uuid4().hex for kind in USER_PROBLEM_IDS_KINDS}, None)
+
+
+def _cached_user_problem_ids(kind, profile_id, queryset):
+    key = _user_problem_ids_key(kind, profile_id)
     result = cache.get(key)
     if result is None:
-        result = set(Submission.objects
-                     .filter(user=profile, is_archived=False, result='AC', case_points__gte=F('case_total'))
-                     .values_list('problem_id', flat=True).distinct())
-        cache.set(key, result, 86400)
+        result = IDBitmap(queryset.using('default').values_list('problem_id', flat=True).distinct())
+        # Added rather than set, so that a problem added in place meanwhile isn't overwritten.
+        cache.add(key, result, 86400)
     return result
 
 
+def _add_to_user_problem_ids(kind, profile_id, problem_id):
+    lock_key = '%s_lock:%d' % (kind, profile_id)
+    if not cache.add(lock_key, True, 10):
+        cache.set('%s_version:%d' % (kind, profile_id), uuid.uuid4().hex, None)
+        return
+    try:
+        key = _user_problem_ids_key(kind, profile_id)
+        # Only update what is already cached: a missing key is rebuilt from the database on the next read anyway.
+        result = cache.get(key)
+        if result is not None and problem_id not in result:
+            result.add(problem_id)
+            cache.set(key, result, 86400)
+    finally:
+        cache.delete(lock_key)
+
+
+def user_finished_submission(submission):
+    """
+    Marks the problem of a newly graded submission as attempted, and as completed if the submission passed, in the
+    cached problem IDs of its user.
+
+    Grading a new submission can never make a problem unsolved, so unlike invalidating, this doesn't have to rebuild
+    the problem IDs from every submission the user has ever made.
+    """
+    _add_to_user_problem_ids('user_attempted', submission.user_id, submission.problem_id)
+    if not submission.is_archived and submission.result == 'AC' and submission.case_points >= submission.case_total:
+        _add_to_user_problem_ids('user_complete', submission.user_id, submission.problem_id)
+
+
+def user_completed_ids(profile):
+    return _cached_user_problem_ids('user_complete', profile.id, Submission.objects.filter(
+        user=profile, is_archived=False, result='AC', case_points__gte=F('case_total'),
+    ))
+
+
 def contest_attempted_ids(participation):
     key = 'contest_attempted:%s' % participation.id
     result = cache.get(key)
     if result is None:
-        result = set(participation.submissions.values_list('problem__problem_id', flat=True).distinct())
+        result = set(participation.submissions.using('default').values_list('problem__problem_id', flat=True)
+                     .distinct())
         cache.set(key, result, 86400)
     return result
 
 
 def user_attempted_ids(profile):
-    key = 'user_attempted:%s' % profile.id
-    result = cache.get(key)
-    if result is None:
-        result = set(profile.submission_set.values_list('problem_id', flat=True).distinct())
-        cache.set(key, result, 86400)
-    return result
+    return _cached_user_problem_ids('user_attempted', profile.id, profile.submission_set.all())
 
 
 def _get_result_data(results):
@@ -86,40 +244,74 @@ def get_result_data(*args, **kwargs):
     return _get_result_data(defaultdict(int, raw))
 
 
+# Submissions are counted towards hot problems in hourly buckets, which expire after HOT_PROBLEM_RETENTION.
+HOT_PROBLEM_BUCKET = 3600
+HOT_PROBLEM_RETENTION = timedelta(days=2)
+HOT_PROBLEM_VOLUME_RESULTS = frozenset(('AC', 'WA', 'IR', 'RTE', 'TLE', 'OLE'))
+
+# The bridge is the only process grading submissions, so a lock there is enough to serialize bucket updates.
+_hot_problem_lock = threading.Lock()
+
+
+def _hot_problem_bucket_key(bucket):
+    return 'hot_problems:bucket:%d' % bucket
+
+
+def record_hot_problem_submission(submission):
+    """
+    Counts a graded submission towards the hot problem counters of the hour it was made in.
+
+    Each bucket maps problem IDs to the set of users who submitted, the number of accepted submissions, and the
+    number of submissions which weren't compile errors or otherwise failed to run.
+    """
+    key = _hot_problem_bucket_key(int(submission.date.timestamp()) // HOT_PROBLEM_BUCKET)
+    with _hot_problem_lock:
+        bucket = cache.get(key) or {}
+        users, ac_volume, submission_volume = bucket.get(submission.problem_id, (set(), 0, 0))
+        users.add(submission.user_id)
+        if submission.result == 'AC':
+            ac_volume += 1
+        if submission.result in HOT_PROBLEM_VOLUME_RESULTS:
+            submission_volume += 1
+        bucket[submission.problem_id] = users, ac_volume, submission_volume
+        cache.set(key, bucket, HOT_PROBLEM_RETENTION.total_seconds())
+
+
 def hot_problems(duration, limit):
+    """
+    Returns the hottest public problems, by the number of users who submitted to them in the trailing `duration`,
+    rounded up to the hour, weighted by their points and acceptance rates.
+    """
     cache_key = 'hot_problems:%d:%d' % (duration.total_seconds(), limit)
-    qs = cache.get(cache_key)
-    if qs is None:
-        qs = Problem.get_public_problems() \
-                    .filter(submission__date__gt=timezone.now() - duration, points__gt=3, points__lt=25)
-        qs0 = qs.annotate(k=Count('submission__user', distinct=True)).order_by('-k').values_list('k', flat=True)
+    result = cache.get(cache_key)
+    if result is None:
+        current = int(timezone.now().timestamp()) // HOT_PROBLEM_BUCKET
+        buckets = range(current - ceil(duration.total_seconds() / HOT_PROBLEM_BUCKET), current + 1)
 
-        if not qs0:
+        users = defaultdict(set)
+        ac_volume = defaultdict(int)
+        submission_volume = defaultdict(int)
+        for bucket in cache.get_many([_hot_problem_bucket_key(bucket) for bucket in buckets]).values():
+            for problem_id, (bucket_users, bucket_ac_volume, bucket_submission_volume) in bucket.items():
+                users[problem_id] |= bucket_users
+                ac_volume[problem_id] += bucket_ac_volume
+                submission_volume[problem_id] += bucket_submission_volume
+
+        problems = list(Problem.get_public_problems().filter(id__in=users.keys(), points__gt=3, points__lt=25)
+                        .defer('description'))
+        if not problems:
             return []
-        # make this an aggregate
-        mx = float(qs0[0])
-
-        qs = qs.annotate(unique_user_count=Count('submission__user', distinct=True))
-        # fix braindamage in excluding CE
-        qs = qs.annotate(submission_volume=Count(Case(
-            When(submission__result='AC', then=1),
-            When(submission__result='WA', then=1),
-            When(submission__result='IR', then=1),
-            When(submission__result='RTE', then=1),
-            When(submission__result='TLE', then=1),
-            When(submission__result='OLE', then=1),
-            output_field=FloatField(),
-        )))
-        qs = qs.annotate(ac_volume=Count(Case(
-            When(submission__result='AC', then=1),
-            output_field=FloatField(),
-        )))
-        qs = qs.filter(unique_user_count__gt=max(mx / 3.0, 1))
-
-        qs = qs.annotate(ordering=ExpressionWrapper(
-            0.5 * F('points') * (0.4 * F('ac_volume') / F('submission_volume') + 0.6 * F('ac_rate')) +
-            100 * e ** (F('unique_user_count') / mx), output_field=FloatField(),
-        )).order_by('-ordering').defer('description')[:limit]
-
-        cache.set(cache_key, qs, 900)
-    return qs
+        mx = float(max(len(users[problem.id]) for problem in problems))
+
+        def ordering(problem):
+            # Like in SQL, problems without any submission volume are sorted last.
+            if not submission_volume[problem.id]:
+                return float('-inf')
+            return (0.5 * problem.points * (0.4 * ac_volume[problem.id] / submission_volume[problem.id] +
+                                            0.6 * problem.ac_rate) +
+                    100 * e ** (len(users[problem.id]) / mx))
+
+        problems = [problem for problem in problems if len(users[problem.id]) > max(mx / 3.0, 1)]
+        result = sorted(problems, key=ordering, reverse=True)[:limit]
+        cache.set(cache_key, result, 60)
+    return result
@@ -0,0 +1,91 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from judge.models import Submission
+
+__all__ = ['record_submission', 'submission_finished', 'submission_limit_exceeded']
+
+# Submissions which haven't finished grading, and recent submissions, are tracked per user in the cache so that
+# submitting doesn't need to count them. The cached state is only a hint: it's reloaded from the database when it
+# expires, and when it says the user is over a limit, so that a lost update can only let a submission through.
+IN_FLIGHT_KEY = 'submission_in_flight:%d'
+RECENT_KEY = 'submission_recent:%d'
+STATE_TIMEOUT = 3600
+
+# Results which don't count towards DMOJ_SUBMISSION_RATELIMIT.
+UNCOUNTED_RESULTS = frozenset(('IE', 'CE'))
+
+_lock = threading.Lock()
+
+
+def _load_in_flight(user_id):
+    ids = set(Submission.objects.filter(user_id=user_id, rejudged_date__isnull=True)
+              .exclude(status__in=['D', 'IE', 'CE', 'AB']).values_list('id', flat=True))
+    cache.set(IN_FLIGHT_KEY % user_id, ids, STATE_TIMEOUT)
+    return ids
+
+
+def _load_recent(user_id):
+    submissions = Submission.objects.filter(
+        user_id=user_id, date__gte=timezone.now() - settings.DMOJ_SUBMISSION_RATELIMIT_TIMEFRAME,
+    ).exclude(status__in=['IE', 'CE'])
+    recent = {id: date.timestamp() for id, date in submissions.values_list('id', 'date')}
+    cache.set(RECENT_KEY % user_id, recent, STATE_TIMEOUT)
+    return recent
+
+
+def _count_recent(recent):
+    cutoff = time.time() - settings.DMOJ_SUBMISSION_RATELIMIT_TIMEFRAME.total_seconds()
+    return sum(timestamp >= cutoff for timestamp in recent.values())
+
+
+def submission_limit_exceeded(profile):
+    """
+    Returns whether the user has too many submissions being graded, or has submitted too many times recently.
+    """
+    in_flight = cache.get(IN_FLIGHT_KEY % profile.id)
+    if in_flight is None or len(in_flight) >= settings.DMOJ_SUBMISSION_LIMIT:
+        in_flight = _load_in_flight(profile.id)
+    if len(in_flight) >= settings.DMOJ_SUBMISSION_LIMIT:
+        return True
+
+    recent = cache.get(RECENT_KEY % profile.id)
+    if recent is None or _count_recent(recent) >= settings.DMOJ_SUBMISSION_RATELIMIT:
+        recent = _load_recent(profile.id)
+    return _count_recent(recent) >= settings.DMOJ_SUBMISSION_RATELIMIT
+
+
+def record_submission(submission):
+    in_flight_key = IN_FLIGHT_KEY % submission.user_id
+    recent_key = RECENT_KEY % submission.user_id
+    cutoff = time.time() - settings.DMOJ_SUBMISSION_RATELIMIT_TIMEFRAME.total_seconds()
+    with _lock:
+        state = cache.get_many([in_flight_key, recent_key])
+        updates = {}
+        if in_flight_key in state:
+            updates[in_flight_key] = state[in_flight_key] | {submission.id}
+        if recent_key in state:
+            recent = {id: timestamp for id, timestamp in state[recent_key].items() if timestamp >= cutoff}
+            recent[submission.id] = submission.date.timestamp()
+            updates[recent_key] = recent
+        cache.set_many(updates, STATE_TIMEOUT)
+
+
+def submission_finished(submission, result):
+    in_flight_key = IN_FLIGHT_KEY % submission.user_id
+    recent_key = RECENT_KEY % submission.user_id
+    with _lock:
+        state = cache.get_many([in_flight_key, recent_key])
+        updates = {}
+        if submission.id in state.get(in_flight_key, ()):
+            updates[in_flight_key] = state[in_flight_key] - {submission.id}
+        if result in UNCOUNTED_RESULTS and submission.id in state.get(recent_key, ()):
+            recent = dict(state[recent_key])
+            del recent[submission.id]
+            updates[recent_key] = recent
+        if updates:
+            cache.set_many(updates, STATE_TIMEOUT)
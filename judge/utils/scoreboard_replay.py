@@ -0,0 +1,240 @@
+import copy
+import pickle
+import uuid
+import zlib
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import timedelta
+
+from django.core.cache import cache
+
+from judge.contest_format.base import ReplaySubmission
+from judge.models import ContestParticipation, ContestSubmission, PackedTestCases
+
+__all__ = ['LiveTimelines', 'ScoreboardReplay']
+
+# Finished contests are cached until they're rescored. Running contests change with every grading, so they are cached
+# only briefly instead, which bounds how often their replays are rebuilt.
+FINISHED_TIMEOUT = 3600
+RUNNING_TIMEOUT = 60
+
+# Cached values are compressed and split into parts smaller than memcached's default item size limit.
+CACHE_PART_SIZE = 512 * 1024
+
+
+def _cache_get(key):
+    header = cache.get(key)
+    if header is None:
+        return None
+    token, count = header
+    part_keys = ['%s:%s:%d' % (key, token, i) for i in range(count)]
+    parts = cache.get_many(part_keys)
+    if len(parts) != count:
+        return None
+    return pickle.loads(zlib.decompress(b''.join(parts[part_key] for part_key in part_keys)))
+
+
+def _cache_set(key, value, timeout):
+    data = zlib.compress(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+    token = uuid.uuid4().hex[:8]
+    parts = {'%s:%s:%d' % (key, token, i): data[offset:offset + CACHE_PART_SIZE]
+             for i, offset in enumerate(range(0, len(data), CACHE_PART_SIZE))}
+    # Parts are written before the header, so a reader never sees a header without its parts.
+    cache.set_many(parts, timeout)
+    cache.set(key, (token, len(parts)), timeout)
+
+
+class ScoreboardReplay:
+    """
+    Replays the submissions of a contest's live participants through its contest format, to compute the scoreboard
+    as it was at any point in time.
+
+    All submissions are loaded once and sorted by time. While doing so, the results of every participant are
+    checkpointed every `checkpoint_interval`, so that computing the scoreboard at any time only has to replay the
+    submissions made since the previous checkpoint.
+    """
+
+    checkpoint_interval = timedelta(minutes=10)
+
+    def __init__(self, contest, checkpoint_interval=None, events=None):
+        self.contest = contest
+        if checkpoint_interval is not None:
+            self.checkpoint_interval = checkpoint_interval
+
+        self.participations = {
+            participation.id: participation for participation in
+            contest.users.filter(virtual=ContestParticipation.LIVE).select_related('user__user', 'rating')
+                         .prefetch_related('user__organizations').defer('user__about')
+        }
+        for participation in self.participations.values():
+            participation.contest = contest
+
+        self.events = self._load_events() if events is None else [
+            (participation_id, ReplaySubmission(*submission)) for participation_id, submission in events
+            if participation_id in self.participations
+        ]
+        self.times = [submission.date for participation_id, submission in self.events]
+
+        # For each participation, the indices into self.events of its submissions.
+        self.participation_events = defaultdict(list)
+        for index, (participation_id, submission) in enumerate(self.events):
+            self.participation_events[participation_id].append(index)
+
+        self.checkpoints = []
+        self._build_checkpoints()
+
+    def _load_events(self):
+        submissions = ContestSubmission.objects.filter(participation_id__in=self.participations.keys())
+
+        batches = {}
+        if self.contest.format.replay_batches:
+            batches = PackedTestCases.batch_points(submissions.values('submission_id'))
+
+        events = [
+            (participation_id, ReplaySubmission(
+                id=submission_id, problem_id=problem_id, date=date, points=points, result=result, status=status,
+                problem_points=problem_points, batches=batches.get(submission_id, {}),
+            ))
+            for submission_id, participation_id, problem_id, date, points, result, status, problem_points in
+            submissions.values_list('submission_id', 'participation_id', 'problem_id', 'submission__date', 'points',
+                                    'submission__result', 'submission__status', 'problem__points')
+        ]
+        events.sort(key=lambda event: (event[1].date, event[1].id))
+        return events
+
+    def _score(self, participation_id, end):
+        participation = self.participations[participation_id]
+        indices = self.participation_events[participation_id]
+        submissions = [self.events[index][1] for index in indices[:bisect_right(indices, end - 1)]]
+        score, cumtime, tiebreaker, format_data = self.contest.format.score_submissions(participation, submissions)
+        if participation.is_disqualified:
+            return -9999, 0, 0, format_data
+        return score, cumtime, tiebreaker, format_data
+
+    def _replay(self, results, start, end):
+        for participation_id in {participation_id for participation_id, submission in self.events[start:end]}:
+            results[participation_id] = self._score(participation_id, end)
+        return results
+
+    def _build_checkpoints(self):
+        results = {}
+        index = 0
+        time = self.contest.start_time
+        while index < len(self.events):
+            time += self.checkpoint_interval
+            next_index = bisect_right(self.times, time, lo=index)
+            if next_index == index:
+                continue
+            results = self._replay(dict(results), index, next_index)
+            self.checkpoints.append((next_index, results))
+            index = next_index
+
+    def results_at(self, time):
+        """
+        Returns a dictionary mapping participation IDs to their results, as (score, cumtime, tiebreaker, format_data)
+        tuples, counting only the submissions made at or before `time`. Participations without any submissions by
+        then are omitted.
+        """
+        end = bisect_right(self.times, time)
+        start, results = 0, {}
+        for index, checkpoint in reversed(self.checkpoints):
+            if index <= end:
+                start, results = index, checkpoint
+                break
+        return self._replay(dict(results), start, end)
+
+    def participations_at(self, time):
+        """
+        Returns copies of all live participations with the results they had at `time`, in scoreboard order.
+        """
+        results = self.results_at(time)
+        participations = []
+        for participation_id, participation in self.participations.items():
+            participation = copy.copy(participation)
+            participation.score, participation.cumtime, participation.tiebreaker, participation.format_data = \
+                results.get(participation_id) or self._score(participation_id, 0)
+            participations.append(participation)
+
+        # Ties are broken like the live ranking, by the number of submissions made by then.
+        end = bisect_right(self.times, time)
+        submission_counts = {participation_id: bisect_right(indices, end - 1)
+                             for participation_id, indices in self.participation_events.items()}
+        participations.sort(key=lambda participation: (participation.is_disqualified, -participation.score,
+                                                       participation.cumtime, participation.tiebreaker,
+                                                       -submission_counts.get(participation.id, 0)))
+        return participations
+
+    def compact_events(self):
+        return [(participation_id, tuple(submission)) for participation_id, submission in self.events]
+
+    @classmethod
+    def for_contest(cls, contest):
+        """
+        Returns a replay for the contest. Only the submissions are cached, as plain tuples: the participations are
+        loaded and the checkpoints rebuilt each time.
+        """
+        key = ('contest_replay:%d' if contest.ended else 'contest_replay_running:%d') % contest.id
+        events = _cache_get(key)
+        if events is not None:
+            return cls(contest, events=events)
+        replay = cls(contest)
+        _cache_set(key, replay.compact_events(), FINISHED_TIMEOUT if contest.ended else RUNNING_TIMEOUT)
+        return replay
+
+    @classmethod
+    def invalidate(cls, contest_id):
+        # Running contests are not invalidated, since every grading would do so; their cache expires quickly instead.
+        cache.delete_many(['contest_replay:%d' % contest_id, 'contest_timelines:%d' % contest_id])
+
+
+class LiveTimelines:
+    """
+    For every live participant of a contest, the results they had over time, measured as the time elapsed since the
+    start of their participation.
+
+    This allows ranking a virtual participation against the live scoreboard as it was after the same amount of time
+    with one binary search per live participant, instead of recomputing the live scoreboard.
+    """
+
+    def __init__(self, replay):
+        # For each live participant, parallel lists of elapsed seconds and the ranking key from then on.
+        self.timelines = []
+        for participation_id, participation in replay.participations.items():
+            if participation.is_disqualified:
+                continue
+
+            elapsed, keys = [0], [(0, 0, 0)]
+            for index in replay.participation_events[participation_id]:
+                score, cumtime, tiebreaker, format_data = replay._score(participation_id, index + 1)
+                dt = (replay.events[index][1].date - participation.start).total_seconds()
+                if elapsed[-1] == dt:
+                    keys[-1] = -score, cumtime, tiebreaker
+                else:
+                    elapsed.append(dt)
+                    keys.append((-score, cumtime, tiebreaker))
+            self.timelines.append((elapsed, keys))
+
+    def rank_at(self, elapsed, score, cumtime, tiebreaker):
+        """
+        Returns the rank a participation with the given results would have had on the live scoreboard, if everyone
+        had been participating for `elapsed` seconds.
+        """
+        key = -score, cumtime, tiebreaker
+        better = 0
+        for times, keys in self.timelines:
+            if keys[bisect_right(times, elapsed) - 1] < key:
+                better += 1
+        return better + 1
+
+    def rank_participation(self, participation):
+        elapsed = (min(participation._now, participation.end_time) - participation.start).total_seconds()
+        return self.rank_at(elapsed, participation.score, participation.cumtime, participation.tiebreaker)
+
+    @classmethod
+    def for_contest(cls, contest):
+        key = ('contest_timelines:%d' if contest.ended else 'contest_timelines_running:%d') % contest.id
+        timelines = _cache_get(key)
+        if timelines is None:
+            timelines = cls(ScoreboardReplay.for_contest(contest))
+            _cache_set(key, timelines, FINISHED_TIMEOUT if contest.ended else RUNNING_TIMEOUT)
+        return timelines
@@ -0,0 +1,256 @@
+import re
+import threading
+import uuid
+from collections import Counter, defaultdict
+from math import log
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Case, IntegerField, Value, When
+
+from judge.models import Problem, ProblemTranslation
+
+__all__ = ['SearchIndex', 'problem_search_changed', 'recjk', 'search_problems', 'search_queryset', 'tokenize']
+
+recjk = re.compile(r'[\u2E80-\u2E99\u2E9B-\u2EF3\u2F00-\u2FD5\u3005\u3007\u3021-\u3029\u3038-\u303A\u303B\u3400-\u4DB5'
+                   r'\u4E00-\u9FC3\uF900-\uFA2D\uFA30-\uFA6A\uFA70-\uFAD9\U00020000-\U0002A6D6\U0002F800-\U0002FA1D]')
+reword = re.compile(r'(%s+)|[^\W_]+' % recjk.pattern)
+
+
+def tokenize(text):
+    """
+    Splits text into lowercase words. CJK text isn't separated by spaces, so runs of CJK characters are split into
+    every character bigram instead, along with every single character so that one character queries still match.
+    """
+    for match in reword.finditer(text.lower()):
+        if match.group(1) is None:
+            yield match.group(0)
+            continue
+        run = match.group(1)
+        yield from run
+        for i in range(len(run) - 1):
+            yield run[i:i + 2]
+
+
+def tokenize_query(text):
+    # Unlike documents, multi-character CJK runs in queries are only matched by their bigrams.
+    for match in reword.finditer(text.lower()):
+        run = match.group(1)
+        if run is None or len(run) == 1:
+            yield match.group(0)
+        else:
+            for i in range(len(run) - 1):
+                yield run[i:i + 2]
+
+
+class SearchIndex:
+    """
+    An inverted index from tokens to the documents containing them.
+
+    Documents consist of weighted fields. Searching returns the documents containing every token of the query,
+    ranked by the TF-IDF of the query tokens, so it only looks at the documents containing the query tokens.
+    """
+
+    def __init__(self):
+        self.postings = defaultdict(dict)
+        self.documents = {}
+
+    def add(self, document_id, fields):
+        """
+        Adds or replaces a document, given as a list of (text, weight) tuples.
+        """
+        self.remove(document_id)
+        frequencies = Counter()
+        for text, weight in fields:
+            for token in tokenize(text):
+                frequencies[token] += weight
+        for token, frequency in frequencies.items():
+            self.postings[token][document_id] = 1 + log(frequency)
+        self.documents[document_id] = frozenset(frequencies)
+
+    def remove(self, document_id):
+        for token in self.documents.pop(document_id, ()):
+            postings = self.postings[token]
+            del postings[document_id]
+            if not postings:
+                del self.postings[token]
+
+    def search(self, query):
+        """
+        Returns the IDs of the documents matching the query, most relevant first.
+        """
+        tokens = set(tokenize_query(query))
+        if not tokens:
+            return []
+
+        postings = sorted((self.postings.get(token, {}) for token in tokens), key=len)
+        if not postings[0]:
+            return []
+
+        scores = {}
+        for document_id in postings[0]:
+            score = 0
+            for token_postings in postings:
+                weight = token_postings.get(document_id)
+                if weight is None:
+                    break
+                score += weight * log(1 + len(self.documents) / len(token_postings))
+            else:
+                scores[document_id] = score
+        return sorted(scores, key=lambda document_id: (-scores[document_id], document_id))
+
+
+class ProblemSearchIndex(SearchIndex):
+    CODE_WEIGHT = 4
+    NAME_WEIGHT = 2
+    DESCRIPTION_WEIGHT = 1
+
+    def __init__(self, generation=None, sequence=0):
+        super().__init__()
+        self.generation = generation
+        self.sequence = sequence
+
+    def build(self, problem_ids=None):
+        # Indexes are kept until the next change, so they must not be built from a lagging replica.
+        problems = Problem.objects.using('default').only('id', 'code', 'name', 'description')
+        translations = ProblemTranslation.objects.using('default').only('problem_id', 'name', 'description')
+        if problem_ids is not None:
+            problems = problems.filter(id__in=problem_ids)
+            translations = translations.filter(problem_id__in=problem_ids)
+
+        fields = defaultdict(list)
+        for problem in problems.iterator():
+            fields[problem.id] += [
+                (problem.code, self.CODE_WEIGHT),
+                (problem.name, self.NAME_WEIGHT),
+                (problem.description, self.DESCRIPTION_WEIGHT),
+            ]
+        for translation in translations.iterator():
+            if translation.problem_id in fields:
+                fields[translation.problem_id] += [
+                    (translation.name, self.NAME_WEIGHT),
+                    (translation.description, self.DESCRIPTION_WEIGHT),
+                ]
+
+        for problem_id in problem_ids or ():
+            if problem_id not in fields:
+                self.remove(problem_id)
+        for problem_id, problem_fields in fields.items():
+            self.add(problem_id, problem_fields)
+
+
+# Every process keeps its own index, built in a background thread the first time it's needed. Changes to problems are
+# appended to a log in the cache, which every process replays into its index before searching. If the log was lost or
+# too many changes were missed, the index is rebuilt in the background again, and searched as is in the meantime.
+GENERATION_KEY = 'problem_search:generation'
+SEQUENCE_KEY = 'problem_search:sequence'
+CHANGE_KEY = 'problem_search:change:%d'
+CHANGE_TIMEOUT = 86400
+MAX_CHANGES = 1000
+
+# At most this many of the most relevant problems are returned by search_queryset.
+MAX_RESULTS = 1000
+
+_index = None
+_rebuilding = False
+_index_lock = threading.Lock()
+
+
+def _log_position():
+    position = cache.get_many([GENERATION_KEY, SEQUENCE_KEY])
+    if SEQUENCE_KEY not in position:
+        # Changes may have been lost with the sequence, so a new log is started, which every index is rebuilt for.
+        cache.add(SEQUENCE_KEY, 0, None)
+        if GENERATION_KEY in position:
+            cache.set(GENERATION_KEY, uuid.uuid4().hex, None)
+        else:
+            cache.add(GENERATION_KEY, uuid.uuid4().hex, None)
+        position = cache.get_many([GENERATION_KEY, SEQUENCE_KEY])
+    return position.get(GENERATION_KEY), position.get(SEQUENCE_KEY, 0)
+
+
+def _rebuild():
+    global _index, _rebuilding
+    try:
+        generation, sequence = _log_position()
+        index = ProblemSearchIndex(generation, sequence)
+        index.build()
+        with _index_lock:
+            _index = index
+    finally:
+        _rebuilding = False
+
+
+def _rebuild_in_thread():
+    try:
+        _rebuild()
+    finally:
+        connection.close()
+
+
+def _start_rebuild():
+    threading.Thread(target=_rebuild_in_thread, name='problem-search-index', daemon=True).start()
+
+
+def _catch_up(index, generation, sequence):
+    """
+    Applies the logged changes to the index, returning whether it's now up to date.
+    """
+    if index.generation != generation or not 0 <= sequence - index.sequence <= MAX_CHANGES:
+        return False
+    if sequence == index.sequence:
+        return True
+    keys = [CHANGE_KEY % position for position in range(index.sequence + 1, sequence + 1)]
+    changes = cache.get_many(keys)
+    if len(changes) != len(keys):
+        return False
+    index.build(set(changes.values()))
+    index.sequence = sequence
+    return True
+
+
+def search_problems(query):
+    """
+    Returns the IDs of all problems matching the query, regardless of visibility, most relevant first, or None if the
+    index of this process isn't built yet.
+    """
+    global _rebuilding
+    generation, sequence = _log_position()
+    with _index_lock:
+        rebuild = (_index is None or not _catch_up(_index, generation, sequence)) and not _rebuilding
+        if rebuild:
+            _rebuilding = True
+        results = None if _index is None else _index.search(query)
+    if rebuild:
+        _start_rebuild()
+    return results
+
+
+def search_queryset(queryset, query):
+    """
+    Filters a problem queryset to the MAX_RESULTS problems most relevant to the query, ordered by relevance, or returns
+    None if the index of this process isn't built yet.
+    """
+    problem_ids = search_problems(query)
+    if problem_ids is None:
+        return None
+    problem_ids = problem_ids[:MAX_RESULTS]
+    return queryset.filter(id__in=problem_ids).order_by(Case(
+        *[When(id=problem_id, then=Value(rank)) for rank, problem_id in enumerate(problem_ids)],
+        default=Value(len(problem_ids)), output_field=IntegerField(),
+    ))
+
+
+def _log_change(problem_id):
+    _log_position()
+    try:
+        sequence = cache.incr(SEQUENCE_KEY)
+    except ValueError:
+        # The log was lost, so every process will rebuild its index anyway.
+        return
+    cache.set(CHANGE_KEY % sequence, problem_id, CHANGE_TIMEOUT)
+
+
+def problem_search_changed(problem_id):
+    # Processes must not read the problem before the change is visible to them.
+    transaction.on_commit(lambda: _log_change(problem_id))
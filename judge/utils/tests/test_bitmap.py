@@ -0,0 +1,45 @@
+import pickle
+import unittest
+
+from judge.utils.bitmap import IDBitmap
+
+
+class IDBitmapTestCase(unittest.TestCase):
+    def test_empty(self):
+        bitmap = IDBitmap()
+        self.assertFalse(bitmap)
+        self.assertEqual(len(bitmap), 0)
+        self.assertEqual(list(bitmap), [])
+        self.assertNotIn(0, bitmap)
+        self.assertNotIn(None, bitmap)
+
+    def test_membership(self):
+        ids = {1, 7, 8, 63, 64, 1000}
+        bitmap = IDBitmap(ids)
+        self.assertEqual(list(bitmap), sorted(ids))
+        self.assertEqual(len(bitmap), len(ids))
+        for id in range(1100):
+            self.assertEqual(id in bitmap, id in ids)
+        self.assertNotIn(-1, bitmap)
+        self.assertNotIn(100000, bitmap)
+
+        bitmap.add(5000)
+        bitmap.add(7)
+        bitmap.discard(8)
+        bitmap.discard(100000)
+        self.assertEqual(bitmap, {1, 7, 63, 64, 1000, 5000})
+
+    def test_set_operations(self):
+        a, b = {1, 2, 3, 100}, {3, 4, 100, 200}
+        for other in (IDBitmap(b), b):
+            with self.subTest(type=type(other).__name__):
+                self.assertEqual(IDBitmap(a) | other, a | b)
+                self.assertEqual(IDBitmap(a) & other, a & b)
+                self.assertEqual(IDBitmap(a) - other, a - b)
+                self.assertEqual(IDBitmap(a) ^ other, a ^ b)
+
+    def test_pickle(self):
+        bitmap = IDBitmap(range(0, 10000, 3))
+        data = pickle.dumps(bitmap)
+        self.assertLess(len(data), len(pickle.dumps(set(bitmap))) // 5)
+        self.assertEqual(pickle.loads(data), bitmap)
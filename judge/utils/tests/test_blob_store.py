@@ -0,0 +1,95 @@
+import os
+import tempfile
+import time
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from judge.models import Language, PackedTestCases, Submission, SubmissionTestCase
+from judge.models.tests.util import create_problem, create_user
+from judge.utils.blob_store import BlobStore, CASE_BLOB_PREFIX, is_case_blob, load_case_text, store_case_text
+
+
+class BlobStoreTestCase(SimpleTestCase):
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.root.cleanup)
+
+    def test_put_get(self):
+        store = BlobStore(self.root.name)
+        hash = store.put(b'hello' * 1000)
+        self.assertEqual(store.put(b'hello' * 1000), hash)
+        self.assertEqual(store.get(hash), b'hello' * 1000)
+        self.assertLess(os.path.getsize(store.get_path(hash)), 1000)
+
+    def test_case_text(self):
+        with override_settings(DMOJ_TEST_CASE_BLOB_ROOT=self.root.name, DMOJ_TEST_CASE_BLOB_THRESHOLD=10):
+            self.assertEqual(store_case_text('short'), 'short')
+            stored = store_case_text('long output ✓')
+            self.assertTrue(is_case_blob(stored))
+            self.assertEqual(load_case_text(stored), 'long output ✓')
+
+            case = SubmissionTestCase(output=stored, extended_feedback='feedback')
+            self.assertEqual(case.output_text, 'long output ✓')
+            self.assertEqual(case.extended_feedback_text, 'feedback')
+
+        with override_settings(DMOJ_TEST_CASE_BLOB_ROOT=None):
+            self.assertEqual(store_case_text('long output'), 'long output')
+
+    def test_case_text_prefix(self):
+        with override_settings(DMOJ_TEST_CASE_BLOB_ROOT=self.root.name, DMOJ_TEST_CASE_BLOB_THRESHOLD=10):
+            stored = store_case_text('✓' * 100000)
+            self.assertEqual(load_case_text(stored, 5), '✓' * 5)
+            self.assertEqual(SubmissionTestCase(output=stored).output_prefix(3), '✓' * 3)
+            self.assertEqual(SubmissionTestCase(output='short').output_prefix(3), 'sho')
+
+    def test_case_text_references(self):
+        with override_settings(DMOJ_TEST_CASE_BLOB_ROOT=self.root.name, DMOJ_TEST_CASE_BLOB_THRESHOLD=100):
+            self.assertFalse(is_case_blob(CASE_BLOB_PREFIX + '../../../etc/passwd'))
+            self.assertEqual(load_case_text(CASE_BLOB_PREFIX + '../x'), CASE_BLOB_PREFIX + '../x')
+
+            # Text which looks like a reference is stored as a blob, so it reads back unchanged.
+            forged = CASE_BLOB_PREFIX + '0' * 64
+            stored = store_case_text(forged)
+            self.assertNotEqual(stored, forged)
+            self.assertEqual(load_case_text(stored), forged)
+
+
+class PruneCaseBlobsTestCase(TestCase):
+    fixtures = ['language_all.json']
+
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.root.cleanup)
+        self.store = BlobStore(self.root.name)
+
+    def test_prune(self):
+        problem = create_problem(code='prune_blobs')
+        profile = create_user(username='prune_blobs').profile
+        submissions = [Submission.objects.create(user=profile, problem=problem, language=Language.get_python3(),
+                                                 result='AC', status='D') for _ in range(2)]
+
+        with override_settings(DMOJ_TEST_CASE_BLOB_ROOT=self.root.name, DMOJ_TEST_CASE_BLOB_THRESHOLD=3):
+            output, feedback, packed, unused, new = (store_case_text('%s text' % name) for name in
+                                                     ('output', 'feedback', 'packed', 'unused', 'new'))
+            submissions[0].test_cases.create(case=1, status='AC', output=output, extended_feedback=feedback)
+            submissions[1].test_cases.create(case=1, status='AC', output=packed)
+            PackedTestCases.pack(submissions[1].id)
+
+            old = time.time() - 2 * 86400
+            for stored in (output, feedback, packed, unused):
+                os.utime(self.store.get_path(stored[len(CASE_BLOB_PREFIX):]), (old, old))
+            call_command('prune_case_blobs', stdout=StringIO())
+
+            self.assertEqual(load_case_text(output), 'output text')
+            self.assertEqual(load_case_text(feedback), 'feedback text')
+            self.assertEqual(load_case_text(packed), 'packed text')
+            self.assertEqual(load_case_text(new), 'new text')
+            self.assertFalse(os.path.exists(self.store.get_path(unused[len(CASE_BLOB_PREFIX):])))
+
+            # Storing the same text again keeps its blob from being pruned.
+            os.utime(self.store.get_path(new[len(CASE_BLOB_PREFIX):]), (old, old))
+            self.assertEqual(store_case_text('new text'), new)
+            call_command('prune_case_blobs', stdout=StringIO())
+            self.assertEqual(load_case_text(new), 'new text')
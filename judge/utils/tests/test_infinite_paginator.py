@@ -1,6 +1,8 @@
-from django.test import SimpleTestCase
+from django.core.paginator import InvalidPage
+from django.test import SimpleTestCase, TestCase
 
-from judge.utils.infinite_paginator import infinite_paginate
+from judge.models import Language
+from judge.utils.infinite_paginator import decode_cursor, infinite_paginate, keyset_paginate
 
 
 class InfinitePaginatorTestCase(SimpleTestCase):
@@ -30,3 +32,35 @@ class InfinitePaginatorTestCase(SimpleTestCase):
         self.assertEqual(infinite_paginate(range(1, 101), 10, 10, 2).page_range, [1, 2, False, 8, 9, 10])
         self.assertEqual(infinite_paginate(range(1, 100), 10, 10, 2).page_range, [1, 2, False, 8, 9, 10])
         self.assertEqual(infinite_paginate(range(1, 100), 10, 10, 2).object_list, list(range(91, 100)))
+
+
+class KeysetPaginatorTestCase(TestCase):
+    fixtures = ['language_all.json']
+
+    def assertPages(self, queryset, descending):
+        ids = list(queryset.values_list('id', flat=True))
+        first = infinite_paginate(queryset, 1, 10, 2, keyset_field='id')
+        self.assertIsNone(first.previous_cursor)
+
+        pages, page = [[language.id for language in first]], first
+        while page.next_cursor is not None:
+            page = keyset_paginate(queryset, page.next_cursor, 10, 'id', descending)
+            pages.append([language.id for language in page])
+        self.assertEqual(sum(pages, []), ids)
+        self.assertFalse(page.has_next())
+
+        while page.previous_cursor is not None:
+            page = keyset_paginate(queryset, page.previous_cursor, 10, 'id', descending)
+            self.assertEqual([language.id for language in page], pages[-2])
+            pages.pop()
+        self.assertFalse(page.has_previous())
+
+    def test_keyset_pages(self):
+        self.assertGreater(Language.objects.count(), 20)
+        self.assertPages(Language.objects.order_by('id'), descending=False)
+        self.assertPages(Language.objects.order_by('-id'), descending=True)
+
+    def test_invalid_cursor(self):
+        for cursor in ('', 'x', '!!', 'eDE'):
+            with self.subTest(cursor=cursor), self.assertRaises(InvalidPage):
+                decode_cursor(cursor)
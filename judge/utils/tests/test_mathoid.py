@@ -0,0 +1,52 @@
+import hashlib
+import os
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from judge.utils.mathoid import MathoidMathParser
+
+
+class MathoidCacheTestCase(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.root.cleanup)
+
+        with override_settings(MATHOID_CACHE_ROOT=self.root.name, MATHOID_CACHE_URL='/math/', MATHOID_URL='http://x/'):
+            self.parser = MathoidMathParser('raw')
+        self.formulas = ['a^%d' % i for i in range(3)]
+        for formula in self.formulas:
+            hash = hashlib.sha1(formula.encode('utf-8')).hexdigest()
+            self.parser.cache.create(hash)
+            self.parser.cache.cache_data(hash, 'css', ('css:' + formula).encode('utf-8'), url=False)
+            self.parser.cache.cache_data(hash, 'mml', ('mml:' + formula).encode('utf-8'), url=False)
+
+    def test_cached_formulas(self):
+        with mock.patch.object(self.parser, 'query_mathoid') as query_mathoid:
+            results = self.parser.get_results(self.formulas)
+        query_mathoid.assert_not_called()
+        for formula in self.formulas:
+            self.assertEqual(results[formula]['css'], 'css:' + formula)
+            self.assertEqual(results[formula]['mml'], 'mml:' + formula)
+
+        # The styles are now in the shared cache, so the files aren't read for them again.
+        for formula in self.formulas:
+            hash = hashlib.sha1(formula.encode('utf-8')).hexdigest()
+            os.unlink(self.parser.cache.get_path(hash, 'css'))
+        with mock.patch.object(self.parser.css_cache, 'get_many', wraps=self.parser.css_cache.get_many) as get_many, \
+                mock.patch.object(self.parser, 'query_mathoid') as query_mathoid:
+            results = self.parser.get_results(self.formulas)
+        get_many.assert_called_once()
+        query_mathoid.assert_not_called()
+        self.assertEqual({formula: results[formula]['css'] for formula in self.formulas},
+                         {formula: 'css:' + formula for formula in self.formulas})
+
+    def test_uncached_formula(self):
+        with mock.patch.object(self.parser, 'query_mathoid', return_value=None) as query_mathoid:
+            results = self.parser.get_results(self.formulas + ['b'])
+        query_mathoid.assert_called_once_with('b', hashlib.sha1(b'b').hexdigest())
+        self.assertIsNone(results['b'])
+        self.assertTrue(self.parser.failed)
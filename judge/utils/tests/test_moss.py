@@ -0,0 +1,101 @@
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from judge.models import ContestMoss, ContestSubmission, Language, Submission, SubmissionSource
+from judge.models.tests.util import create_contest, create_contest_participation, create_contest_problem, \
+    create_problem, create_user
+from judge.tasks import run_moss
+from judge.utils.moss import LocalMOSS, run_moss_pair
+
+
+@override_settings(MOSS_API_KEY=1, DMOJ_MOSS_CLIENT='judge.utils.moss.LocalMOSS', DMOJ_MOSS_MAX_WORKERS=1)
+class MossTestCase(TestCase):
+    fixtures = ['language_all.json']
+
+    @classmethod
+    def setUpTestData(self):
+        self.contest = create_contest(key='moss')
+        self.problem = create_problem(code='moss')
+        contest_problem = create_contest_problem(contest=self.contest, problem=self.problem)
+
+        for username, points, source in (
+            ('moss0', 0, 'wrong'),
+            ('moss0', 100, 'right'),
+            ('moss1', 50, 'partial'),
+        ):
+            participation = create_contest_participation(contest=self.contest, user=create_user(username).profile)
+            submission = Submission.objects.create(
+                user=participation.user, problem=self.problem, language=Language.objects.get(key='CPP17'),
+                points=points, result='AC' if points == 100 else 'WA', status='D', contest_object=self.contest,
+            )
+            SubmissionSource.objects.create(submission=submission, source=source)
+            ContestSubmission.objects.create(submission=submission, problem=contest_problem,
+                                             participation=participation, points=points)
+
+    def test_run_moss_pair(self):
+        expected = LocalMOSS(1, 'cc')
+        expected.add_file_from_memory('moss0', b'right')
+        expected.add_file_from_memory('moss1', b'partial')
+
+        url, count = run_moss_pair(self.contest, self.problem, 'C++', 'cc')
+        self.assertEqual(count, 2)
+        self.assertEqual(url, expected.process())
+
+        self.assertEqual(run_moss_pair(self.contest, self.problem, 'C++', 'cc', accepted_only=True)[1], 1)
+        self.assertEqual(run_moss_pair(self.contest, self.problem, 'Java', 'java'), (None, 0))
+
+    def test_run_moss_task(self):
+        self.assertEqual(run_moss.apply(args=('moss',)).get(), len(ContestMoss.LANG_MAPPING))
+
+        results = {result.language: result for result in ContestMoss.objects.filter(contest=self.contest)}
+        self.assertEqual(len(results), len(ContestMoss.LANG_MAPPING))
+        self.assertEqual(results['C++'].submission_count, 2)
+        self.assertTrue(results['C++'].url.startswith('http://localhost/moss/'))
+        self.assertIsNone(results['Java'].url)
+
+
+@override_settings(MOSS_API_KEY=1, DMOJ_MOSS_CLIENT='judge.utils.moss.LocalMOSS', DMOJ_MOSS_MAX_WORKERS=4)
+class MossWorkersTestCase(TransactionTestCase):
+    # The workers query the database from their own threads, so the submissions must be committed.
+    fixtures = ['language_all.json']
+
+    def setUp(self):
+        self.contest = create_contest(key='moss_workers')
+        users = [create_user('moss_workers%d' % i).profile for i in range(3)]
+        participations = [create_contest_participation(contest=self.contest, user=user) for user in users]
+        languages = {key: Language.objects.get(key=key) for key in ('CPP17', 'PY3')}
+
+        # Problem i has C++ submissions from i + 1 users and Python submissions from i users.
+        self.expected = {}
+        for i in range(3):
+            problem = create_problem(code='moss_workers%d' % i)
+            contest_problem = create_contest_problem(contest=self.contest, problem=problem)
+            for key, count in (('CPP17', i + 1), ('PY3', i)):
+                for participation in participations[:count]:
+                    submission = Submission.objects.create(
+                        user=participation.user, problem=problem, language=languages[key], points=100,
+                        result='AC', status='D', contest_object=self.contest,
+                    )
+                    SubmissionSource.objects.create(submission=submission,
+                                                    source='%s %s %s' % (key, problem.code, participation.user))
+                    ContestSubmission.objects.create(submission=submission, problem=contest_problem,
+                                                     participation=participation, points=100)
+            self.expected.update({
+                (problem.code, 'C'): 0, (problem.code, 'C++'): i + 1,
+                (problem.code, 'Java'): 0, (problem.code, 'Python'): i,
+            })
+
+    def get_results(self):
+        return {(result.problem.code, result.language): (result.url, result.submission_count)
+                for result in ContestMoss.objects.filter(contest=self.contest).select_related('problem')}
+
+    def test_run_moss_task(self):
+        self.assertEqual(run_moss.apply(args=('moss_workers',)).get(), len(self.expected))
+        results = self.get_results()
+        self.assertEqual({pair: count for pair, (url, count) in results.items()}, self.expected)
+        for pair, (url, count) in results.items():
+            self.assertEqual(url is None, count == 0, pair)
+
+        # The workers record the same results as running every pair in turn.
+        with override_settings(DMOJ_MOSS_MAX_WORKERS=1):
+            run_moss.apply(args=('moss_workers',)).get()
+        self.assertEqual(self.get_results(), results)
@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+import tempfile
+import zlib
+from zipfile import ZipFile
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from judge.models import ProblemData, ProblemTestCase
+from judge.models.tests.util import create_problem
+from judge.utils.problem_data import ProblemDataCompiler, ProblemDataError, delete_zip_manifest, get_data_manifest, \
+    get_zip_manifest
+
+
+class ZipManifestTestCase(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.zip_path = os.path.join(self.directory.name, 'data.zip')
+        self.manifest_path = self.zip_path + '.manifest.json'
+
+    def write_zip(self, files):
+        with ZipFile(self.zip_path, 'w') as zip:
+            for name, data in files.items():
+                zip.writestr(name, data)
+
+    def test_manifest(self):
+        self.write_zip({'1.in': b'1 2', '1.out': b'3'})
+        self.assertEqual(get_zip_manifest(self.zip_path),
+                         [('1.in', 3, zlib.crc32(b'1 2')), ('1.out', 1, zlib.crc32(b'3'))])
+
+        # The stored manifest is used as long as the zip doesn't change.
+        with open(self.manifest_path) as f:
+            manifest = json.load(f)
+        manifest['files'] = [['cached', 0, 0]]
+        with open(self.manifest_path, 'w') as f:
+            json.dump(manifest, f)
+        self.assertEqual(get_zip_manifest(self.zip_path), [('cached', 0, 0)])
+
+        self.write_zip({'2.in': b'', '2.out': b'', '3.in': b''})
+        self.assertEqual([name for name, size, crc in get_zip_manifest(self.zip_path)], ['2.in', '2.out', '3.in'])
+
+        delete_zip_manifest(self.zip_path)
+        self.assertFalse(os.path.exists(self.manifest_path))
+        delete_zip_manifest(self.zip_path)
+
+
+class DataManifestTestCase(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        settings = override_settings(MEDIA_ROOT=self.directory.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.root = os.path.join(self.directory.name, 'manifest')
+        os.makedirs(os.path.join(self.root, 'checkers'))
+
+    def write(self, name, data):
+        with open(os.path.join(self.root, name), 'wb') as f:
+            f.write(data)
+
+    def test_manifest(self):
+        self.write('init.yml', b'archive: data.zip')
+        self.write('checkers/checker.py', b'')
+        self.write('data.zip.manifest.json', b'[]')
+        self.write('checkers/.manifest.json', b'')
+
+        self.assertIsNone(get_data_manifest('manifest', 'manifest/data.zip', compute=False))
+        version, files = get_data_manifest('manifest', 'manifest/data.zip')
+        self.assertEqual(files, {
+            'checkers/.manifest.json': {'size': 0, 'sha256': hashlib.sha256(b'').hexdigest()},
+            'checkers/checker.py': {'size': 0, 'sha256': hashlib.sha256(b'').hexdigest()},
+            'init.yml': {'size': 17, 'sha256': hashlib.sha256(b'archive: data.zip').hexdigest()},
+        })
+        self.assertTrue(os.path.exists(os.path.join(self.root, '.manifest.json')))
+        self.assertEqual(get_data_manifest('manifest', 'manifest/data.zip', compute=False), (version, files))
+
+        self.write('init.yml', b'archive: data2.zip')
+        self.assertIsNone(get_data_manifest('manifest', 'manifest/data.zip', compute=False))
+        new_version, files = get_data_manifest('manifest', 'manifest/data.zip')
+        self.assertNotEqual(new_version, version)
+        self.assertEqual(files['init.yml']['sha256'], hashlib.sha256(b'archive: data2.zip').hexdigest())
+
+
+class ProblemDataCompilerTestCase(TestCase):
+    def setUp(self):
+        self.problem = create_problem(code='compiled')
+        self.data = ProblemData.objects.create(problem=self.problem)
+
+    def add_case(self, order, type, **kwargs):
+        kwargs.setdefault('is_pretest', False)
+        return ProblemTestCase.objects.create(dataset=self.problem, order=order, type=type, **kwargs)
+
+    def compiler(self, files):
+        return ProblemDataCompiler(self.problem, self.data, self.problem.cases.order_by('order'), files)
+
+    def test_make_init(self):
+        self.add_case(1, 'C', input_file='1.in', output_file='1.out', points=1, checker_args='{}')
+        self.add_case(2, 'S', points=2, input_file='2.in', is_pretest=True)
+        self.add_case(3, 'C', input_file='3.in', output_file='3.out', points=5)
+        self.add_case(4, 'E', input_file='4.in', checker='standard')
+
+        compiler = self.compiler(['1.in', '1.out', '3.in', '3.out'])
+        self.assertEqual(compiler.make_init(), {
+            'test_cases': [{'in': '1.in', 'out': '1.out', 'points': 1}],
+            'pretest_test_cases': [{
+                'points': 2, 'batched': [{'in': '3.in', 'out': '3.out'}], 'dependencies': [],
+            }],
+        })
+
+        # Nothing is written until the collected changes are saved, which takes a single query.
+        self.assertEqual(ProblemTestCase.objects.get(order=4).input_file, '4.in')
+        with self.assertNumQueries(1):
+            compiler.save_case_updates()
+        self.assertEqual(list(self.problem.cases.order_by('order').values_list('input_file', 'checker_args',
+                                                                               'is_pretest')),
+                         [('1.in', '', False), ('', '', True), ('3.in', '', True), ('', '', True)])
+
+    def test_errors(self):
+        self.add_case(1, 'C', input_file='1.in', output_file='1.out')
+        self.add_case(2, 'E')
+        self.add_case(3, 'S', batch_dependencies='1')
+
+        with self.assertRaises(ProblemDataError) as context:
+            self.compiler(['1.in']).make_init()
+        self.assertEqual(context.exception.errors, [
+            'Points must be defined for non-batch case #1.',
+            'Output file for case 1 does not exist: 1.out',
+            'Attempt to end batch outside of one in case #2.',
+            'Batch start case #3 requires points.',
+            'Dependencies must depend on previous batches for batch start case #3.',
+            'Empty batches not allowed.',
+        ])
@@ -0,0 +1,86 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from judge.models import Language, Submission
+from judge.models.tests.util import create_problem, create_user
+from judge.utils.problems import hot_problems, invalidate_user_problem_ids, record_hot_problem_submission, \
+    user_attempted_ids, user_completed_ids, user_finished_submission
+
+
+class HotProblemsTestCase(TestCase):
+    fixtures = ['language_all.json']
+
+    @classmethod
+    def setUpTestData(self):
+        self.problems = [create_problem(code='hot%d' % i, is_public=True, points=10) for i in range(3)]
+        self.private = create_problem(code='hot_private', points=10)
+        self.users = [create_user(username='hot%d' % i).profile for i in range(4)]
+
+    def setUp(self):
+        cache.clear()
+
+    def submit(self, user, problem, result, hours_ago=0):
+        submission = Submission.objects.create(user=user, problem=problem, language=Language.get_python3(),
+                                               result=result, status='D')
+        submission.date = timezone.now() - timezone.timedelta(hours=hours_ago)
+        record_hot_problem_submission(submission)
+
+    def test_hot_problems(self):
+        self.assertEqual(hot_problems(timezone.timedelta(days=1), 5), [])
+        cache.clear()
+
+        for user in self.users:
+            self.submit(user, self.problems[0], 'WA')
+            self.submit(user, self.private, 'AC')
+        for user in self.users[:3]:
+            self.submit(user, self.problems[1], 'AC', hours_ago=2)
+        self.submit(self.users[0], self.problems[2], 'AC')
+        # Too old to count.
+        for user in self.users:
+            self.submit(user, self.problems[2], 'AC', hours_ago=30)
+
+        self.assertEqual(hot_problems(timezone.timedelta(days=1), 5), self.problems[:2])
+        self.assertEqual(hot_problems(timezone.timedelta(days=1), 1), self.problems[:1])
+
+
+class UserProblemIdsTestCase(TestCase):
+    fixtures = ['language_all.json']
+
+    @classmethod
+    def setUpTestData(self):
+        self.problems = [create_problem(code='ids%d' % i, points=10) for i in range(3)]
+        self.profile = create_user(username='ids').profile
+
+    def setUp(self):
+        cache.clear()
+
+    def submit(self, problem, result):
+        return Submission.objects.create(user=self.profile, problem=problem, language=Language.get_python3(),
+                                         result=result, status='D', case_points=1, case_total=1)
+
+    def test_finished_submission_updates_in_place(self):
+        self.assertEqual(set(user_completed_ids(self.profile)), set())
+        self.assertEqual(set(user_attempted_ids(self.profile)), set())
+
+        user_finished_submission(self.submit(self.problems[0], 'AC'))
+        user_finished_submission(self.submit(self.problems[1], 'WA'))
+        with self.assertNumQueries(0):
+            self.assertEqual(set(user_completed_ids(self.profile)), {self.problems[0].id})
+            self.assertEqual(set(user_attempted_ids(self.profile)), {self.problems[0].id, self.problems[1].id})
+
+    def test_finished_submission_invalidates_when_locked(self):
+        self.assertEqual(set(user_attempted_ids(self.profile)), set())
+        self.submit(self.problems[2], 'WA')
+        cache.add('user_attempted_lock:%d' % self.profile.id, True, 10)
+        user_finished_submission(Submission.objects.get(user=self.profile))
+        self.assertEqual(set(user_attempted_ids(self.profile)), {self.problems[2].id})
+
+    def test_invalidate(self):
+        submission = self.submit(self.problems[0], 'AC')
+        self.assertEqual(set(user_completed_ids(self.profile)), {self.problems[0].id})
+        Submission.objects.filter(id=submission.id).update(result='WA')
+        self.assertEqual(set(user_completed_ids(self.profile)), {self.problems[0].id})
+        invalidate_user_problem_ids(self.profile.id)
+        self.assertEqual(set(user_completed_ids(self.profile)), set())
+        self.assertEqual(set(user_attempted_ids(self.profile)), {self.problems[0].id})
@@ -0,0 +1,56 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from judge.caching import failed_submission, finished_submission
+from judge.models import Language, Submission
+from judge.models.tests.util import create_problem, create_user
+from judge.utils.ratelimit import record_submission, submission_limit_exceeded
+
+
+class SubmissionLimitTestCase(TestCase):
+    fixtures = ['language_all.json']
+
+    @classmethod
+    def setUpTestData(self):
+        self.profile = create_user(username='ratelimit').profile
+        self.problem = create_problem(code='ratelimit')
+
+    def setUp(self):
+        cache.clear()
+
+    def submit(self):
+        self.assertFalse(submission_limit_exceeded(self.profile))
+        submission = Submission.objects.create(user=self.profile, problem=self.problem,
+                                               language=Language.get_python3())
+        record_submission(submission)
+        return submission
+
+    def finish(self, submission, result):
+        Submission.objects.filter(id=submission.id).update(status='CE' if result == 'CE' else 'D', result=result)
+        submission.result = result
+        if result == 'CE':
+            failed_submission(submission, result)
+        else:
+            finished_submission(submission)
+
+    @override_settings(DMOJ_SUBMISSION_LIMIT=2)
+    def test_in_flight(self):
+        first = self.submit()
+        second = self.submit()
+        with self.assertNumQueries(1):
+            self.assertTrue(submission_limit_exceeded(self.profile))
+        self.finish(first, 'AC')
+        with self.assertNumQueries(0):
+            self.assertFalse(submission_limit_exceeded(self.profile))
+        self.finish(second, 'CE')
+        self.submit()
+
+    @override_settings(DMOJ_SUBMISSION_RATELIMIT=2)
+    def test_rate(self):
+        self.finish(self.submit(), 'CE')
+        self.finish(self.submit(), 'AC')
+        self.finish(self.submit(), 'WA')
+        self.assertTrue(submission_limit_exceeded(self.profile))
+
+        cache.clear()
+        self.assertTrue(submission_limit_exceeded(self.profile))
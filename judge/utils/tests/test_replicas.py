@@ -0,0 +1,76 @@
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.db import connections
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from judge.middleware import ReplicaStickinessMiddleware
+from judge.models import Problem, Profile
+from judge.replicas import LAG_KEY, ReplicaRouter, STICKY_COOKIE, use_replicas
+from judge.utils.problems import user_attempted_ids, user_completed_ids, visible_problem_ids
+
+
+@override_settings(DMOJ_READ_REPLICAS=('replica',), DMOJ_REPLICA_MAX_LAG=5)
+class ReplicaRouterTestCase(SimpleTestCase):
+    def setUp(self):
+        cache.set(LAG_KEY % 'replica', 0)
+        self.addCleanup(cache.delete, LAG_KEY % 'replica')
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def test_routing(self):
+        self.assertEqual(self.router.db_for_read(Problem), 'default')
+        with use_replicas(self.factory.get('/')):
+            self.assertEqual(self.router.db_for_read(Problem), 'replica')
+            self.assertEqual(self.router.db_for_read(Session), 'default')
+            self.assertEqual(self.router.db_for_write(Problem), 'default')
+        self.assertEqual(self.router.db_for_read(Problem), 'default')
+        self.assertFalse(self.router.allow_migrate('replica', 'judge'))
+
+    def test_lagging_replica(self):
+        cache.set(LAG_KEY % 'replica', 60)
+        with use_replicas(self.factory.get('/')) as replica:
+            self.assertIsNone(replica)
+        cache.set(LAG_KEY % 'replica', -1)
+        with use_replicas(self.factory.get('/')) as replica:
+            self.assertIsNone(replica)
+
+    def test_read_your_writes(self):
+        response = ReplicaStickinessMiddleware(lambda request: HttpResponse())(self.factory.post('/'))
+        self.assertIn(STICKY_COOKIE, response.cookies)
+        response = ReplicaStickinessMiddleware(lambda request: HttpResponse())(self.factory.get('/'))
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+        self.factory.cookies[STICKY_COOKIE] = '1'
+        with use_replicas(self.factory.get('/')) as replica:
+            self.assertIsNone(replica)
+
+
+@skipUnless('replica' in settings.DATABASES, 'needs a second database alias named replica')
+@override_settings(DMOJ_READ_REPLICAS=('replica',), DMOJ_REPLICA_MAX_LAG=5)
+class ReplicaQueryTestCase(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        cache.set(LAG_KEY % 'replica', 0)
+
+    def test_queries(self):
+        profile = Profile(id=1)
+        with CaptureQueriesContext(connections['replica']) as replica_queries, \
+                CaptureQueriesContext(connections['default']) as primary_queries:
+            with use_replicas(RequestFactory().get('/')):
+                list(Problem.objects.all())
+                self.assertEqual(len(replica_queries), 1)
+
+                # Queries whose results are cached must not read lagging data from the replica.
+                visible_problem_ids(AnonymousUser())
+                user_completed_ids(profile)
+                user_attempted_ids(profile)
+                self.assertEqual(len(replica_queries), 1)
+                self.assertEqual(len(primary_queries), 3)
@@ -0,0 +1,138 @@
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from judge.models import ContestSubmission, Language, PackedTestCases, Submission, SubmissionTestCase
+from judge.models.tests.util import create_contest, create_contest_participation, create_contest_problem, \
+    create_problem, create_user
+from judge.utils.scoreboard_replay import LiveTimelines, ScoreboardReplay
+
+
+class ScoreboardReplayTestCase(TestCase):
+    fixtures = ['language_all.json']
+
+    @classmethod
+    def setUpTestData(self):
+        self.start = timezone.now() - timezone.timedelta(days=1)
+        self.contest = create_contest(
+            key='replay',
+            start_time=self.start,
+            end_time=self.start + timezone.timedelta(hours=3),
+        )
+        self.problems = [
+            create_contest_problem(contest=self.contest, problem=create_problem(code='replay%d' % i), order=i)
+            for i in range(2)
+        ]
+        self.participations = [
+            create_contest_participation(contest=self.contest, user=create_user(username='replay%d' % i).profile)
+            for i in range(3)
+        ]
+
+        # (participation, problem, minute, points, result)
+        for index, (user, problem, minute, points, result) in enumerate((
+            (0, 0, 5, 0, 'WA'),
+            (0, 0, 20, 100, 'AC'),
+            (1, 0, 15, 50, 'WA'),
+            (1, 1, 40, 100, 'AC'),
+            (2, 1, 25, 0, 'CE'),
+            (2, 1, 70, 100, 'AC'),
+            (0, 1, 95, 30, 'TLE'),
+            (1, 0, 130, 100, 'AC'),
+        )):
+            submission = Submission.objects.create(
+                user=self.participations[user].user,
+                problem=self.problems[problem].problem,
+                language=Language.get_python3(),
+                result=result,
+                status='D',
+                points=points,
+                case_points=points,
+                case_total=100,
+                contest_object=self.contest,
+            )
+            Submission.objects.filter(id=submission.id).update(
+                date=self.start + timezone.timedelta(minutes=minute, seconds=index),
+            )
+            ContestSubmission.objects.create(
+                submission=submission,
+                problem=self.problems[problem],
+                participation=self.participations[user],
+                points=points,
+            )
+            for case in range(2):
+                SubmissionTestCase.objects.create(
+                    submission=submission, case=case, status=result, points=points / 2, total=50, batch=case,
+                )
+
+    def assertReplayMatches(self, format_name, format_config=None):
+        self.contest.format_name = format_name
+        self.contest.format_config = format_config
+        self.contest.__dict__.pop('format_class', None)
+        self.contest.__dict__.pop('format', None)
+
+        replay = ScoreboardReplay(self.contest, checkpoint_interval=timezone.timedelta(minutes=30))
+        results = replay.results_at(self.contest.end_time)
+        for participation in self.participations:
+            participation.contest = self.contest
+            self.contest.format.update_participation(participation)
+            score, cumtime, tiebreaker, format_data = results[participation.id]
+            with self.subTest(format=format_name, participation=participation.id):
+                self.assertAlmostEqual(participation.score, score)
+                self.assertEqual(int(participation.cumtime), int(cumtime))
+                self.assertAlmostEqual(participation.tiebreaker, tiebreaker)
+                self.assertEqual(participation.format_data, format_data)
+
+    def test_formats_match_update_participation(self):
+        self.assertReplayMatches('default')
+        self.assertReplayMatches('ioi', {'cumtime': True})
+        self.assertReplayMatches('ioi16', {'cumtime': True})
+        self.assertReplayMatches('atcoder')
+        self.assertReplayMatches('icpc')
+        self.assertReplayMatches('ecoo', {'cumtime': True})
+
+    def test_packed_test_cases(self):
+        submission_ids = ContestSubmission.objects.filter(participation__contest=self.contest) \
+                                                  .values_list('submission_id', flat=True)
+        for submission_id in submission_ids[::2]:
+            PackedTestCases.pack(submission_id)
+        self.assertReplayMatches('ioi16', {'cumtime': True})
+
+    def test_rankings_over_time(self):
+        replay = ScoreboardReplay(self.contest, checkpoint_interval=timezone.timedelta(minutes=30))
+
+        def ranking(minutes):
+            return [(participation.user.username, participation.score) for participation in
+                    replay.participations_at(self.start + timezone.timedelta(minutes=minutes))]
+
+        self.assertEqual(ranking(0), [('replay0', 0), ('replay1', 0), ('replay2', 0)])
+        self.assertEqual(ranking(21)[0], ('replay0', 100))
+        self.assertEqual(ranking(45), [('replay1', 150), ('replay0', 100), ('replay2', 0)])
+        self.assertEqual(ranking(100), [('replay1', 150), ('replay0', 130), ('replay2', 100)])
+        self.assertEqual(ranking(180)[0], ('replay1', 200))
+        # Seeking backwards must not be affected by later checkpoints.
+        self.assertEqual(ranking(45), [('replay1', 150), ('replay0', 100), ('replay2', 0)])
+
+    def test_cached_replay(self):
+        with mock.patch('judge.utils.scoreboard_replay.CACHE_PART_SIZE', 64):
+            ScoreboardReplay.invalidate(self.contest.id)
+            self.addCleanup(ScoreboardReplay.invalidate, self.contest.id)
+            replay = ScoreboardReplay.for_contest(self.contest)
+            # Only the participations are loaded again.
+            with self.assertNumQueries(2):
+                cached = ScoreboardReplay.for_contest(self.contest)
+        self.assertEqual(cached.events, replay.events)
+        time = self.start + timezone.timedelta(minutes=100)
+        self.assertEqual(cached.results_at(time), replay.results_at(time))
+
+    def test_live_timelines(self):
+        timelines = LiveTimelines(ScoreboardReplay(self.contest))
+
+        self.assertEqual(timelines.rank_at(0, 0, 0, 0), 1)
+        self.assertEqual(timelines.rank_at(30 * 60, 0, 0, 0), 3)
+        self.assertEqual(timelines.rank_at(30 * 60, 100, 0, 0), 1)
+        self.assertEqual(timelines.rank_at(45 * 60, 100, 0, 0), 2)
+        self.assertEqual(timelines.rank_at(45 * 60, 100, 20 * 60 + 1, 0), 2)
+        self.assertEqual(timelines.rank_at(45 * 60, 100, 30 * 60, 0), 3)
+        self.assertEqual(timelines.rank_at(180 * 60, 150, 0, 0), 2)
+        self.assertEqual(timelines.rank_at(180 * 60, 250, 0, 0), 1)
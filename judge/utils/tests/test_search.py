@@ -0,0 +1,91 @@
+import unittest
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from judge.models import Problem, ProblemTranslation
+from judge.models.tests.util import create_problem
+from judge.utils import search
+from judge.utils.search import SearchIndex, search_problems, search_queryset, tokenize
+
+
+class TokenizeTestCase(unittest.TestCase):
+    def test_words(self):
+        self.assertEqual(list(tokenize('Hello, World! a_b 42')), ['hello', 'world', 'a', 'b', '42'])
+
+    def test_cjk(self):
+        self.assertEqual(list(tokenize('最短路径 dp')), ['最', '短', '路', '径', '最短', '短路', '路径', 'dp'])
+
+
+class SearchIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.index = SearchIndex()
+        self.index.add(1, [('graph', 4), ('shortest path in a graph', 1)])
+        self.index.add(2, [('path', 4), ('longest path', 1)])
+        self.index.add(3, [('最短路径', 1)])
+
+    def test_search(self):
+        self.assertEqual(self.index.search('path'), [2, 1])
+        self.assertEqual(self.index.search('graph path'), [1])
+        self.assertEqual(self.index.search('tree'), [])
+        self.assertEqual(self.index.search('短路'), [3])
+        self.assertEqual(self.index.search('路'), [3])
+        self.assertEqual(self.index.search('路短'), [])
+        self.assertEqual(self.index.search('!!'), [])
+
+    def test_remove(self):
+        self.index.add(2, [('tree', 1)])
+        self.assertEqual(self.index.search('path'), [1])
+        self.index.remove(1)
+        self.assertEqual(self.index.search('path'), [])
+        self.assertNotIn('graph', self.index.postings)
+
+
+class ProblemSearchTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(setattr, search, '_index', None)
+        # Build indexes synchronously, since other threads can't see the test's transaction.
+        patcher = mock.patch('judge.utils.search._start_rebuild', side_effect=search._rebuild)
+        self.start_rebuild = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_search_problems(self):
+        search._index = None
+        problem = create_problem(code='searchable', name='Dijkstra', description='Find the shortest path.')
+        self.assertIsNone(search_problems('shortest'))
+        self.assertEqual(search_problems('shortest'), [problem.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            problem.description = 'Find the longest path.'
+            problem.save()
+        self.assertEqual(search_problems('shortest'), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ProblemTranslation.objects.create(problem=problem, language='zh-hans', name='最短路径', description='')
+        self.assertEqual(search_problems('最短'), [problem.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            problem.delete()
+        self.assertEqual(search_problems('dijkstra'), [])
+        # Changes were applied to the index without rebuilding it.
+        self.assertEqual(self.start_rebuild.call_count, 1)
+
+    def test_lost_log(self):
+        search._index = None
+        search_problems('path')
+        problem = create_problem(code='searchable', name='Dijkstra', description='Find the shortest path.')
+        cache.delete(search.SEQUENCE_KEY)
+        self.assertEqual(search_problems('shortest'), [])
+        self.assertEqual(search_problems('shortest'), [problem.id])
+
+    def test_search_queryset(self):
+        search._index = None
+        search_problems('path')
+        with self.captureOnCommitCallbacks(execute=True):
+            first = create_problem(code='pathfinding', name='Path', description='A path.')
+            second = create_problem(code='walk', name='Walk', description='Find a path.')
+        self.assertEqual(list(search_queryset(Problem.objects.order_by('id'), 'path')), [first, second])
+        with mock.patch('judge.utils.search.MAX_RESULTS', 1):
+            self.assertEqual(list(search_queryset(Problem.objects.all(), 'path')), [first])
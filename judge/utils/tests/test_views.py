@@ -0,0 +1,42 @@
+import tempfile
+
+from django.test import RequestFactory, SimpleTestCase
+
+from judge.utils.views import file_response
+
+
+class FileResponseTestCase(SimpleTestCase):
+    def setUp(self):
+        self.file = tempfile.NamedTemporaryFile()
+        self.file.write(b'0123456789')
+        self.file.flush()
+        self.addCleanup(self.file.close)
+        self.factory = RequestFactory()
+
+    def get(self, **headers):
+        return file_response(self.factory.get('/', **headers), None, self.file.name)
+
+    def test_full(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+        self.assertEqual(response['Content-Length'], '10')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+    def test_conditional(self):
+        etag = self.get()['ETag']
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        last_modified = self.get()['Last-Modified']
+        self.assertEqual(self.get(HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+    def test_range(self):
+        response = self.get(HTTP_RANGE='bytes=2-4')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), b'234')
+        self.assertEqual(response['Content-Range'], 'bytes 2-4/10')
+
+        self.assertEqual(b''.join(self.get(HTTP_RANGE='bytes=-3').streaming_content), b'789')
+        self.assertEqual(b''.join(self.get(HTTP_RANGE='bytes=8-').streaming_content), b'89')
+        self.assertEqual(self.get(HTTP_RANGE='bytes=10-').status_code, 416)
+        self.assertEqual(self.get(HTTP_RANGE='bytes=0-1,3-4').status_code, 200)
+        self.assertEqual(self.get(HTTP_RANGE='bytes=2-4', HTTP_IF_RANGE='"stale"').status_code, 200)
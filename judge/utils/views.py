@@ -1,4 +1,9 @@
+import os
+
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
 from django.shortcuts import render
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
 from django.views.generic import FormView
 from django.views.generic.detail import SingleObjectMixin
 
@@ -12,16 +17,89 @@ def generic_message(request, title, message, status=None):
     }, status=status)
 
 
-def add_file_response(request, response, url_path, file_path, file_object=None):
+def _parse_range(header, size):
+    """
+    Returns the (start, end) inclusive byte offsets of a single range in a Range header, None if the header should be
+    ignored, or False if the range can't be satisfied.
+    """
+    unit, _, ranges = header.partition('=')
+    if unit.strip() != 'bytes' or ',' in ranges:
+        return None
+    start, sep, end = ranges.strip().partition('-')
+    try:
+        if not sep:
+            return None
+        elif not start:
+            length = int(end)
+            if length <= 0:
+                return False
+            start, end = max(size - length, 0), size - 1
+        else:
+            start, end = int(start), min(int(end), size - 1) if end else size - 1
+    except ValueError:
+        return None
+    if start < 0 or start > end:
+        return False
+    return start, end
+
+
+def _stream_range(f, start, length, block_size=FileResponse.block_size):
+    with f:
+        f.seek(start)
+        while length > 0:
+            data = f.read(min(block_size, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+
+
+def file_response(request, url_path, file_path, file_object=None):
+    """
+    Returns a response serving a file, either through nginx with X-Accel-Redirect, or by streaming it from disk with
+    support for conditional and Range requests. Raises OSError if the file can't be opened.
+    """
     if url_path is not None and request.META.get('SERVER_SOFTWARE', '').startswith('nginx/'):
+        response = HttpResponse()
         response['X-Accel-Redirect'] = url_path
-    else:
-        if file_object is None:
-            with open(file_path, 'rb') as f:
-                response.content = f.read()
+        return response
+
+    if file_object is not None:
+        try:
+            file_path = file_object.path(file_path)
+        except NotImplementedError:
+            # Storages without local files can't be ranged cheaply, so just stream the whole file.
+            return FileResponse(file_object.open(file_path, 'rb'))
+
+    stat = os.stat(file_path)
+    size = stat.st_size
+    etag = '"%x-%x"' % (stat.st_mtime_ns, size)
+    last_modified = int(stat.st_mtime)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        byte_range = None
+        if 'HTTP_RANGE' in request.META and request.method in ('GET', 'HEAD'):
+            if_range = request.META.get('HTTP_IF_RANGE')
+            if if_range is None or if_range == etag or parse_http_date_safe(if_range) == last_modified:
+                byte_range = _parse_range(request.META['HTTP_RANGE'], size)
+
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = 'bytes */%d' % size
+        elif byte_range is not None:
+            start, end = byte_range
+            response = StreamingHttpResponse(_stream_range(open(file_path, 'rb'), start, end - start + 1), status=206)
+            response['Content-Range'] = 'bytes %d-%d/%d' % (start, end, size)
+            response['Content-Length'] = end - start + 1
         else:
-            with file_object.open(file_path, 'rb') as f:
-                response.content = f.read()
+            # FileResponse is passed to wsgi.file_wrapper, so servers which support it send the file with sendfile.
+            response = FileResponse(open(file_path, 'rb'))
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return response
 
 
 def paginate_query_context(request):
@@ -13,8 +13,11 @@ from judge.models import (
     Contest, ContestParticipation, ContestTag, Judge, Language, Organization, Problem, ProblemType, Profile, Rating,
     Submission,
 )
+from judge.replicas import ReplicaReadMixin
 from judge.utils.infinite_paginator import InfinitePaginationMixin
-from judge.utils.raw_sql import join_sql_subquery, use_straight_join
+from judge.utils.problems import visible_problem_ids
+from judge.utils.scoreboard_replay import LiveTimelines
+from judge.utils.search import search_queryset
 from judge.views.submission import group_test_cases
 
 
@@ -132,7 +135,7 @@ class APIMixin:
             return self.get_error(e)
 
 
-class APIListView(APIMixin, InfinitePaginationMixin, BaseListView):
+class APIListView(ReplicaReadMixin, APIMixin, InfinitePaginationMixin, BaseListView):
     paginate_by = settings.DMOJ_API_PAGE_SIZE
     basic_filters = ()
     list_filters = ()
@@ -188,6 +191,9 @@ class APIListView(APIMixin, InfinitePaginationMixin, BaseListView):
         if not page.paginator.is_infinite:
             result['total_objects'] = page.paginator.count
             result['total_pages'] = page.paginator.num_pages
+        if getattr(page, 'keyset_field', None) is not None:
+            result['next_cursor'] = page.next_cursor
+            result['previous_cursor'] = page.previous_cursor
         return result
 
 
@@ -341,6 +347,7 @@ class APIContestParticipationList(APIListView):
         ('is_disqualified', 'is_disqualified'),
         ('virtual_participation_number', 'virtual'),
     )
+    live_timelines = None
 
     def get_unfiltered_queryset(self):
         visible_contests = Contest.get_visible_contests(self.request.user)
@@ -380,6 +387,14 @@ class APIContestParticipationList(APIListView):
             )
         )
 
+    def get_live_rank(self, participation):
+        # Building the live timelines is only affordable for a single contest per request.
+        if participation.virtual <= 0 or 'contest' not in self.used_basic_filters or not participation.contest.ended:
+            return None
+        if self.live_timelines is None:
+            self.live_timelines = LiveTimelines.for_contest(Contest.objects.get(id=participation.contest_id))
+        return self.live_timelines.rank_participation(participation)
+
     def get_object_data(self, participation):
         return {
             'user': participation.user.username,
@@ -391,6 +406,7 @@ class APIContestParticipationList(APIListView):
             'tiebreaker': participation.tiebreaker,
             'is_disqualified': participation.is_disqualified,
             'virtual_participation_number': participation.virtual,
+            'live_rank': self.get_live_rank(participation),
         }
 
 
@@ -426,7 +442,8 @@ class APIProblemList(APIListView):
         if settings.ENABLE_FTS and 'search' in self.request.GET:
             query = ' '.join(self.request.GET.getlist('search')).strip()
             if query:
-                queryset = queryset.search(query)
+                results = search_queryset(queryset, query) if settings.DMOJ_PROBLEM_SEARCH_INDEX else None
+                queryset = queryset.search(query) if results is None else results
         return queryset
 
     def get_object_data(self, problem):
@@ -569,6 +586,7 @@ class APIUserDetail(APIDetailView):
 
 class APISubmissionList(APIListView):
     model = Submission
+    keyset_field = 'id'
     basic_filters = (
         ('user', ProfileSimpleFilter('user')),
         ('problem', ProblemSimpleFilter('problem')),
@@ -586,15 +604,9 @@ class APISubmissionList(APIListView):
 
     def get_unfiltered_queryset(self):
         queryset = Submission.objects.all()
-        use_straight_join(queryset)
-        join_sql_subquery(
-            queryset,
-            subquery=Problem.get_visible_problems(self.request.user).distinct().only('id').query,
-            params=[],
-            related_model=Problem,
-            join_fields=[('problem_id', 'id')],
-            alias='visible_problems',
-        )
+        problem_ids = visible_problem_ids(self.request.user)
+        if problem_ids is not None:
+            queryset = queryset.filter(problem_id__in=list(problem_ids))
         return (
             queryset
             .select_related('problem', 'contest', 'contest__participation', 'contest_object', 'user__user', 'language')
@@ -649,7 +661,7 @@ class APISubmissionDetail(APILoginRequiredMixin, APIDetailView):
 
     def get_object_data(self, submission):
         cases = []
-        for batch in group_test_cases(submission.test_cases.all())[0]:
+        for batch in group_test_cases(submission.get_test_cases())[0]:
             batch_cases = [
                 {
                     'type': 'case',
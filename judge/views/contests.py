@@ -12,8 +12,8 @@ from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin
 from django.core.exceptions import ImproperlyConfigured, ObjectDoesNotExist
 from django.db import IntegrityError
-from django.db.models import BooleanField, Case, Count, F, FloatField, IntegerField, Max, Min, Q, Sum, Value, When
-from django.db.models.expressions import CombinedExpression, Exists, OuterRef
+from django.db.models import BooleanField, Case, Count, F, Max, Min, Q, Sum, Value, When
+from django.db.models.expressions import Exists, OuterRef
 from django.http import Http404, HttpResponse, HttpResponseBadRequest, HttpResponseRedirect
 from django.shortcuts import get_object_or_404, render
 from django.template.defaultfilters import date as date_filter
@@ -34,12 +34,14 @@ from judge import event_poster as event
 from judge.comments import CommentedDetailView
 from judge.forms import ContestCloneForm
 from judge.models import Contest, ContestMoss, ContestParticipation, ContestProblem, ContestTag, \
-    Problem, Profile, Submission
+    Problem, Profile
+from judge.replicas import ReplicaReadMixin
 from judge.tasks import run_moss
 from judge.utils.celery import redirect_to_task_status
 from judge.utils.opengraph import generate_opengraph
 from judge.utils.problems import _get_result_data
 from judge.utils.ranker import ranker
+from judge.utils.scoreboard_replay import LiveTimelines, ScoreboardReplay
 from judge.utils.stats import get_bar_chart, get_pie_chart
 from judge.utils.views import DiggPaginatorMixin, QueryStringSortMixin, SingleObjectFormView, TitleMixin, \
     generic_message
@@ -47,6 +49,7 @@ from judge.utils.views import DiggPaginatorMixin, QueryStringSortMixin, SingleOb
 __all__ = ['ContestList', 'ContestDetail', 'ContestRanking', 'ContestJoin', 'ContestLeave', 'ContestCalendar',
            'ContestClone', 'ContestStats', 'ContestMossView', 'ContestMossDelete', 'contest_ranking_ajax',
            'ContestParticipationList', 'ContestParticipationDisqualify', 'get_contest_ranking_list',
+           'replay_contest_ranking_list',
            'base_contest_ranking_list']
 
 
@@ -66,7 +69,7 @@ class ContestListMixin(object):
         return Contest.get_visible_contests(self.request.user)
 
 
-class ContestList(QueryStringSortMixin, DiggPaginatorMixin, TitleMixin, ContestListMixin, ListView):
+class ContestList(ReplicaReadMixin, QueryStringSortMixin, DiggPaginatorMixin, TitleMixin, ContestListMixin, ListView):
     model = Contest
     paginate_by = 20
     template_name = 'contest/list.html'
@@ -596,22 +599,15 @@ class ContestStats(TitleMixin, ContestMixin, DetailView):
         if not (self.object.ended or self.can_edit):
             raise Http404()
 
-        queryset = Submission.objects.filter(contest_object=self.object)
+        statistics = self.object.get_statistics()
 
-        ac_count = Count(Case(When(result='AC', then=Value(1)), output_field=IntegerField()))
-        ac_rate = CombinedExpression(ac_count / Count('problem'), '*', Value(100.0), output_field=FloatField())
-
-        status_count_queryset = list(
-            queryset.values('problem__code', 'result').annotate(count=Count('result'))
-                    .values_list('problem__code', 'result', 'count'),
-        )
         labels, codes = [], []
         contest_problems = self.object.contest_problems.order_by('order').values_list('problem__name', 'problem__code')
         if contest_problems:
             labels, codes = zip(*contest_problems)
         num_problems = len(labels)
         status_counts = [[] for i in range(num_problems)]
-        for problem_code, result, count in status_count_queryset:
+        for problem_code, result, count in statistics['problem_status_count']:
             if problem_code in codes:
                 status_counts[codes.index(problem_code)].append((result, count))
 
@@ -632,18 +628,9 @@ class ContestStats(TitleMixin, ContestMixin, DetailView):
                     for name, data in result_data.items()
                 ],
             },
-            'problem_ac_rate': get_bar_chart(
-                queryset.values('contest__problem__order', 'problem__name').annotate(ac_rate=ac_rate)
-                        .order_by('contest__problem__order').values_list('problem__name', 'ac_rate'),
-            ),
-            'language_count': get_pie_chart(
-                queryset.values('language__name').annotate(count=Count('language__name'))
-                        .filter(count__gt=0).order_by('-count').values_list('language__name', 'count'),
-            ),
-            'language_ac_rate': get_bar_chart(
-                queryset.values('language__name').annotate(ac_rate=ac_rate)
-                        .filter(ac_rate__gt=0).values_list('language__name', 'ac_rate'),
-            ),
+            'problem_ac_rate': get_bar_chart(statistics['problem_ac_rate']),
+            'language_count': get_pie_chart(statistics['language_count']),
+            'language_ac_rate': get_bar_chart(statistics['language_ac_rate']),
         }
 
         context['stats'] = mark_safe(json.dumps(stats))
@@ -699,6 +686,11 @@ def contest_ranking_list(contest, problems):
                                      .order_by('is_disqualified', '-score', 'cumtime', 'tiebreaker', '-submission_cnt'))
 
 
+def replay_contest_ranking_list(contest, problems, time):
+    return [make_contest_ranking_profile(contest, participation, problems)
+            for participation in ScoreboardReplay.for_contest(contest).participations_at(time)]
+
+
 def get_contest_ranking_list(request, contest, participation=None, ranking_list=contest_ranking_list,
                              show_current_virtual=True, ranker=ranker):
     problems = list(contest.contest_problems.select_related('problem').defer('problem__description').order_by('order'))
@@ -711,7 +703,13 @@ def get_contest_ranking_list(request, contest, participation=None, ranking_list=
             if participation is None or participation.contest_id != contest.id:
                 participation = None
         if participation is not None and participation.virtual:
-            users = chain([('-', make_contest_ranking_profile(contest, participation, problems))], users)
+            # Virtual participations are ranked against the live scoreboard after the same amount of time, which
+            # only stops changing once the contest is over.
+            if participation.virtual > 0 and contest.ended:
+                rank = LiveTimelines.for_contest(contest).rank_participation(participation)
+            else:
+                rank = '-'
+            users = chain([(rank, make_contest_ranking_profile(contest, participation, problems))], users)
     return users, problems
 
 
@@ -763,9 +761,30 @@ class ContestRanking(ContestRankingBase):
     tab = 'ranking'
 
     def get_title(self):
+        if self.replay_minutes is not None:
+            return _('%(contest)s Rankings at %(minutes)d minutes') % {
+                'contest': self.object.name, 'minutes': self.replay_minutes,
+            }
         return _('%s Rankings') % self.object.name
 
+    @cached_property
+    def replay_minutes(self):
+        try:
+            minutes = int(self.request.GET['at'])
+        except (KeyError, ValueError):
+            return None
+        if minutes < 0 or not self.object.can_see_full_scoreboard(self.request.user):
+            return None
+        return minutes
+
     def get_ranking_list(self):
+        if self.replay_minutes is not None:
+            return get_contest_ranking_list(
+                self.request, self.object, show_current_virtual=False,
+                ranking_list=partial(replay_contest_ranking_list,
+                                     time=self.object.start_time + timedelta(minutes=self.replay_minutes)),
+            )
+
         if not self.object.can_see_full_scoreboard(self.request.user):
             queryset = self.object.users.filter(user=self.request.profile, virtual=ContestParticipation.LIVE)
             return get_contest_ranking_list(
@@ -1,6 +1,7 @@
+import hashlib
+import json
 import logging
 import os
-import re
 from datetime import timedelta
 from operator import itemgetter
 from random import randrange
@@ -8,9 +9,11 @@ from statistics import mean, median
 
 from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin
+from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist, PermissionDenied
 from django.db import transaction
-from django.db.models import BooleanField, Case, CharField, Count, F, FilteredRelation, Prefetch, Q, When
+from django.db.models import BooleanField, Case, CharField, Count, F, FilteredRelation, IntegerField, Prefetch, Q, \
+    When
 from django.db.models.functions import Coalesce
 from django.db.utils import ProgrammingError
 from django.http import Http404, HttpResponse, HttpResponseForbidden, HttpResponseRedirect, JsonResponse
@@ -30,17 +33,17 @@ from judge.comments import CommentedDetailView
 from judge.forms import ProblemCloneForm, ProblemPointsVoteForm, ProblemSubmitForm
 from judge.models import ContestSubmission, Judge, Language, Problem, ProblemGroup, ProblemPointsVote, \
     ProblemTranslation, ProblemType, RuntimeVersion, Solution, Submission, SubmissionSource
+from judge.replicas import ReplicaReadMixin
 from judge.utils.diggpaginator import DiggPaginator
 from judge.utils.opengraph import generate_opengraph
 from judge.utils.pdfoid import PDF_RENDERING_ENABLED, render_pdf
-from judge.utils.problems import contest_attempted_ids, contest_completed_ids, hot_problems, user_attempted_ids, \
-    user_completed_ids
+from judge.utils.problems import contest_attempted_ids, contest_completed_ids, hot_problems, \
+    problem_submission_restrictions, problem_visibility_version, user_attempted_ids, user_completed_ids
+from judge.utils.ratelimit import record_submission, submission_limit_exceeded
+from judge.utils.search import recjk, search_queryset
 from judge.utils.strings import safe_float_or_none, safe_int_or_none
 from judge.utils.tickets import own_ticket_filter
-from judge.utils.views import QueryStringSortMixin, SingleObjectFormView, TitleMixin, add_file_response, generic_message
-
-recjk = re.compile(r'[\u2E80-\u2E99\u2E9B-\u2EF3\u2F00-\u2FD5\u3005\u3007\u3021-\u3029\u3038-\u303A\u303B\u3400-\u4DB5'
-                   r'\u4E00-\u9FC3\uF900-\uFA2D\uFA30-\uFA6A\uFA70-\uFAD9\U00020000-\U0002A6D6\U0002F800-\U0002FA1D]')
+from judge.utils.views import QueryStringSortMixin, SingleObjectFormView, TitleMixin, file_response, generic_message
 
 
 def get_contest_problem(problem, profile):
@@ -328,10 +331,6 @@ class ProblemPdfView(ProblemMixin, SingleObjectMixin, View):
                     title=problem_name,
                 )
 
-        response = HttpResponse()
-        response['Content-Type'] = 'application/pdf'
-        response['Content-Disposition'] = f'inline; filename={pdf_basename}'
-
         if settings.DMOJ_PDF_PROBLEM_CACHE:
             pdf_filename = os.path.join(settings.DMOJ_PDF_PROBLEM_CACHE, pdf_basename)
             if not os.path.exists(pdf_filename):
@@ -343,14 +342,16 @@ class ProblemPdfView(ProblemMixin, SingleObjectMixin, View):
             else:
                 url_path = None
 
-            add_file_response(request, response, url_path, pdf_filename)
+            response = file_response(request, url_path, pdf_filename)
         else:
-            response.content = render_problem_pdf()
+            response = HttpResponse(render_problem_pdf())
 
+        response['Content-Type'] = 'application/pdf'
+        response['Content-Disposition'] = f'inline; filename={pdf_basename}'
         return response
 
 
-class ProblemList(QueryStringSortMixin, TitleMixin, SolvedProblemMixin, ListView):
+class ProblemList(ReplicaReadMixin, QueryStringSortMixin, TitleMixin, SolvedProblemMixin, ListView):
     model = Problem
     title = gettext_lazy('Problems')
     context_object_name = 'problems'
@@ -379,20 +380,8 @@ class ProblemList(QueryStringSortMixin, TitleMixin, SolvedProblemMixin, ListView
             elif sort_key == 'editorial':
                 queryset = queryset.order_by(self.order.replace('editorial', 'has_public_editorial'), 'id')
             elif sort_key == 'solved':
-                if self.request.user.is_authenticated:
-                    profile = self.request.profile
-                    solved = user_completed_ids(profile)
-                    attempted = user_attempted_ids(profile)
-
-                    def _solved_sort_order(problem):
-                        if problem.id in solved:
-                            return 1
-                        if problem.id in attempted:
-                            return 0
-                        return -1
-
-                    queryset = list(queryset)
-                    queryset.sort(key=_solved_sort_order, reverse=self.order.startswith('-'))
+                if self.profile is not None:
+                    queryset = queryset.order_by(self.order.replace('solved', 'solved_state'), 'id')
             elif sort_key == 'type':
                 if self.show_types:
                     queryset = list(queryset)
@@ -430,6 +419,10 @@ class ProblemList(QueryStringSortMixin, TitleMixin, SolvedProblemMixin, ListView
 
     @staticmethod
     def apply_full_text(queryset, query):
+        if settings.DMOJ_PROBLEM_SEARCH_INDEX:
+            results = search_queryset(queryset, query)
+            if results is not None:
+                return results
         if recjk.search(query):
             # MariaDB can't tokenize CJK properly, fallback to LIKE '%term%' for each term.
             for term in query.split():
@@ -438,21 +431,33 @@ class ProblemList(QueryStringSortMixin, TitleMixin, SolvedProblemMixin, ListView
             return queryset
         return queryset.search(query, queryset.BOOLEAN).extra(order_by=['-relevance'])
 
-    def get_normal_queryset(self):
+    def get_normal_queryset(self, shared=False):
+        """
+        If shared is set, the problems only depend on the user's organizations and permissions: their own problems
+        aren't included, and solved problems aren't hidden.
+        """
         filter = Q(is_public=True)
         if not self.request.user.has_perm('see_organization_problem'):
             org_filter = Q(is_organization_private=False)
             if self.profile is not None:
                 org_filter |= Q(organizations__in=self.profile.organizations.all())
             filter &= org_filter
-        if self.profile is not None:
-            filter = Problem.q_add_author_curator_tester(filter, self.profile)
+        profile = None if shared else self.profile
+        if profile is not None:
+            filter = Problem.q_add_author_curator_tester(filter, profile)
         queryset = Problem.objects.filter(filter).select_related('group').defer('description', 'summary')
-        if self.profile is not None and self.hide_solved:
-            queryset = queryset.exclude(id__in=Submission.objects
-                                        .filter(user=self.profile, is_archived=False,
-                                                result='AC', case_points__gte=F('case_total'))
-                                        .values_list('problem_id', flat=True))
+        if profile is not None:
+            # 1 if solved, 0 if attempted, and -1 otherwise.
+            queryset = queryset.annotate(
+                user_status=FilteredRelation('user_statuses', condition=Q(user_statuses__user=self.profile)),
+            ).annotate(solved_state=Case(
+                When(user_status__solved=True, then=1),
+                When(user_status__solved=False, then=0),
+                default=-1,
+                output_field=IntegerField(),
+            ))
+            if self.hide_solved:
+                queryset = queryset.filter(solved_state__lt=1)
         if self.show_types:
             queryset = queryset.prefetch_related('types')
         queryset = queryset.annotate(has_public_editorial=Case(
@@ -598,17 +603,41 @@ class LanguageTemplateAjax(View):
 
 
 class RandomProblem(ProblemList):
+    def get_candidates(self):
+        # Everything the shared get_normal_queryset depends on, so that users who can see the same problems and use the
+        # same filters share the cached problems. Problems the user wrote or tests are left out of random picks. The
+        # visibility version is included so that the candidates expire along with the cached problem visibility.
+        if self.request.user.has_perm('see_organization_problem'):
+            visibility = 'all'
+        elif self.profile is not None:
+            visibility = sorted(self.profile.organizations.values_list('id', flat=True))
+        else:
+            visibility = []
+        signature = json.dumps([
+            problem_visibility_version(), visibility, self.request.LANGUAGE_CODE, self.full_text,
+            self.has_public_editorial, self.category, sorted(self.selected_types), self.request.GET.getlist('search'),
+            self.point_start, self.point_end,
+        ])
+        key = 'random_problem:%s' % hashlib.sha1(signature.encode('utf-8')).hexdigest()
+        candidates = cache.get(key)
+        if candidates is None:
+            candidates = list(self.get_normal_queryset(shared=True).values_list('id', 'code'))
+            cache.set(key, candidates, 300)
+        return candidates
+
     def get(self, request, *args, **kwargs):
         self.setup_problem_list(request)
         if self.in_contest:
             raise Http404()
 
-        queryset = self.get_normal_queryset()
-        count = queryset.count()
-        if not count:
+        candidates = self.get_candidates()
+        if self.profile is not None and self.hide_solved:
+            solved = user_completed_ids(self.profile)
+            candidates = [candidate for candidate in candidates if candidate[0] not in solved]
+        if not candidates:
             return HttpResponseRedirect('%s%s%s' % (reverse('problem_list'), request.META['QUERY_STRING'] and '?',
                                                     request.META['QUERY_STRING']))
-        return HttpResponseRedirect(queryset[randrange(count)].get_absolute_url())
+        return HttpResponseRedirect(reverse('problem_detail', args=(candidates[randrange(len(candidates))][1],)))
 
 
 user_logger = logging.getLogger('judge.user')
@@ -697,18 +726,12 @@ class ProblemSubmit(LoginRequiredMixin, ProblemMixin, TitleMixin, SingleObjectFo
 
     def form_valid(self, form):
         if not self.request.user.has_perm('judge.spam_submission'):
-            if (
-                Submission.objects.filter(user=self.request.profile, rejudged_date__isnull=True)
-                    .exclude(status__in=['D', 'IE', 'CE', 'AB']).count() >= settings.DMOJ_SUBMISSION_LIMIT
-            ) or (
-                Submission.objects.filter(user=self.request.profile,
-                                          date__gte=timezone.now() - settings.DMOJ_SUBMISSION_RATELIMIT_TIMEFRAME)
-                    .exclude(status__in=['IE', 'CE']).count() >= settings.DMOJ_SUBMISSION_RATELIMIT
-            ):
+            if submission_limit_exceeded(self.request.profile):
                 return HttpResponse(format_html('<h1>{0}</h1>', _('You submitted too many submissions.')), status=429)
-        if not self.object.allowed_languages.filter(id=form.cleaned_data['language'].id).exists():
+        allowed_languages, banned_users = problem_submission_restrictions(self.object.id)
+        if form.cleaned_data['language'].id not in allowed_languages:
             raise PermissionDenied()
-        if not self.request.user.is_superuser and self.object.banned_users.filter(id=self.request.profile.id).exists():
+        if not self.request.user.is_superuser and self.request.profile.id in banned_users:
             return generic_message(self.request, _('Banned from submitting'),
                                    _('You have been declared persona non grata for this problem. '
                                      'You are permanently barred from submitting to this problem.'))
@@ -739,6 +762,8 @@ class ProblemSubmit(LoginRequiredMixin, ProblemMixin, TitleMixin, SingleObjectFo
             source = SubmissionSource(submission=self.new_submission, source=form.cleaned_data['source'])
             source.save()
 
+        record_submission(self.new_submission)
+
         # Save a query.
         self.new_submission.source = source
         self.new_submission.judge(force_judge=True, judge_id=form.cleaned_data['judge'])
@@ -771,7 +796,7 @@ class ProblemSubmit(LoginRequiredMixin, ProblemMixin, TitleMixin, SingleObjectFo
         submission_id = kwargs.get('submission')
         if submission_id is not None:
             self.old_submission = get_object_or_404(
-                Submission.objects.select_related('source', 'language'),
+                Submission.objects.select_related('source__blob', 'language'),
                 id=submission_id,
             )
             if not request.user.has_perm('judge.resubmit_other') and self.old_submission.user != request.profile:
@@ -10,9 +10,10 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core.exceptions import ValidationError
 from django.forms import BaseModelFormSet, HiddenInput, ModelForm, NumberInput, Select, formset_factory
-from django.http import Http404, HttpResponse, HttpResponseRedirect
+from django.http import Http404, HttpResponse, HttpResponseRedirect, JsonResponse
 from django.shortcuts import get_object_or_404, render
 from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.utils.html import escape, format_html
 from django.utils.safestring import mark_safe
 from django.utils.translation import gettext as _
@@ -20,9 +21,10 @@ from django.views.generic import DetailView
 
 from judge.highlight_code import highlight_code
 from judge.models import Problem, ProblemData, ProblemTestCase, Submission, problem_data_storage
-from judge.utils.problem_data import ProblemDataCompiler
+from judge.tasks import request_data_version
+from judge.utils.problem_data import ProblemDataCompiler, get_data_manifest, get_zip_manifest
 from judge.utils.unicode import utf8text
-from judge.utils.views import TitleMixin, add_file_response
+from judge.utils.views import TitleMixin, file_response
 from judge.views.problem import ProblemMixin
 
 mimetypes.init()
@@ -114,6 +116,8 @@ class ProblemManagerMixin(LoginRequiredMixin, ProblemMixin, DetailView):
 
 class ProblemSubmissionDiff(TitleMixin, ProblemMixin, DetailView):
     template_name = 'problem/submission-diff.html'
+    # Only this much of each case's output is shown, so that long outputs in the blob store aren't read in full.
+    partial_output_length = 4096
 
     def get_title(self):
         return _('Comparing submissions for {0}').format(self.object.name)
@@ -140,13 +144,14 @@ class ProblemSubmissionDiff(TitleMixin, ProblemMixin, DetailView):
             raise Http404
 
         context['submissions'] = subs
+        context['partial_output_length'] = self.partial_output_length
 
         # If we have associated data we can do better than just guess
         data = ProblemTestCase.objects.filter(dataset=self.object, type='C')
         if data:
             num_cases = data.count()
         else:
-            num_cases = subs.first().test_cases.count()
+            num_cases = len(subs.first().get_test_cases())
         context['num_cases'] = num_cases
         return context
 
@@ -178,7 +183,7 @@ class ProblemDataView(TitleMixin, ProblemManagerMixin):
             elif post and 'problem-data-zipfile' in self.request.FILES:
                 return ZipFile(self.request.FILES['problem-data-zipfile']).namelist()
             elif data.zipfile:
-                return ZipFile(data.zipfile.path).namelist()
+                return [name for name, size, crc in get_zip_manifest(data.zipfile.path)]
         except BadZipfile:
             raise
         return []
@@ -212,6 +217,9 @@ class ProblemDataView(TitleMixin, ProblemManagerMixin):
         cases_formset = self.get_case_formset(valid_files, post=True)
         if data_form.is_valid() and cases_formset.is_valid():
             data = data_form.save()
+            if data.zipfile:
+                # Compute the manifest of a newly uploaded zip now, so that it's ready for the next request.
+                get_zip_manifest(data.zipfile.path)
             for case in cases_formset.save(commit=False):
                 case.dataset_id = problem.id
                 case.save()
@@ -235,19 +243,45 @@ def problem_data_file(request, problem, path):
     if os.path.commonpath((problem_data_storage.path(os.path.join(problem, path)), problem_dir)) != problem_dir:
         raise Http404()
 
-    response = HttpResponse()
-
     if hasattr(settings, 'DMOJ_PROBLEM_DATA_INTERNAL'):
         url_path = '%s/%s/%s' % (settings.DMOJ_PROBLEM_DATA_INTERNAL, problem, path)
     else:
         url_path = None
 
     try:
-        add_file_response(request, response, url_path, os.path.join(problem, path), problem_data_storage)
+        response = file_response(request, url_path, os.path.join(problem, path), problem_data_storage)
     except IOError:
         raise Http404()
 
     response['Content-Type'] = 'application/octet-stream'
+    # Only editors may see the data, so shared caches must not keep it.
+    patch_cache_control(response, private=True)
+    return response
+
+
+@login_required
+def problem_data_manifest(request, problem):
+    problem = get_object_or_404(Problem, code=problem)
+    if not problem.is_editable_by(request.user):
+        raise Http404()
+
+    data = ProblemData.objects.filter(problem=problem).only('zipfile').first()
+    manifest = get_data_manifest(problem.code, data and data.zipfile.name, compute=False)
+    if manifest is None:
+        # Hashing the data could take a while, so it's done in the background and the judge asked to come back later.
+        request_data_version(problem.id)
+        response = HttpResponse(status=503)
+        response['Retry-After'] = 10
+        return response
+    version, files = manifest
+    etag = '"%s"' % version
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        for path, file in files.items():
+            file['url'] = reverse('problem_data_file', args=[problem.code, path])
+        response = JsonResponse({'version': version, 'files': files})
+    response['ETag'] = etag
+    patch_cache_control(response, private=True)
     return response
 
 
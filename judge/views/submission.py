@@ -21,12 +21,16 @@ from django.views.generic import DetailView, ListView
 
 from judge import event_poster as event
 from judge.highlight_code import highlight_code
-from judge.models import Contest, Language, Problem, ProblemTranslation, Profile, Submission
+from judge.models import ArchivedSubmission, Contest, Language, Problem, ProblemTranslation, Profile, Submission, \
+    SubmissionResultCount
 from judge.models.problem import SubmissionSourceAccess
+from judge.replicas import ReplicaReadMixin
+from judge.utils.bitmap import IDBitmap
 from judge.utils.infinite_paginator import InfinitePaginationMixin
 from judge.utils.lazy import memo_lazy
-from judge.utils.problems import get_result_data, user_completed_ids, user_editable_ids, user_tester_ids
-from judge.utils.raw_sql import join_sql_subquery, use_straight_join
+from judge.utils.problems import _get_result_data, get_result_data, user_completed_ids, user_editable_ids, \
+    user_tester_ids, visible_problem_ids
+from judge.utils.raw_sql import use_straight_join
 from judge.utils.views import DiggPaginatorMixin, TitleMixin, generic_message
 
 
@@ -52,7 +56,13 @@ class SubmissionMixin(object):
 
 class SubmissionDetailBase(LoginRequiredMixin, TitleMixin, SubmissionMixin, DetailView):
     def get_object(self, queryset=None):
-        submission = super(SubmissionDetailBase, self).get_object(queryset)
+        try:
+            submission = super(SubmissionDetailBase, self).get_object(queryset)
+        except Http404:
+            try:
+                submission = ArchivedSubmission.objects.get(id=self.kwargs.get(self.pk_url_kwarg)).restore()
+            except (ArchivedSubmission.DoesNotExist, ValueError):
+                raise Http404()
         if not submission.can_see_detail(self.request.user):
             raise SubmissionPermissionDenied(submission)
         return submission
@@ -100,7 +110,7 @@ class SubmissionSource(SubmissionDetailBase):
     template_name = 'submission/source.html'
 
     def get_queryset(self):
-        return super().get_queryset().select_related('source')
+        return super().get_queryset().select_related('source__blob')
 
     def get_context_data(self, **kwargs):
         context = super(SubmissionSource, self).get_context_data(**kwargs)
@@ -176,7 +186,7 @@ class SubmissionStatus(SubmissionDetailBase):
         submission = self.object
         context['last_msg'] = event.last()
 
-        context['batches'], statuses, context['max_execution_time'] = group_test_cases(submission.test_cases.all())
+        context['batches'], statuses, context['max_execution_time'] = group_test_cases(submission.get_test_cases())
         context['statuses'] = combine_statuses(statuses, submission)
 
         context['time_limit'] = submission.problem.time_limit
@@ -216,17 +226,13 @@ def abort_submission(request, submission):
 
 
 def filter_submissions_by_visible_problems(queryset, user):
-    join_sql_subquery(
-        queryset,
-        subquery=str(Problem.get_visible_problems(user).only('id').query),
-        params=[],
-        join_fields=[('problem_id', 'id')],
-        alias='visible_problems',
-        related_model=Problem,
-    )
+    problem_ids = visible_problem_ids(user)
+    if problem_ids is None:
+        return queryset
+    return queryset.filter(problem_id__in=list(problem_ids))
 
 
-class SubmissionsListBase(DiggPaginatorMixin, TitleMixin, ListView):
+class SubmissionsListBase(ReplicaReadMixin, DiggPaginatorMixin, TitleMixin, ListView):
     model = Submission
     paginate_by = 50
     show_problem = True
@@ -245,9 +251,24 @@ class SubmissionsListBase(DiggPaginatorMixin, TitleMixin, ListView):
 
     def _get_result_data(self, queryset=None):
         if queryset is None:
+            counter = None if self.in_contest else self.get_result_counter()
+            if counter is not None:
+                return _get_result_data(SubmissionResultCount.get_counts(*counter, results=self.selected_statuses))
             queryset = self.get_queryset()
         return get_result_data(queryset.order_by())
 
+    def get_result_counter(self):
+        # Returns the kind and IDs of the maintained result counters matching the filters on this page, if any.
+        if self.selected_languages and self.can_see_all_submissions():
+            return SubmissionResultCount.LANGUAGE, list(
+                Language.objects.filter(key__in=self.selected_languages).values_list('id', flat=True))
+
+    def can_see_all_submissions(self):
+        # The counters include submissions to problems and contests hidden from others, so they can only be shown to
+        # users who can see everything they count.
+        user = self.request.user
+        return user.has_perm('judge.see_private_contest') and visible_problem_ids(user) is None
+
     def access_check(self, request):
         pass
 
@@ -309,7 +330,7 @@ class SubmissionsListBase(DiggPaginatorMixin, TitleMixin, ListView):
     def get_queryset(self):
         queryset = self._get_queryset()
         if not self.in_contest:
-            filter_submissions_by_visible_problems(queryset, self.request.user)
+            queryset = filter_submissions_by_visible_problems(queryset, self.request.user)
 
         return queryset
 
@@ -333,7 +354,8 @@ class SubmissionsListBase(DiggPaginatorMixin, TitleMixin, ListView):
         context['show_problem'] = self.show_problem
 
         profile = self.request.profile
-        context['completed_problem_ids'] = memo_lazy(lambda: user_completed_ids(profile), set) if authenticated else []
+        context['completed_problem_ids'] = memo_lazy(lambda: user_completed_ids(profile), IDBitmap) \
+            if authenticated else []
         context['editable_problem_ids'] = memo_lazy(lambda: user_editable_ids(profile), set) if authenticated else []
         context['tester_problem_ids'] = memo_lazy(lambda: user_tester_ids(profile), set) if authenticated else []
 
@@ -346,8 +368,11 @@ class SubmissionsListBase(DiggPaginatorMixin, TitleMixin, ListView):
         context['results_json'] = mark_safe(json.dumps(self.get_result_data()))
         context['results_colors_json'] = mark_safe(json.dumps(settings.DMOJ_STATS_SUBMISSION_RESULT_COLORS))
 
-        context['page_suffix'] = suffix = ('?' + self.request.GET.urlencode()) if self.request.GET else ''
+        query = self.request.GET.copy()
+        query.pop('cursor', None)
+        context['page_suffix'] = suffix = ('?' + query.urlencode()) if query else ''
         context['first_page_href'] = (self.first_page_href or '.') + suffix
+        context['cursor_prefix'] = (self.first_page_href or '.') + (suffix + '&' if suffix else '?') + 'cursor='
         context['my_submissions_link'] = self.get_my_submissions_page()
         context['all_submissions_link'] = self.get_all_submissions_page()
         context['tab'] = self.tab
@@ -412,6 +437,12 @@ class AllUserSubmissions(ConditionalUserTabMixin, UserMixin, SubmissionsListBase
         if self.request.user.is_authenticated:
             return reverse('all_user_submissions', kwargs={'user': self.request.user.username})
 
+    def get_result_counter(self):
+        if self.selected_languages:
+            return None
+        if self.is_own or self.can_see_all_submissions():
+            return SubmissionResultCount.USER, [self.profile.id]
+
     def get_context_data(self, **kwargs):
         context = super(AllUserSubmissions, self).get_context_data(**kwargs)
         context['dynamic_update'] = context['page_obj'].number == 1
@@ -464,6 +495,11 @@ class ProblemSubmissionsBase(SubmissionsListBase):
     def get_all_submissions_page(self):
         return reverse('chronological_submissions', kwargs={'problem': self.problem.code})
 
+    def get_result_counter(self):
+        # The problem itself is visible here, so only submissions in hidden contests could be counted wrongly.
+        if not self.selected_languages and self.request.user.has_perm('judge.see_private_contest'):
+            return SubmissionResultCount.PROBLEM, [self.problem.id]
+
     def get_context_data(self, **kwargs):
         context = super(ProblemSubmissionsBase, self).get_context_data(**kwargs)
         if self.dynamic_update:
@@ -493,6 +529,9 @@ class UserProblemSubmissions(ConditionalUserTabMixin, UserMixin, ProblemSubmissi
     def get_queryset(self):
         return super(UserProblemSubmissions, self).get_queryset().filter(user_id=self.profile.id)
 
+    def get_result_counter(self):
+        return None
+
     def get_title(self):
         if self.is_own:
             return _('My submissions for %(problem)s') % {'problem': self.problem_name}
@@ -546,6 +585,7 @@ def single_submission(request):
 
 class AllSubmissions(InfinitePaginationMixin, SubmissionsListBase):
     stats_update_interval = 3600
+    keyset_field = 'id'
 
     @property
     def use_infinite_pagination(self):
@@ -570,7 +610,10 @@ class AllSubmissions(InfinitePaginationMixin, SubmissionsListBase):
         result = cache.get(key)
         if result:
             return result
-        result = super(AllSubmissions, self)._get_result_data(Submission.objects.all())
+        # Archived submissions are still counted by the result counters.
+        result = _get_result_data(SubmissionResultCount.get_counts(
+            SubmissionResultCount.LANGUAGE, Language.objects.values_list('id', flat=True),
+        ))
         cache.set(key, result, self.stats_update_interval)
         return result
 
@@ -636,7 +679,7 @@ class UserAllContestSubmissions(ForceContestMixin, AllUserSubmissions):
         queryset = super().get_queryset()
         # FIXME: fix this line of code when #1509 is implemented
         if not self.request.user.is_authenticated or self.request.profile.id not in self.contest.editor_ids:
-            filter_submissions_by_visible_problems(queryset, self.request.user)
+            queryset = filter_submissions_by_visible_problems(queryset, self.request.user)
         return queryset
 
 
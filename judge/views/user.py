@@ -23,6 +23,7 @@ from django.http import Http404, HttpResponse, HttpResponseRedirect, JsonRespons
 from django.shortcuts import get_object_or_404, render
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.cache import patch_cache_control
 from django.utils.formats import date_format
 from django.utils.functional import cached_property
 from django.utils.safestring import mark_safe
@@ -35,6 +36,7 @@ from judge.forms import CustomAuthenticationForm, DownloadDataForm, EmailChangeF
 from judge.models import Profile, Submission
 from judge.performance_points import get_pp_breakdown
 from judge.ratings import rating_class, rating_progress
+from judge.replicas import ReplicaReadMixin
 from judge.tasks import prepare_user_data
 from judge.utils.celery import task_status_by_id, task_status_url_by_id
 from judge.utils.infinite_paginator import InfinitePaginationMixin
@@ -44,7 +46,7 @@ from judge.utils.pwned import PwnedPasswordsValidator
 from judge.utils.ranker import ranker
 from judge.utils.subscription import Subscription
 from judge.utils.unicode import utf8text
-from judge.utils.views import DiggPaginatorMixin, QueryStringSortMixin, TitleMixin, add_file_response, generic_message
+from judge.utils.views import DiggPaginatorMixin, QueryStringSortMixin, TitleMixin, file_response, generic_message
 from .contests import ContestRanking
 
 __all__ = ['UserPage', 'UserAboutPage', 'UserProblemsPage', 'UserDownloadData', 'UserPrepareData',
@@ -334,16 +336,15 @@ class UserDownloadData(LoginRequiredMixin, UserDataMixin, View):
         if not os.path.exists(self.data_path):
             raise Http404()
 
-        response = HttpResponse()
-
         if hasattr(settings, 'DMOJ_USER_DATA_INTERNAL'):
             url_path = '%s/%s.zip' % (settings.DMOJ_USER_DATA_INTERNAL, self.request.profile.id)
         else:
             url_path = None
-        add_file_response(request, response, url_path, self.data_path)
+        response = file_response(request, url_path, self.data_path)
 
         response['Content-Type'] = 'application/zip'
         response['Content-Disposition'] = 'attachment; filename=%s-data.zip' % self.request.user.username
+        patch_cache_control(response, private=True)
         return response
 
 
@@ -429,7 +430,8 @@ def generate_scratch_codes(request):
     return JsonResponse({'data': {'codes': profile.generate_scratch_codes()}})
 
 
-class UserList(QueryStringSortMixin, InfinitePaginationMixin, DiggPaginatorMixin, TitleMixin, ListView):
+class UserList(ReplicaReadMixin, QueryStringSortMixin, InfinitePaginationMixin, DiggPaginatorMixin, TitleMixin,
+               ListView):
     model = Profile
     title = gettext_lazy('Leaderboard')
     context_object_name = 'users'